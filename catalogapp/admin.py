@@ -5,9 +5,11 @@ from .models import *
 
 admin.site.register(Category)
 admin.site.register(Product)
+admin.site.register(ProductSpecification)
 admin.site.register(SelectedProduct)
 admin.site.register(Selection)
 admin.site.register(UserClass)
 admin.site.register(Order)
+admin.site.register(OrderJob)
 
 
@@ -0,0 +1,163 @@
+"""
+Module contains selection of not authenticated visitor.
+
+Such selection is not stored in database: selected slugs and quantities
+are kept in signed cookie, and moved to database selection of user on login
+(see signals.py)
+"""
+
+import json
+
+from django.conf import settings
+
+from .models import Product, SelectedProduct
+from .utils import QuantityError, check_total, clean_qty
+
+
+ANONYMOUS_SELECTION_COOKIE = 'selection'
+ANONYMOUS_SELECTION_SALT = 'catalogapp.selection'
+
+
+class AnonymousSelection:
+    """
+    Class represents selection of not authenticated visitor.
+
+    It has the same attributes as Selection which are used by templates,
+    items are mapping of product slug to quantity
+    """
+    is_anonymous = True
+    in_order = False
+    owner = None
+    pk = None
+
+    def __init__(self, items=None):
+        self.items = items or {}
+        self.modified = False
+
+    @classmethod
+    def from_request(cls, request):
+        """Function reads selection from signed cookie of request"""
+        value = request.get_signed_cookie(ANONYMOUS_SELECTION_COOKIE, None, salt=ANONYMOUS_SELECTION_SALT)
+        try:
+            items = json.loads(value) if value else {}
+        except ValueError:
+            items = {}
+        if not isinstance(items, dict):
+            items = {}
+        return cls({slug: qty for slug, qty in items.items() if isinstance(qty, int) and qty > 0})
+
+    def save(self, response):
+        """Function writes selection to signed cookie of response"""
+        if not self.items:
+            response.delete_cookie(ANONYMOUS_SELECTION_COOKIE)
+            return
+        response.set_signed_cookie(
+            ANONYMOUS_SELECTION_COOKIE,
+            json.dumps(self.items, separators=(',', ':')),
+            salt=ANONYMOUS_SELECTION_SALT,
+            max_age=settings.ANONYMOUS_SELECTION_AGE,
+            httponly=True,
+            samesite='Lax'
+        )
+
+    @property
+    def total_products(self):
+        return len(self.items)
+
+    @property
+    def final_price(self):
+        return sum(item.final_price for item in self.get_items())
+
+    def get_items(self):
+        """Function returns not saved SelectedProduct objects of selection, products are loaded by one query"""
+        if not hasattr(self, '_items'):
+            self._items = self._make_items(
+                Product.objects.select_related('category').in_bulk(list(self.items), field_name='slug')
+            )
+        return self._items
+
+    async def aget_items(self):
+        """Function does the same as get_items() with async ORM"""
+        if not hasattr(self, '_items'):
+            self._items = self._make_items(
+                await Product.objects.select_related('category').ain_bulk(list(self.items), field_name='slug')
+            )
+        return self._items
+
+    def _make_items(self, products):
+        return [
+            SelectedProduct(
+                product=products[slug], qty=qty, unit_price=products[slug].price,
+                final_price=qty * products[slug].price
+            )
+            for slug, qty in self.items.items() if slug in products
+        ]
+
+    def _changed(self):
+        self.modified = True
+        self.__dict__.pop('_items', None)
+
+    def _apply(self, items):
+        """
+        Function replaces items of selection when quantities and total costs are valid
+        (as SelectionService does), otherwise QuantityError is raised and selection is not changed
+        """
+        previous_items = self.items
+        self.items = items
+        self.__dict__.pop('_items', None)
+        try:
+            for item in self.get_items():
+                check_total(item.final_price)
+            check_total(self.final_price)
+        except QuantityError:
+            self.items = previous_items
+            self.__dict__.pop('_items', None)
+            raise
+        self.modified = True
+
+    def add_products(self, items):
+        """
+        Function adds products by mapping of slug to quantity,
+        quantity of already selected products is increased.
+        Returns added and updated slugs and slugs not found or over the limit.
+        QuantityError is raised before any change when quantity or total cost becomes too large
+        """
+        products = set(Product.objects.filter(slug__in=list(items)).values_list('slug', flat=True))
+        selected = dict(self.items)
+        created, updated, not_found = [], [], []
+        for slug, qty in items.items():
+            if slug in selected:
+                selected[slug] = clean_qty(selected[slug] + qty)
+                updated.append(slug)
+            elif slug in products and len(selected) < settings.ANONYMOUS_SELECTION_MAX_ITEMS:
+                selected[slug] = clean_qty(qty)
+                created.append(slug)
+            else:
+                not_found.append(slug)
+        if created or updated:
+            self._apply(selected)
+        return created, updated, not_found
+
+    def add_product(self, slug):
+        """Function adds product with quantity 1 if it is not selected yet. Returns False over the limit"""
+        if slug in self.items:
+            return True
+        if len(self.items) >= settings.ANONYMOUS_SELECTION_MAX_ITEMS:
+            return False
+        self.items[slug] = 1
+        self._changed()
+        return True
+
+    def remove_product(self, slug):
+        """Function removes product from selection"""
+        if self.items.pop(slug, None):
+            self._changed()
+
+    def change_qty(self, slug, qty):
+        """
+        Function sets quantity of selected product.
+        QuantityError is raised for quantity out of range or total cost which does not fit
+        """
+        qty = clean_qty(qty)
+        if slug in self.items:
+            self._apply({**self.items, slug: qty})
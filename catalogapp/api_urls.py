@@ -0,0 +1,14 @@
+"""
+URL configuration of read-only JSON API of catalog (see api_views.py),
+it is included under 'api/' by new_catalog/urls.py
+"""
+
+from django.urls import path
+
+from .api_views import CategoryListAPIView, ProductListAPIView, ProductDetailAPIView
+
+urlpatterns = [
+    path('categories/', CategoryListAPIView.as_view(), name='api_categories'),
+    path('products/', ProductListAPIView.as_view(), name='api_products'),
+    path('products/<str:slug>/', ProductDetailAPIView.as_view(), name='api_product_detail'),
+]
@@ -0,0 +1,141 @@
+"""
+Module contains read-only JSON API of catalog: categories, products and product detail.
+
+Responses are built from values() rows, model instances are not made.
+Every response depends only on catalog version (see utils.py), so strong
+ETag and Last-Modified are computed from version before view is called:
+request with matching If-None-Match or If-Modified-Since is answered
+with 304 Not Modified after one query. Version is read from database for
+every request, so all processes send the same validators and changes
+made by other processes are seen at once. Error responses have no validators
+"""
+
+import datetime
+from functools import wraps
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.http import JsonResponse
+from django.urls import reverse
+from django.utils.decorators import method_decorator
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
+from django.views.generic import View
+
+from .facets import filter_products
+from .models import Category, Product
+from .pagination import KeysetPaginator
+from .utils import read_catalog_version
+
+PRODUCT_FIELDS = ('id', 'slug', 'name', 'price', 'image', 'category_id', 'category__slug')
+
+SPECIFICATION_FIELDS = (
+    'manufacturer', 'fuel_gas', 'fuel_diesel', 'fuel_oil', 'heat_output', 'heat_input', 'max_pressure'
+)
+
+
+def request_catalog_version(request):
+    """Function reads catalog version from database once per request"""
+    if not hasattr(request, 'catalog_version'):
+        request.catalog_version = read_catalog_version()
+    return request.catalog_version
+
+
+def catalog_etag(request, *args, **kwargs):
+    """Function returns ETag of catalog version, representation of URL is the same while version is"""
+    return str(request_catalog_version(request))
+
+
+def catalog_last_modified(request, *args, **kwargs):
+    """Function returns time of catalog version (timestamp in microseconds)"""
+    return datetime.datetime.fromtimestamp(request_catalog_version(request) / 1000000, tz=datetime.timezone.utc)
+
+
+def validators_of_success(view_func):
+    """Decorator removes ETag and Last-Modified of error responses, they are not representations to revalidate"""
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        response = view_func(request, *args, **kwargs)
+        if response.status_code >= 400:
+            response.headers.pop('ETag', None)
+            response.headers.pop('Last-Modified', None)
+        return response
+    return wrapper
+
+
+def product_row(row):
+    """Function makes JSON object of product from values() row"""
+    return {
+        'slug': row['slug'],
+        'name': row['name'],
+        'price': row['price'],
+        'category': row['category__slug'],
+        'image': default_storage.url(row['image']) if row['image'] else None,
+        'url': reverse('api_product_detail', kwargs={'slug': row['slug']}),
+    }
+
+
+@method_decorator(validators_of_success, name='dispatch')
+@method_decorator(condition(etag_func=catalog_etag, last_modified_func=catalog_last_modified), name='dispatch')
+@method_decorator(cache_control(public=True, no_cache=True), name='dispatch')
+class CatalogAPIView(View):
+    """Class is base of API views: GET only, responses are revalidated by ETag"""
+    http_method_names = ['get', 'head', 'options']
+
+
+class CategoryListAPIView(CatalogAPIView):
+    """Representation of all categories"""
+
+    def get(self, request, *args, **kwargs):
+        categories = Category.objects.order_by('name').values_list('slug', 'name')
+        return JsonResponse({
+            'categories': [
+                {
+                    'slug': slug,
+                    'name': name,
+                    'products': '{}?category={}'.format(reverse('api_products'), slug)
+                }
+                for slug, name in categories
+            ]
+        })
+
+
+class ProductListAPIView(CatalogAPIView):
+    """
+    Representation of page of products ordered by (category, price, id),
+    optionally of one category ('category' parameter) with facet filters of category page
+    """
+
+    def get(self, request, *args, **kwargs):
+        products = Product.objects.all()
+        if request.GET.get('category'):
+            products = filter_products(products.filter(category__slug=request.GET['category']), request.GET)
+        paginator = KeysetPaginator(
+            products.values(*PRODUCT_FIELDS), ('category', 'price', 'id'), settings.CATALOG_PAGE_SIZE
+        )
+        page = paginator.get_page(request.GET.get('cursor'))
+        return JsonResponse({
+            'products': [product_row(row) for row in page],
+            'next_cursor': page.next_cursor
+        })
+
+
+class ProductDetailAPIView(CatalogAPIView):
+    """Representation of product with description and specification"""
+
+    def get(self, request, *args, **kwargs):
+        row = Product.objects.filter(slug=kwargs['slug']).values(
+            *PRODUCT_FIELDS, 'description', 'category__name', 'specification__id',
+            *('specification__' + field for field in SPECIFICATION_FIELDS)
+        ).first()
+        if row is None:
+            return JsonResponse({'error': 'Product is not found'}, status=404)
+        product = product_row(row)
+        product['category_name'] = row['category__name']
+        product['description'] = row['description']
+        product['page'] = reverse('product_detail', kwargs={'slug': row['slug']})
+        if row['specification__id'] is None:
+            product['specification'] = None
+        else:
+            product['specification'] = {field: row['specification__' + field] for field in SPECIFICATION_FIELDS}
+        return JsonResponse(product)
@@ -0,0 +1,236 @@
+"""
+Module contains production pipeline of static and media files.
+
+- CompressedManifestStaticFilesStorage: collectstatic saves files with
+  names containing hash of content (ManifestStaticFilesStorage) and
+  gzip variant ('<name>.gz') of every text file next to them, brotli
+  variant ('<name>.br') too when brotli package is installed
+- serve_file() sends file of directory by FileResponse, so that sendfile()
+  of server is used (wsgi.file_wrapper). It sends ETag and Last-Modified,
+  answers conditional requests with 304 and single range requests with 206.
+  Precompressed variant is sent when client accepts its encoding
+
+Static files with hashed names never change and are sent with far-future
+Cache-Control, other static and media files are revalidated by ETag.
+Files are served this way for deployments without web server in front
+of project (CATALOG_ASSET_SERVER setting, see new_catalog/urls.py)
+"""
+
+import gzip
+import mimetypes
+import os
+import posixpath
+import re
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage, staticfiles_storage
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.base import ContentFile
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date, parse_http_date_safe
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSED_EXTENSIONS = (
+    '.css', '.js', '.map', '.json', '.svg', '.txt', '.html', '.xml', '.ico', '.ttf', '.eot', '.otf'
+)
+
+# Smaller files and files which do not become at least 5% smaller are not compressed
+MIN_COMPRESSED_SIZE = 256
+MAX_COMPRESSED_RATIO = 0.95
+
+RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def compressors():
+    """Function returns (encoding, extension, compress function) of available compressions, best first"""
+    available = []
+    if brotli is not None:
+        available.append(('br', '.br', brotli.compress))
+    available.append(('gzip', '.gz', lambda data: gzip.compress(data, 9, mtime=0)))
+    return available
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """Storage of collectstatic which saves precompressed variants of hashed text files"""
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        for name in sorted(set(self.hashed_files.values())):
+            if name.endswith(COMPRESSED_EXTENSIONS):
+                for compressed_name in self.compress(name):
+                    yield name, compressed_name, True
+
+    def compress(self, name):
+        """Function saves compressed variants of file, returns their names"""
+        with self.open(name) as original:
+            data = original.read()
+        if len(data) < MIN_COMPRESSED_SIZE:
+            return []
+        names = []
+        for encoding, extension, compress in compressors():
+            compressed = compress(data)
+            if len(compressed) > len(data) * MAX_COMPRESSED_RATIO:
+                continue
+            compressed_name = name + extension
+            if self.exists(compressed_name):
+                self.delete(compressed_name)
+            self._save(compressed_name, ContentFile(compressed))
+            names.append(compressed_name)
+        return names
+
+
+class FileRange:
+    """Class reads part of file, from start for length bytes"""
+
+    def __init__(self, file, start, length):
+        file.seek(start)
+        self.file = file
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.file.close()
+
+
+def accepted_encodings(request):
+    """Function returns content codings of Accept-Encoding header, which are not refused by q=0"""
+    encodings = set()
+    for part in request.headers.get('Accept-Encoding', '').split(','):
+        coding, *params = [value.strip() for value in part.split(';')]
+        if coding and not any(re.fullmatch(r'q=0(\.0*)?', param) for param in params):
+            encodings.add(coding.lower())
+    return encodings
+
+
+def parse_range(header, size):
+    """
+    Function returns (start, end) of single byte range of Range header, None for
+    header which is ignored (unknown unit, several ranges) and False for unsatisfiable range
+    """
+    match = RANGE.match(header.strip())
+    if not match or not any(match.groups()):
+        return None
+    start, end = match.groups()
+    if not start:
+        length = int(end)
+        if not length or not size:
+            return False
+        return max(size - length, 0), size - 1
+    start = int(start)
+    end = min(int(end), size - 1) if end else size - 1
+    if start >= size:
+        return False
+    if end < start:
+        return None
+    return start, end
+
+
+def if_range_matches(request, etag, last_modified):
+    """Function checks If-Range header: range is sent only for unchanged file"""
+    value = request.headers.get('If-Range')
+    if value is None:
+        return True
+    if value.startswith('"'):
+        return value == etag
+    return parse_http_date_safe(value) == last_modified
+
+
+def serve_file(request, path, document_root, cache_control):
+    """
+    Function returns response with file of document_root, cache_control is
+    dictionary of Cache-Control directives. Precompressed variants are not
+    sent for range requests
+    """
+    path = posixpath.normpath(path).lstrip('/')
+    try:
+        full_path = safe_join(document_root, path)
+    except SuspiciousFileOperation:
+        raise Http404('File is not found')
+    if not os.path.isfile(full_path):
+        raise Http404('File is not found')
+
+    content_type, encoding = mimetypes.guess_type(full_path)
+    if content_type is None or encoding:
+        # Compressed file requested by its own name is sent as is
+        content_type = 'application/octet-stream'
+    variants = [(coding, full_path + extension) for coding, extension, compress in compressors()]
+    variants = [(coding, name) for coding, name in variants if os.path.isfile(name)]
+    content_encoding = None
+    if 'Range' not in request.headers:
+        encodings = accepted_encodings(request)
+        for coding, name in variants:
+            if coding in encodings:
+                content_encoding, full_path = coding, name
+                break
+
+    stat = os.stat(full_path)
+    etag = '"{:x}-{:x}"'.format(stat.st_mtime_ns, stat.st_size)
+    last_modified = int(stat.st_mtime)
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        byte_range = None
+        if 'Range' in request.headers and if_range_matches(request, etag, last_modified):
+            byte_range = parse_range(request.headers['Range'], stat.st_size)
+        if byte_range is False:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{stat.st_size}'
+            return response
+        if request.method == 'HEAD':
+            response = HttpResponse(content_type=content_type)
+            response['Content-Length'] = stat.st_size
+        elif byte_range:
+            start, end = byte_range
+            response = FileResponse(
+                FileRange(open(full_path, 'rb'), start, end - start + 1), status=206, content_type=content_type
+            )
+            response['Content-Length'] = end - start + 1
+            response['Content-Range'] = f'bytes {start}-{end}/{stat.st_size}'
+        else:
+            response = FileResponse(open(full_path, 'rb'), content_type=content_type)
+        if content_encoding:
+            response['Content-Encoding'] = content_encoding
+        response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    if variants:
+        patch_vary_headers(response, ['Accept-Encoding'])
+    patch_cache_control(response, **cache_control)
+    return response
+
+
+def hashed_static_names():
+    """Function returns names of static files with hash of content in name (manifest of storage)"""
+    names = getattr(staticfiles_storage, 'hashed_names', None)
+    if names is None:
+        names = frozenset(getattr(staticfiles_storage, 'hashed_files', {}).values())
+        staticfiles_storage.hashed_names = names
+    return names
+
+
+def serve_static(request, path):
+    """View sends collected static file, files with hashed names are cached for CATALOG_STATIC_MAX_AGE"""
+    if path in hashed_static_names():
+        cache_control = {'public': True, 'max_age': settings.CATALOG_STATIC_MAX_AGE, 'immutable': True}
+    else:
+        cache_control = {'public': True, 'no_cache': True}
+    return serve_file(request, path, settings.STATIC_ROOT, cache_control)
+
+
+def serve_media(request, path):
+    """View sends uploaded file or image rendition, it is cached for CATALOG_MEDIA_MAX_AGE"""
+    cache_control = {'public': True, 'max_age': settings.CATALOG_MEDIA_MAX_AGE}
+    return serve_file(request, path, settings.MEDIA_ROOT, cache_control)
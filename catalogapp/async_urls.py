@@ -0,0 +1,16 @@
+"""
+URL configuration of read-only catalog pages served by async views.
+It is included before catalogapp.urls by new_catalog/asgi_urls.py,
+other pages are served by views of catalogapp.urls
+"""
+
+from django.urls import path
+
+from .async_views import BaseView, ProductDetailView, CategoryDetailView, SelectionView
+
+urlpatterns = [
+    path('', BaseView.as_view(), name='base'),
+    path('products/<str:slug>/', ProductDetailView.as_view(), name='product_detail'),
+    path('category/<str:slug>/', CategoryDetailView.as_view(), name='category_detail'),
+    path('selection/', SelectionView.as_view(), name='selection'),
+]
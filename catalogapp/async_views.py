@@ -0,0 +1,92 @@
+"""
+Module contains async versions of read-only catalog pages.
+
+They are routed by catalogapp/async_urls.py when project is served by ASGI
+(see new_catalog/asgi.py). All data of page is loaded by async ORM before
+template is rendered, template itself is rendered by ASGI handler in thread.
+Products and categories are looked up in catalog cache (catalog_cache.py)
+as sync views do
+"""
+
+from django.http import Http404
+from django.template.response import TemplateResponse
+from django.views.generic import View
+
+from .catalog_cache import aget_category, aget_product
+from .facets import aget_category_facets, filter_products
+from .mixins import SelectionMixin, ProductPageMixin, PublicPageMixin
+from .models import Product
+from .viewmodels import SelectionViewModel
+
+
+class BaseView(PublicPageMixin, ProductPageMixin, View):
+    """
+    Representation of main page
+    """
+    async def get(self, request, *args, **kwargs):
+        page = await self.aget_products_page(Product.objects.all())
+        if self.wants_json():
+            return self.products_json_response(page)
+        context = {
+            'page': page,
+            'cursor': request.GET.get('cursor'),
+            'selection': self.selection
+        }
+        return TemplateResponse(request, 'base.html', context)
+
+
+class ProductDetailView(PublicPageMixin, View):
+    """
+    Representation of product details in web
+    """
+    async def get(self, request, *args, **kwargs):
+        product = await aget_product(kwargs.get('slug'))
+        if product is None:
+            raise Http404('No product found matching the query')
+        context = {
+            'object': product,
+            'product': product,
+            'selection': self.selection
+        }
+        return TemplateResponse(request, 'product_detail.html', context)
+
+
+class CategoryDetailView(PublicPageMixin, ProductPageMixin, View):
+    """
+    Class is used to represent product in category page
+    """
+    async def get(self, request, *args, **kwargs):
+        """Function returns category page or its products page in JSON"""
+        category = await aget_category(kwargs.get('slug'))
+        if category is None:
+            raise Http404('No category found matching the query')
+        page = await self.aget_products_page(
+            filter_products(Product.objects.filter(category=category), request.GET)
+        )
+        if self.wants_json():
+            return self.products_json_response(page)
+        filters = request.GET.copy()
+        filters.pop('cursor', None)
+        context = {
+            'object': category,
+            'category': category,
+            'selection': self.selection,
+            'page': page,
+            'facets': await aget_category_facets(category),
+            'filters': filters,
+            'selected_fuels': filters.getlist('fuel'),
+            'filter_query': filters.urlencode()
+        }
+        return TemplateResponse(request, 'category_detail.html', context)
+
+
+class SelectionView(SelectionMixin, View):
+    """Representation of Selection page"""
+
+    async def get(self, request, *args, **kwargs):
+        """Renders Selection template on request"""
+        context = {
+            'selection': self.selection,
+            'selection_view': await SelectionViewModel.acreate(self.selection)
+        }
+        return TemplateResponse(request, 'selection.html', context)
@@ -0,0 +1,451 @@
+"""
+Module contains helpers of performance benchmarks.
+
+Benchmarks run in a separate test database filled with synthetic catalog,
+so data of project database is never touched. Requests are sent by local
+test clients through the full middleware stack: Client for WSGI handler,
+AsyncClient for ASGI handler.
+
+Results of 'manage.py benchmark' are saved as JSON and can be compared
+with results of other commit (see compare_results)
+"""
+
+import asyncio
+import math
+import platform
+import statistics
+import subprocess
+import threading
+import time
+from contextlib import contextmanager
+from decimal import Decimal
+
+import django
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.cache import caches
+from django.db import connection
+from django.test import AsyncClient, Client, override_settings
+from django.test.utils import CaptureQueriesContext, setup_test_environment, teardown_test_environment
+from django.utils import timezone
+
+from .models import Category, Order, Product, SelectedProduct, Selection, UserClass
+from .query_plans import StatementRecorder
+from .search import rebuild_index, search_available
+from .utils import bump_catalog_version
+
+User = get_user_model()
+
+BENCHMARK_PASSWORD = 'benchmark'
+
+
+@contextmanager
+def benchmark_database(name=None):
+    """
+    Context manager creates test database and test environment
+    (allowed test host, in-memory email) for benchmark and destroys them on exit.
+    Database is in memory unless name of database file is given,
+    slow requests are not logged
+    """
+    setup_test_environment(debug=False)
+    old_name = connection.settings_dict['NAME']
+    old_test_name = connection.settings_dict['TEST'].get('NAME')
+    connection.settings_dict['TEST']['NAME'] = name
+    connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        with override_settings(METRICS_SLOW_REQUEST_SECONDS=None):
+            yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        connection.settings_dict['TEST']['NAME'] = old_test_name
+        teardown_test_environment()
+
+
+@contextmanager
+def production_database_mode():
+    """
+    Context manager configures default connection as production database mode
+    of settings does: SQLite pragmas, lock timeout and persistent connections
+    """
+    settings_dict = connection.settings_dict
+    old_values = {key: settings_dict.get(key) for key in ('CONN_MAX_AGE', 'CONN_HEALTH_CHECKS', 'OPTIONS')}
+    settings_dict.update({'CONN_MAX_AGE': 600, 'CONN_HEALTH_CHECKS': True, 'OPTIONS': {'timeout': 20}})
+    try:
+        with override_settings(CATALOG_SQLITE_PRAGMAS={'default': settings.SQLITE_PRODUCTION_PRAGMAS}):
+            yield
+    finally:
+        settings_dict.update(old_values)
+
+
+def seed_catalog(categories=5, products=200):
+    """Function fills database with synthetic categories and products by bulk inserts"""
+    category_objects = Category.objects.bulk_create([
+        Category(name=f'Category {number}', slug=f'category-{number}')
+        for number in range(categories)
+    ])
+    Product.objects.bulk_create([
+        Product(
+            category=category_objects[number % categories],
+            name=f'Product {number}',
+            slug=f'product-{number}',
+            image=f'products/product-{number}.jpg',
+            description=f'Description of product {number}',
+            price=Decimal(100 + number % 900)
+        )
+        for number in range(products)
+    ], batch_size=500)
+    bump_catalog_version()
+    if search_available():
+        rebuild_index()
+    return category_objects
+
+
+def seed_users(users=10, selections=3, orders=5):
+    """
+    Function adds users with open selection of given count of products
+    and given count of orders (closed selections) per user
+    """
+    password = make_password(BENCHMARK_PASSWORD)
+    user_objects = User.objects.bulk_create([
+        User(username=f'user-{number}', email=f'user-{number}@example.com', password=password)
+        for number in range(users)
+    ])
+    owners = UserClass.objects.bulk_create([UserClass(user=user) for user in user_objects])
+    products = list(Product.objects.order_by('id')[:max(selections, 1)])
+    selection_objects = []
+    for owner in owners:
+        for number in range(orders + 1):
+            selection_objects.append(Selection(owner=owner, in_order=number < orders))
+    selection_objects = Selection.objects.bulk_create(selection_objects)
+    selected_products = SelectedProduct.objects.bulk_create([
+        SelectedProduct(
+            user=selection.owner, selected_item=selection, product=product,
+            unit_price=product.price, final_price=product.price
+        )
+        for selection in selection_objects
+        for product in products[:selections]
+    ])
+    Selection.products.through.objects.bulk_create([
+        Selection.products.through(selection_id=item.selected_item_id, selectedproduct_id=item.id)
+        for item in selected_products
+    ])
+    total_price = sum(product.price for product in products[:selections])
+    Selection.objects.update(total_products=len(products[:selections]), final_price=total_price)
+    orders = Order.objects.bulk_create([
+        Order(
+            user=selection.owner,
+            selection=selection,
+            to_project='Benchmark',
+            total_products=selection.total_products,
+            final_price=total_price
+        )
+        for selection in selection_objects if selection.in_order
+    ])
+    UserClass.orders.through.objects.bulk_create([
+        UserClass.orders.through(userclass_id=order.user_id, order_id=order.id) for order in orders
+    ])
+    return user_objects
+
+
+def catalog_paths():
+    """Function returns URLs of read-only catalog pages of seeded catalog"""
+    category = Category.objects.order_by('id').first()
+    product = Product.objects.order_by('id').first()
+    return ['/', category.get_abs_url(), product.get_abs_url(), '/selection/']
+
+
+def run_wsgi(paths, requests, concurrency):
+    """Function sends requests to paths by threads of WSGI clients. Returns elapsed seconds"""
+    def worker(number):
+        client = Client()
+        try:
+            for index in range(number, requests, concurrency):
+                client.get(paths[index % len(paths)])
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=worker, args=(number,)) for number in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - started
+
+
+def run_asgi(paths, requests, concurrency):
+    """Function sends requests to paths by concurrent tasks of ASGI clients. Returns elapsed seconds"""
+    async def worker(number):
+        client = AsyncClient()
+        for index in range(number, requests, concurrency):
+            await client.get(paths[index % len(paths)])
+
+    async def run():
+        await asyncio.gather(*(worker(number) for number in range(concurrency)))
+
+    with override_settings(ROOT_URLCONF='new_catalog.asgi_urls'):
+        started = time.perf_counter()
+        asyncio.run(run())
+        return time.perf_counter() - started
+
+
+class Endpoint:
+    """
+    Class describes benchmarked request: path and data are callables
+    of request number, so that requests go to different products
+    """
+
+    def __init__(self, name, path, method='get', data=None, authenticated=False):
+        self.name = name
+        self.path = path
+        self.method = method
+        self.data = data
+        self.authenticated = authenticated
+
+    def request(self, client, number):
+        data = self.data(number) if self.data else None
+        return getattr(client, self.method)(self.path(number), data)
+
+
+def catalog_endpoints(categories, products, owner=None):
+    """
+    Function returns endpoints of catalog and checkout flows
+    (catalogapp/urls.py), checkout goes last as it closes selection
+    """
+    def category(number):
+        return categories[number % len(categories)]
+
+    def product(number):
+        return products[number % len(products)]
+
+    return [
+        Endpoint('home', lambda number: '/'),
+        Endpoint('home_json', lambda number: '/?format=json'),
+        Endpoint('category', lambda number: category(number).get_abs_url()),
+        Endpoint('category_filtered', lambda number: category(number).get_abs_url(),
+                 data=lambda number: {'price_min': 200, 'price_max': 800}),
+        Endpoint('product', lambda number: product(number).get_abs_url()),
+        Endpoint('search', lambda number: '/search/', data=lambda number: {'q': product(number).name}),
+        Endpoint('autocomplete', lambda number: '/search/autocomplete/', data=lambda number: {'q': 'Prod'}),
+        Endpoint('api_products', lambda number: '/api/products/',
+                 data=lambda number: {'category': category(number).slug}),
+        Endpoint('api_product', lambda number: f'/api/products/{product(number).slug}/'),
+        Endpoint('selection', lambda number: '/selection/', authenticated=True),
+        Endpoint('add_to_selection', lambda number: f'/add-to-selection/{product(number).slug}/',
+                 authenticated=True),
+        Endpoint('batch_add_to_selection', lambda number: '/add-to-selection/', method='post',
+                 data=lambda number: {'slug': [product(number).slug, product(number + 1).slug], 'qty': [1, 2]},
+                 authenticated=True),
+        Endpoint('change_qty', lambda number: f'/change-qty/{product(number).slug}/', method='post',
+                 data=lambda number: {'qty': number % 5 + 1}, authenticated=True),
+        Endpoint('checkout', lambda number: '/checkout/', authenticated=True),
+        Endpoint('profile', lambda number: '/profile/', authenticated=True),
+        Endpoint('order_history', lambda number: '/profile/orders/', authenticated=True),
+        Endpoint('make_order', lambda number: '/makeorder/', method='post',
+                 data=lambda number: {'user': owner.pk, 'order_type': 'self', 'order_date': '2021-10-02'},
+                 authenticated=True),
+    ]
+
+
+def percentile(values, percent):
+    """Function returns percentile of values (nearest rank)"""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(percent / 100 * len(ordered)) - 1)]
+
+
+def measure_endpoint(endpoint, client, requests, warmup=5):
+    """
+    Function sends requests to endpoint one by one and returns
+    latency percentiles (ms), queries per request and throughput
+    """
+    for number in range(warmup):
+        endpoint.request(client, number)
+    latencies, queries, errors = [], [], 0
+    for number in range(warmup, warmup + requests):
+        with CaptureQueriesContext(connection) as context:
+            started = time.perf_counter()
+            response = endpoint.request(client, number)
+            latencies.append(time.perf_counter() - started)
+        queries.append(len(context))
+        if response.status_code >= 400:
+            errors += 1
+    return {
+        'requests': requests,
+        'errors': errors,
+        'p50_ms': round(percentile(latencies, 50) * 1000, 3),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 3),
+        'mean_ms': round(statistics.mean(latencies) * 1000, 3),
+        'queries': round(statistics.mean(queries), 2),
+        'max_queries': max(queries),
+        'throughput': round(requests / sum(latencies), 1)
+    }
+
+
+def endpoint_clients(only=None):
+    """
+    Function returns pairs of catalog endpoint and client to request it:
+    authenticated endpoints are requested as the first seeded user
+    """
+    categories = list(Category.objects.order_by('id'))
+    products = list(Product.objects.order_by('id'))
+    user = User.objects.order_by('id').first()
+    anonymous_client, user_client = Client(), Client()
+    if user:
+        user_client.force_login(user)
+    owner = UserClass.objects.filter(user=user).first()
+    return [
+        (endpoint, user_client if endpoint.authenticated else anonymous_client)
+        for endpoint in catalog_endpoints(categories, products, owner)
+        if (not only or endpoint.name in only) and (user or not endpoint.authenticated)
+    ]
+
+
+def run_benchmark(requests=50, warmup=5, only=None):
+    """Function measures all catalog endpoints on seeded database, optionally only given names"""
+    return {
+        endpoint.name: measure_endpoint(endpoint, client, requests, warmup)
+        for endpoint, client in endpoint_clients(only)
+    }
+
+
+def current_commit():
+    """Function returns hash of current git commit, if project is a git repository"""
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def benchmark_report(results, **options):
+    """Function adds description of environment to results"""
+    return {
+        'commit': current_commit(),
+        'created_at': timezone.now().isoformat(),
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'database': connection.vendor,
+        'options': options,
+        'endpoints': results
+    }
+
+
+COMPARED_METRICS = ('p50_ms', 'p95_ms', 'p99_ms', 'queries')
+
+
+def compare_results(baseline, results, threshold=0.2):
+    """
+    Function compares endpoints of two reports. Returns rows
+    (endpoint, metric, baseline, current, change) and names of regressed
+    metrics: latency grown more than threshold or any extra query
+    """
+    rows, regressions = [], []
+    for name, current in results['endpoints'].items():
+        previous = baseline['endpoints'].get(name)
+        if not previous:
+            continue
+        for metric in COMPARED_METRICS:
+            before, after = previous[metric], current[metric]
+            change = (after - before) / before if before else 0
+            rows.append((name, metric, before, after, change))
+            if metric == 'queries' and after > before or metric != 'queries' and change > threshold:
+                regressions.append(f'{name}.{metric}')
+    return rows, regressions
+
+
+def run_concurrent_cart(threads=8, operations=30):
+    """
+    Function runs threads of logged in users which browse category and change
+    their selections at the same time. Returns throughput, latency and count
+    of failed operations (e.g. "database is locked")
+    """
+    users = list(User.objects.order_by('id')[:threads])
+    categories = list(Category.objects.order_by('id'))
+    products = list(Product.objects.order_by('id'))
+    latencies, errors = [], []
+
+    def worker(user):
+        client = Client(raise_request_exception=False)
+        client.force_login(user)
+        try:
+            for number in range(operations):
+                product = products[(user.pk + number) % len(products)]
+                for method, path, data in (
+                    ('get', categories[number % len(categories)].get_abs_url(), None),
+                    ('get', f'/add-to-selection/{product.slug}/', None),
+                    ('post', f'/change-qty/{product.slug}/', {'qty': number % 3 + 1}),
+                ):
+                    started = time.perf_counter()
+                    response = getattr(client, method)(path, data)
+                    latencies.append(time.perf_counter() - started)
+                    if response.status_code >= 500:
+                        errors.append(path)
+        finally:
+            connection.close()
+
+    workers = [threading.Thread(target=worker, args=(user,)) for user in users]
+    started = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    return {
+        'requests': len(latencies),
+        'errors': len(errors),
+        'throughput': round(len(latencies) / elapsed, 1),
+        'p50_ms': round(percentile(latencies, 50) * 1000, 3),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 3)
+    }
+
+
+WRITE_STATEMENTS = ('INSERT', 'UPDATE', 'DELETE')
+
+
+def run_session_benchmark(modes=None, operations=20):
+    """
+    Function runs cart operations (add product, change quantity, remove product,
+    redirects with messages are followed) of logged in user in every mode of
+    CATALOG_SESSION_MODES and returns per operation: SQL statements, writes,
+    statements on session table and latency
+    """
+    user = User.objects.order_by('id').first()
+    products = list(Product.objects.order_by('id')[:operations])
+    results = {}
+    for mode in modes or settings.CATALOG_SESSION_MODES:
+        engine, storage = settings.CATALOG_SESSION_MODES[mode]
+        with override_settings(SESSION_ENGINE=engine, MESSAGE_STORAGE=storage):
+            caches[settings.SESSION_CACHE_ALIAS].clear()
+            client = Client()
+            client.force_login(user)
+            recorder = StatementRecorder()
+            latencies = []
+            with connection.execute_wrapper(recorder):
+                for number in range(operations):
+                    product = products[number % len(products)]
+                    for method, path, data in (
+                        ('get', f'/add-to-selection/{product.slug}/', None),
+                        ('post', f'/change-qty/{product.slug}/', {'qty': 2}),
+                        ('get', f'/remove-from-selection/{product.slug}/', None),
+                    ):
+                        started = time.perf_counter()
+                        getattr(client, method)(path, data, follow=True)
+                        latencies.append(time.perf_counter() - started)
+            client.logout()
+        statements = [sql.lstrip().upper() for sql, params in recorder.statements]
+        count = len(latencies)
+        results[mode] = {
+            'operations': count,
+            'statements': round(len(statements) / count, 2),
+            'writes': round(sum(sql.startswith(WRITE_STATEMENTS) for sql in statements) / count, 2),
+            'session_statements': round(sum('DJANGO_SESSION' in sql for sql in statements) / count, 2),
+            'session_writes': round(
+                sum('DJANGO_SESSION' in sql and sql.startswith(WRITE_STATEMENTS) for sql in statements) / count, 2
+            ),
+            'mean_ms': round(statistics.mean(latencies) * 1000, 3),
+        }
+    return results
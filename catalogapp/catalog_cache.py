@@ -0,0 +1,144 @@
+"""
+Module contains read cache of catalog: list of categories and
+lookups of products and categories by slug.
+
+Cached values are keyed by catalog version, which is bumped by signals
+on every change of product, specification or category (see signals.py),
+so changed catalog is never served from cache. Backend is set by
+CATALOG_CACHE setting:
+
+- LocalLRUCache keeps objects in memory of process, at most
+  'max_entries' of them, each for 'timeout' seconds
+- DjangoCache keeps pickled objects in cache 'alias' of CACHES setting,
+  e.g. file based or Redis cache shared by processes
+
+Objects returned from cache are shared by requests and must not be changed
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+from .models import Category, Product
+from .utils import get_catalog_version
+
+MISSING = object()
+
+_backend = None
+
+
+class LocalLRUCache:
+    """Class keeps least recently used values in memory of process, each value expires after timeout"""
+
+    def __init__(self, max_entries=1024, timeout=300):
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return default
+            expires, value = entry
+            if expires < time.monotonic():
+                del self.entries[key]
+                return default
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self.lock:
+            self.entries[key] = (time.monotonic() + self.timeout, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+class DjangoCache:
+    """Class keeps values in cache of CACHES setting"""
+
+    def __init__(self, alias='default', timeout=300):
+        self.cache = caches[alias]
+        self.timeout = timeout
+
+    def get(self, key, default=None):
+        return self.cache.get(key, default)
+
+    def set(self, key, value):
+        self.cache.set(key, value, self.timeout)
+
+    def clear(self):
+        self.cache.clear()
+
+
+def get_backend():
+    """Function returns backend of CATALOG_CACHE setting, backend is made on first use"""
+    global _backend
+    if _backend is None:
+        config = settings.CATALOG_CACHE
+        _backend = import_string(config['BACKEND'])(**config.get('OPTIONS', {}))
+    return _backend
+
+
+@receiver(setting_changed)
+def reset_backend(setting, **kwargs):
+    global _backend
+    if setting == 'CATALOG_CACHE':
+        _backend = None
+
+
+def cached(name, load):
+    """
+    Function returns value of current catalog version from cache,
+    or loads and caches it. Missing objects (None) are not cached
+    """
+    key = 'catalogapp:catalog:{}:{}'.format(get_catalog_version(), name)
+    backend = get_backend()
+    value = backend.get(key, MISSING)
+    if value is MISSING:
+        value = load()
+        if value is not None:
+            backend.set(key, value)
+    return value
+
+
+def get_categories():
+    """Function returns list of all categories"""
+    return cached('categories', lambda: list(Category.objects.all()))
+
+
+def get_category(slug):
+    """Function returns category by slug or None"""
+    categories = cached('categories_by_slug', lambda: {category.slug: category for category in get_categories()})
+    return categories.get(slug)
+
+
+def get_product(slug):
+    """Function returns product with its category and specification by slug or None"""
+    return cached(
+        f'product:{slug}',
+        lambda: Product.objects.select_related('category', 'specification').filter(slug=slug).first()
+    )
+
+
+async def aget_category(slug):
+    """Function does the same as get_category() for async views, cache and ORM are used in thread"""
+    return await sync_to_async(get_category)(slug)
+
+
+async def aget_product(slug):
+    """Function does the same as get_product() for async views, cache and ORM are used in thread"""
+    return await sync_to_async(get_product)(slug)
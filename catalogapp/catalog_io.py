@@ -0,0 +1,292 @@
+"""
+Module contains bulk import and export of catalog products.
+
+Products are read and written as CSV or JSON Lines (one object per line)
+with columns of FIELDS. Files are processed in chunks of 'chunk_size'
+rows, so memory does not grow with size of file:
+
+- import upserts every chunk by slug with one bulk INSERT ... ON CONFLICT,
+  unknown categories are created by one bulk INSERT per chunk, images
+  are copied from directory to default storage
+- export reads products by iterator() and writes rows one by one
+
+Bulk statements do not send signals, so after every chunk search index is
+updated and thumbnails are scheduled, after import catalog version is bumped here
+"""
+
+import csv
+import json
+import os
+import time
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+
+from django.core.exceptions import ValidationError
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.core.validators import validate_slug
+from django.db import router, transaction
+
+from . import search
+from .models import Category, Product
+from .thumbnails import schedule_thumbnails
+from .utils import bump_catalog_version
+
+FIELDS = ('slug', 'name', 'category', 'category_name', 'price', 'description', 'image')
+
+FORMATS = ('csv', 'jsonl')
+
+UPDATED_FIELDS = ('category', 'name', 'description', 'price')
+
+DEFAULT_CHUNK_SIZE = 1000
+
+PRICE_FIELD = Product._meta.get_field('price')
+
+
+class RowError(ValueError):
+    """Error of row of imported file"""
+
+
+def detect_format(path, file_format=None):
+    """Function returns format of file: given one or that of file extension"""
+    file_format = file_format or os.path.splitext(path)[1].lstrip('.').lower()
+    if file_format == 'json':
+        file_format = 'jsonl'
+    if file_format not in FORMATS:
+        raise ValueError('Unknown format {!r}, expected one of: {}'.format(file_format, ', '.join(FORMATS)))
+    return file_format
+
+
+def read_rows(stream, file_format):
+    """Function yields (line number, row dictionary) of CSV or JSON Lines stream"""
+    if file_format == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+    else:
+        for number, line in enumerate(stream, 1):
+            if line.strip():
+                try:
+                    yield number, json.loads(line)
+                except ValueError as exc:
+                    yield number, RowError(f'invalid JSON: {exc}')
+
+
+def chunked(iterable, size):
+    """Function yields lists of at most size items of iterable"""
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def clean_row(row):
+    """Function validates row and returns dictionary of product values"""
+    if isinstance(row, Exception):
+        raise row
+    if not isinstance(row, dict):
+        raise RowError('row is not an object')
+    values = {field: str(row.get(field) or '').strip() for field in FIELDS}
+    for field in ('slug', 'name', 'category', 'price'):
+        if not values[field]:
+            raise RowError(f'{field} is required')
+    try:
+        price = Decimal(values['price'])
+    except InvalidOperation:
+        price = None
+    if price is None or not price.is_finite():
+        raise RowError('price {!r} is not a number'.format(values['price']))
+    if price < 0:
+        raise RowError('price {!r} is negative'.format(values['price']))
+    try:
+        values['price'] = PRICE_FIELD.clean(price, None)
+    except ValidationError as exc:
+        raise RowError('price {!r}: {}'.format(values['price'], ' '.join(exc.messages)))
+    for field in ('slug', 'category'):
+        try:
+            validate_slug(values[field])
+        except ValidationError:
+            raise RowError('{} {!r} is not a valid slug'.format(field, values[field]))
+        if len(values[field]) > 50:
+            raise RowError(f'{field} is longer than 50 characters')
+    values['description'] = values['description'] or None
+    return values
+
+
+def same_content(stored, path):
+    """Function compares file of storage with local file chunk by chunk"""
+    if default_storage.size(stored) != os.path.getsize(path):
+        return False
+    with default_storage.open(stored) as stored_file, open(path, 'rb') as local_file:
+        for stored_chunk in stored_file.chunks():
+            if local_file.read(len(stored_chunk)) != stored_chunk:
+                return False
+    return True
+
+
+class CatalogImport:
+    """
+    Class imports chunks of rows: categories are resolved by one query
+    for all of chunk, products are created or updated by slug.
+    Existing image of product is kept when row has no image,
+    new product must have image
+    """
+
+    def __init__(self, images_dir=None, create_categories=True):
+        self.images_dir = images_dir
+        self.create_categories = create_categories
+        self.categories = dict(Category.objects.values_list('slug', 'id'))
+        self.created = 0
+        self.updated = 0
+        self.errors = []
+
+    @property
+    def imported(self):
+        return self.created + self.updated
+
+    def resolve_categories(self, rows):
+        """Function creates missing categories of rows by one statement"""
+        missing = {}
+        for values in rows:
+            if values['category'] not in self.categories:
+                missing.setdefault(values['category'], values['category_name'] or values['category'])
+        if not missing:
+            return
+        if self.create_categories:
+            Category.objects.bulk_create(
+                [Category(slug=slug, name=name) for slug, name in missing.items()], ignore_conflicts=True
+            )
+        self.categories.update(Category.objects.filter(slug__in=missing).values_list('slug', 'id'))
+
+    def attach_image(self, name):
+        """
+        Function copies image from images directory to storage and returns its name in storage.
+        Stored file of the same name is reused only when it has the same bytes,
+        otherwise storage picks free name, so images of other products are never replaced
+        """
+        path = os.path.join(self.images_dir, name)
+        if not os.path.isfile(path):
+            raise RowError(f'image {name!r} is not found in {self.images_dir}')
+        stored = os.path.basename(name)
+        if default_storage.exists(stored) and same_content(stored, path):
+            return stored
+        with open(path, 'rb') as image:
+            return default_storage.save(stored, File(image))
+
+    def make_product(self, values):
+        if values['category'] not in self.categories:
+            raise RowError('category {!r} does not exist'.format(values['category']))
+        image = values['image']
+        if image and self.images_dir:
+            image = self.attach_image(image)
+        return Product(
+            slug=values['slug'], name=values['name'], category_id=self.categories[values['category']],
+            price=values['price'], description=values['description'], image=image
+        )
+
+    def import_chunk(self, numbered_rows):
+        """Function imports list of (line number, row) and returns count of imported products"""
+        rows = {}
+        for number, row in numbered_rows:
+            try:
+                values = clean_row(row)
+            except RowError as exc:
+                self.errors.append((number, str(exc)))
+                continue
+            # Later row of the same slug wins, as it would with row by row import
+            rows[values['slug']] = (number, values)
+        self.resolve_categories(values for number, values in rows.values())
+
+        slugs = [values['slug'] for number, values in rows.values()]
+        existing = set(Product.objects.filter(slug__in=slugs).values_list('slug', flat=True))
+        with_image, without_image = [], []
+        for number, values in rows.values():
+            try:
+                if not values['image'] and values['slug'] not in existing:
+                    raise RowError('image is required for new product')
+                product = self.make_product(values)
+            except RowError as exc:
+                self.errors.append((number, str(exc)))
+                continue
+            (with_image if product.image else without_image).append(product)
+
+        products = with_image + without_image
+        if not products:
+            return 0
+        slugs = [product.slug for product in products]
+        with transaction.atomic():
+            for objs, fields in ((with_image, UPDATED_FIELDS + ('image',)), (without_image, UPDATED_FIELDS)):
+                if objs:
+                    Product.objects.bulk_create(
+                        objs, update_conflicts=True, unique_fields=['slug'], update_fields=list(fields)
+                    )
+            if search.search_available():
+                # Rows are read by connection of the transaction, read replica does not see them yet
+                search.index_products(
+                    Product.objects.db_manager(router.db_for_write(Product)).filter(
+                        slug__in=slugs
+                    ).select_related('category')
+                )
+        if with_image:
+            schedule_thumbnails(*sorted({product.image.name for product in with_image}))
+        updated = len(existing.intersection(slugs))
+        self.created += len(products) - updated
+        self.updated += updated
+        return len(products)
+
+    def finish(self):
+        """Function does work of skipped signals once for whole import"""
+        if self.imported:
+            bump_catalog_version()
+
+
+def import_catalog(stream, file_format, chunk_size=DEFAULT_CHUNK_SIZE, images_dir=None,
+                   create_categories=True, progress=None):
+    """
+    Function imports products of CSV or JSON Lines stream and returns CatalogImport with counts and errors.
+    After every chunk progress(imported rows, seconds) is called
+    """
+    started = time.perf_counter()
+    catalog_import = CatalogImport(images_dir, create_categories)
+    for chunk in chunked(read_rows(stream, file_format), chunk_size):
+        catalog_import.import_chunk(chunk)
+        if progress:
+            progress(catalog_import.imported, time.perf_counter() - started)
+    catalog_import.finish()
+    return catalog_import
+
+
+def product_row(product):
+    return {
+        'slug': product.slug,
+        'name': product.name,
+        'category': product.category.slug,
+        'category_name': product.category.name,
+        'price': str(product.price),
+        'description': product.description or '',
+        'image': product.image.name or '',
+    }
+
+
+def export_catalog(stream, file_format, chunk_size=DEFAULT_CHUNK_SIZE, queryset=None, progress=None):
+    """
+    Function writes products to stream in CSV or JSON Lines format and returns their count.
+    Products are fetched by chunk_size rows, after every chunk progress(exported rows, seconds) is called
+    """
+    started = time.perf_counter()
+    queryset = Product.objects.all() if queryset is None else queryset
+    products = queryset.select_related('category').order_by('id').iterator(chunk_size=chunk_size)
+    if file_format == 'csv':
+        writer = csv.DictWriter(stream, FIELDS)
+        writer.writeheader()
+        write = writer.writerow
+    else:
+        def write(row):
+            stream.write(json.dumps(row, ensure_ascii=False) + '\n')
+    count = 0
+    for count, product in enumerate(products, 1):
+        write(product_row(product))
+        if progress and not count % chunk_size:
+            progress(count, time.perf_counter() - started)
+    if progress and count % chunk_size:
+        progress(count, time.perf_counter() - started)
+    return count
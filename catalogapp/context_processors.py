@@ -0,0 +1,23 @@
+"""
+Module contains context processors of catalogapp
+"""
+
+from django.conf import settings
+
+from .catalog_cache import get_categories
+from .utils import get_catalog_version
+
+
+def catalog(request):
+    """
+    Function adds categories and catalog version to context of every template.
+    Categories are taken from catalog cache only when template uses them,
+    so nothing is done when cached fragment is used.
+    'public_page' tells template to leave out per-user parts (see PublicPageMixin)
+    """
+    return {
+        'public_page': getattr(request, 'public_page', False),
+        'categories': get_categories,
+        'catalog_version': get_catalog_version,
+        'catalog_fragment_timeout': settings.CATALOG_FRAGMENT_TIMEOUT
+    }
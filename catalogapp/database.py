@@ -0,0 +1,20 @@
+"""
+Module contains tuning of database connections.
+
+SQLite connections get PRAGMA statements of their alias from
+CATALOG_SQLITE_PRAGMAS setting when they are opened (see signals.py)
+"""
+
+from django.conf import settings
+
+
+def apply_sqlite_pragmas(connection):
+    """Function runs PRAGMA statements of connection alias, in order of setting"""
+    if connection.vendor != 'sqlite':
+        return
+    pragmas = settings.CATALOG_SQLITE_PRAGMAS.get(connection.alias, {})
+    if not pragmas:
+        return
+    with connection.cursor() as cursor:
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
@@ -0,0 +1,105 @@
+"""
+Module contains faceted filtering of category products by price,
+heat output and fuel types.
+
+Facets of category (ranges and counts) are calculated by one aggregate
+query and cached by catalog version, so they are recalculated only
+after products or specifications are changed
+"""
+
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Max, Min, Q
+
+from .utils import aget_catalog_version, get_catalog_version
+
+
+RANGE_FILTERS = (
+    ('price', 'price'),
+    ('heat_output', 'specification__heat_output'),
+)
+
+FUEL_FILTERS = (
+    ('gas', 'specification__fuel_gas', 'Natural gas'),
+    ('diesel', 'specification__fuel_diesel', 'Diesel'),
+    ('oil', 'specification__fuel_oil', 'Oil'),
+)
+
+
+def get_category_facets(category):
+    """Function returns ranges and fuel counts of category products"""
+    key = facets_cache_key(category, get_catalog_version())
+    facets = cache.get(key)
+    if facets is None:
+        facets = make_facets(category.product_set.aggregate(**facets_aggregates()))
+        cache.set(key, facets, settings.CATALOG_FRAGMENT_TIMEOUT)
+    return facets
+
+
+async def aget_category_facets(category):
+    """Function does the same as get_category_facets() with async ORM and cache API"""
+    key = facets_cache_key(category, await aget_catalog_version())
+    facets = await cache.aget(key)
+    if facets is None:
+        facets = make_facets(await category.product_set.aaggregate(**facets_aggregates()))
+        await cache.aset(key, facets, settings.CATALOG_FRAGMENT_TIMEOUT)
+    return facets
+
+
+def facets_cache_key(category, version):
+    return 'catalogapp:facets:{}:{}'.format(category.pk, version)
+
+
+def facets_aggregates():
+    """Function returns aggregates of all facets, they are calculated by one query"""
+    aggregates = {}
+    for name, lookup in RANGE_FILTERS:
+        aggregates[f'{name}_min'] = Min(lookup)
+        aggregates[f'{name}_max'] = Max(lookup)
+    for name, lookup, label in FUEL_FILTERS:
+        aggregates[f'fuel_{name}'] = Count('id', filter=Q(**{lookup: True}))
+    return aggregates
+
+
+def make_facets(data):
+    """Function turns result of facets aggregate to ranges and fuel counts"""
+    return {
+        'ranges': {
+            name: {'min': data[f'{name}_min'], 'max': data[f'{name}_max']}
+            for name, lookup in RANGE_FILTERS
+        },
+        'fuels': [
+            {'name': name, 'label': label, 'count': data[f'fuel_{name}']}
+            for name, lookup, label in FUEL_FILTERS
+        ]
+    }
+
+
+def parse_decimal(value):
+    """Function returns Decimal of GET parameter or None when it is empty, invalid or not finite"""
+    try:
+        value = Decimal(value) if value else None
+    except InvalidOperation:
+        return None
+    return value if value is not None and value.is_finite() else None
+
+
+def filter_products(queryset, params):
+    """
+    Function applies filters from GET parameters to products:
+    '<facet>_min' and '<facet>_max' for ranges, 'fuel' (repeated) for fuel types
+    """
+    for name, lookup in RANGE_FILTERS:
+        minimum = parse_decimal(params.get(f'{name}_min'))
+        maximum = parse_decimal(params.get(f'{name}_max'))
+        if minimum is not None:
+            queryset = queryset.filter(**{f'{lookup}__gte': minimum})
+        if maximum is not None:
+            queryset = queryset.filter(**{f'{lookup}__lte': maximum})
+    fuels = params.getlist('fuel')
+    for name, lookup, label in FUEL_FILTERS:
+        if name in fuels:
+            queryset = queryset.filter(**{lookup: True})
+    return queryset
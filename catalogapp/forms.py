@@ -16,7 +16,7 @@ class OrderForm(forms.ModelForm):
     class Meta:
         model = Order
         fields = (
-           'user', 'order_type', 'order_date', 'comment'
+           'order_type', 'order_date', 'comment'
         )
 
 
@@ -0,0 +1,67 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from catalogapp.benchmark import (
+    benchmark_database, benchmark_report, compare_results, run_benchmark, seed_catalog, seed_users
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Measures latency, queries and throughput of catalog and checkout endpoints '
+        'on synthetic catalog in test database'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--categories', type=int, default=10, help='Count of seeded categories')
+        parser.add_argument('--products', type=int, default=1000, help='Count of seeded products')
+        parser.add_argument('--users', type=int, default=20, help='Count of seeded users')
+        parser.add_argument('--selection-size', type=int, default=5, help='Count of products in every selection')
+        parser.add_argument('--orders', type=int, default=10, help='Count of orders of every user')
+        parser.add_argument('--requests', type=int, default=50, help='Count of measured requests per endpoint')
+        parser.add_argument('--warmup', type=int, default=5, help='Count of not measured requests per endpoint')
+        parser.add_argument('--endpoint', action='append', help='Measure only given endpoint (repeatable)')
+        parser.add_argument('--output', help='Save results to JSON file')
+        parser.add_argument('--compare', help='Compare results with JSON file of previous run')
+        parser.add_argument(
+            '--threshold', type=float, default=0.2,
+            help='Allowed relative growth of latency before it is reported as regression'
+        )
+
+    def handle(self, *args, **options):
+        with benchmark_database():
+            seed_catalog(options['categories'], options['products'])
+            seed_users(options['users'], options['selection_size'], options['orders'])
+            results = run_benchmark(options['requests'], options['warmup'], options['endpoint'])
+        report = benchmark_report(results, **{
+            name: options[name] for name in (
+                'categories', 'products', 'users', 'selection_size', 'orders', 'requests', 'warmup'
+            )
+        })
+
+        self.stdout.write('{:<24} {:>9} {:>9} {:>9} {:>8} {:>10}'.format(
+            'endpoint', 'p50 ms', 'p95 ms', 'p99 ms', 'queries', 'req/s'
+        ))
+        for name, result in results.items():
+            self.stdout.write('{:<24} {:>9.2f} {:>9.2f} {:>9.2f} {:>8.1f} {:>10.1f}{}'.format(
+                name, result['p50_ms'], result['p95_ms'], result['p99_ms'], result['queries'],
+                result['throughput'], '  ({} errors)'.format(result['errors']) if result['errors'] else ''
+            ))
+
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(report, output, indent=2)
+            self.stdout.write(f'Results are saved to {options["output"]}')
+
+        if options['compare']:
+            with open(options['compare']) as baseline_file:
+                baseline = json.load(baseline_file)
+            rows, regressions = compare_results(baseline, report, options['threshold'])
+            self.stdout.write('Compared with {}'.format(baseline.get('commit') or options['compare']))
+            for name, metric, before, after, change in rows:
+                self.stdout.write('{:<24} {:<8} {:>9.2f} -> {:>9.2f} {:>+7.0%}'.format(
+                    name, metric, before, after, change
+                ))
+            if regressions:
+                raise CommandError('Regressions: {}'.format(', '.join(regressions)))
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from catalogapp.benchmark import benchmark_database, catalog_paths, run_asgi, run_wsgi, seed_catalog
+
+
+class Command(BaseCommand):
+    help = 'Compares throughput of catalog pages served by sync views (WSGI) and async views (ASGI)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--categories', type=int, default=5, help='Count of seeded categories')
+        parser.add_argument('--products', type=int, default=200, help='Count of seeded products')
+        parser.add_argument('--requests', type=int, default=400, help='Count of requests of every handler')
+        parser.add_argument('--concurrency', type=int, default=8, help='Count of concurrent clients')
+
+    def handle(self, *args, **options):
+        with benchmark_database():
+            seed_catalog(options['categories'], options['products'])
+            paths = catalog_paths()
+            run_wsgi(paths, len(paths), 1)
+            run_asgi(paths, len(paths), 1)
+            for name, run in (('WSGI (sync views)', run_wsgi), ('ASGI (async views)', run_asgi)):
+                elapsed = run(paths, options['requests'], options['concurrency'])
+                self.stdout.write('{:<20} {:>8.1f} requests/s'.format(name, options['requests'] / elapsed))
@@ -0,0 +1,35 @@
+import os
+import tempfile
+from contextlib import nullcontext
+
+from django.core.management.base import BaseCommand
+
+from catalogapp.benchmark import (
+    benchmark_database, production_database_mode, run_concurrent_cart, seed_catalog, seed_users
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Compares default and production SQLite modes under concurrent cart writes '
+        'on synthetic catalog in temporary database file'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=200, help='Count of seeded products')
+        parser.add_argument('--threads', type=int, default=8, help='Count of concurrent users')
+        parser.add_argument('--operations', type=int, default=30, help='Count of cart operations of every user')
+
+    def handle(self, *args, **options):
+        self.stdout.write('{:<12} {:>9} {:>7} {:>9} {:>9} {:>9}'.format(
+            'mode', 'req/s', 'errors', 'p50 ms', 'p95 ms', 'p99 ms'
+        ))
+        for mode, context in (('default', nullcontext), ('production', production_database_mode)):
+            with tempfile.TemporaryDirectory() as directory, context():
+                with benchmark_database(os.path.join(directory, 'benchmark.sqlite3')):
+                    seed_catalog(5, options['products'])
+                    seed_users(options['threads'], 0, 0)
+                    result = run_concurrent_cart(options['threads'], options['operations'])
+            self.stdout.write('{:<12} {:>9.1f} {:>7} {:>9.2f} {:>9.2f} {:>9.2f}'.format(
+                mode, result['throughput'], result['errors'], result['p50_ms'], result['p95_ms'], result['p99_ms']
+            ))
@@ -0,0 +1,33 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from catalogapp.benchmark import benchmark_database, run_session_benchmark, seed_catalog, seed_users
+
+
+class Command(BaseCommand):
+    help = (
+        'Compares SQL statements and database writes per cart operation '
+        'in session and message storage modes (CATALOG_SESSION_MODES)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--operations', type=int, default=20, help='Count of add/change/remove cycles per mode')
+        parser.add_argument(
+            '--mode', action='append', choices=list(settings.CATALOG_SESSION_MODES),
+            help='Measure only given mode (repeatable)'
+        )
+
+    def handle(self, *args, **options):
+        with benchmark_database():
+            seed_catalog(2, options['operations'])
+            seed_users(1, 0, 0)
+            results = run_session_benchmark(options['mode'], options['operations'])
+        self.stdout.write('Per cart operation:')
+        self.stdout.write('{:<10} {:>10} {:>7} {:>16} {:>15} {:>8}'.format(
+            'mode', 'statements', 'writes', 'session queries', 'session writes', 'mean ms'
+        ))
+        for mode, result in results.items():
+            self.stdout.write('{:<10} {:>10.2f} {:>7.2f} {:>16.2f} {:>15.2f} {:>8.2f}'.format(
+                mode, result['statements'], result['writes'], result['session_statements'],
+                result['session_writes'], result['mean_ms']
+            ))
@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from catalogapp.benchmark import benchmark_database, endpoint_clients, seed_catalog, seed_users
+from catalogapp.query_plans import explain_endpoint
+
+
+class Command(BaseCommand):
+    help = 'Runs EXPLAIN QUERY PLAN on queries of every view and reports full table scans (SQLite)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=500, help='Count of seeded products')
+        parser.add_argument('--endpoint', action='append', help='Explain only given endpoint (repeatable)')
+        parser.add_argument(
+            '--no-seed', action='store_true',
+            help='Use current database as is (e.g. in tests) instead of seeded test database'
+        )
+        parser.add_argument('--plans', action='store_true', help='Print plans of all queries')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('Query plans are checked on SQLite only')
+        if options['no_seed']:
+            scans = self.explain(options)
+        else:
+            with benchmark_database():
+                seed_catalog(10, options['products'])
+                seed_users(5, 5, 5)
+                scans = self.explain(options)
+        if scans:
+            raise CommandError(f'{scans} queries read whole tables')
+        self.stdout.write(self.style.SUCCESS('No full table scans'))
+
+    def explain(self, options):
+        """Function prints plans of endpoints and returns count of queries with full scans"""
+        scans = 0
+        for endpoint, client in endpoint_clients(options['endpoint']):
+            for number in range(2):
+                report = explain_endpoint(endpoint, client, number)
+            self.stdout.write(f'{endpoint.name}: {len(report)} queries')
+            for statement in report:
+                if statement['full_scans']:
+                    scans += 1
+                    self.stdout.write(self.style.WARNING('  full scan: {}'.format('; '.join(statement['full_scans']))))
+                    self.stdout.write(f'    {statement["sql"]}')
+                elif options['plans']:
+                    self.stdout.write('  {}'.format('; '.join(statement['plan'])))
+                    self.stdout.write(f'    {statement["sql"]}')
+        return scans
@@ -0,0 +1,47 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from catalogapp.catalog_io import DEFAULT_CHUNK_SIZE, FORMATS, detect_format, export_catalog
+from catalogapp.models import Product
+
+
+class Command(BaseCommand):
+    help = 'Exports products to CSV or JSON Lines file, products are fetched from database in chunks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Exported file, '-' for standard output")
+        parser.add_argument('--format', choices=FORMATS, help='Format of file, by default by its extension')
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help='Count of rows per fetch')
+        parser.add_argument('--category', action='append', help='Export only products of category slug (repeatable)')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if path == '-' and not options['format']:
+            raise CommandError('--format is required for standard output')
+        try:
+            file_format = detect_format(path, options['format'])
+        except ValueError as exc:
+            raise CommandError(exc)
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size must be positive')
+
+        queryset = Product.objects.all()
+        if options['category']:
+            queryset = queryset.filter(category__slug__in=options['category'])
+
+        # Progress goes to stderr, so that standard output stays a valid file
+        def progress(count, seconds):
+            self.stderr.write('{} products exported, {:.0f} rows/s'.format(count, count / seconds if seconds else 0))
+
+        stream = sys.stdout if path == '-' else open(path, 'w', newline='', encoding='utf-8')
+        try:
+            count = export_catalog(
+                stream, file_format, options['chunk_size'], queryset,
+                progress if options['verbosity'] > 0 else None
+            )
+        finally:
+            if stream is not sys.stdout:
+                stream.close()
+        if stream is not sys.stdout:
+            self.stdout.write(self.style.SUCCESS(f'{count} products exported to {path}'))
@@ -0,0 +1,44 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from catalogapp.catalog_io import chunked
+from catalogapp.models import Product
+from catalogapp.thumbnails import generate_thumbnails, record_renditions
+
+
+class Command(BaseCommand):
+    help = 'Generates missing or outdated renditions of product images'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Regenerate all renditions')
+        parser.add_argument(
+            '--workers', type=int, default=settings.CATALOG_THUMBNAIL_WORKERS or 1,
+            help='Count of worker threads'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=100,
+            help='Count of images after which products are marked and catalog version is bumped'
+        )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        image_names = sorted(set(Product.objects.exclude(image='').values_list('image', flat=True)))
+        generated = marked = 0
+        with ThreadPoolExecutor(max_workers=options['workers']) as executor:
+            for batch in chunked(image_names, options['batch_size']):
+                counts = list(executor.map(
+                    lambda image_name: generate_thumbnails(image_name, force=options['force']),
+                    batch
+                ))
+                generated += sum(count for count in counts if count)
+                marked += record_renditions([
+                    image_name for image_name, count in zip(batch, counts) if count is not None
+                ])
+        self.stdout.write(self.style.SUCCESS(
+            '{} renditions of {} images generated, {} products marked in {:.1f}s'.format(
+                generated, len(image_names), marked, time.monotonic() - started
+            )
+        ))
@@ -0,0 +1,62 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from catalogapp.catalog_io import DEFAULT_CHUNK_SIZE, FORMATS, detect_format, import_catalog
+from catalogapp.pricing import reprice_selections
+
+
+class Command(BaseCommand):
+    help = (
+        'Imports products from CSV or JSON Lines file in chunks: products are created '
+        'or updated by slug, missing categories are created, images are copied from directory'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Imported file, '-' for standard input")
+        parser.add_argument('--format', choices=FORMATS, help='Format of file, by default by its extension')
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help='Count of rows per statement')
+        parser.add_argument('--images', help='Directory with images named in image column')
+        parser.add_argument(
+            '--no-create-categories', action='store_false', dest='create_categories',
+            help='Skip rows of unknown categories instead of creating them'
+        )
+        parser.add_argument(
+            '--reprice', action='store_true', help='Reprice open selections after import (see reprice_selections)'
+        )
+        parser.add_argument('--max-errors', type=int, default=20, help='Count of reported row errors')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if path == '-' and not options['format']:
+            raise CommandError('--format is required for standard input')
+        try:
+            file_format = detect_format(path, options['format'])
+        except ValueError as exc:
+            raise CommandError(exc)
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size must be positive')
+
+        def progress(count, seconds):
+            self.stdout.write('{} products imported, {:.0f} rows/s'.format(count, count / seconds if seconds else 0))
+
+        stream = sys.stdin if path == '-' else open(path, newline='', encoding='utf-8')
+        try:
+            result = import_catalog(
+                stream, file_format, options['chunk_size'], options['images'],
+                options['create_categories'], progress if options['verbosity'] > 0 else None
+            )
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+        for line, error in result.errors[:options['max_errors']]:
+            self.stderr.write(f'Line {line}: {error}')
+        if len(result.errors) > options['max_errors']:
+            self.stderr.write('... {} more errors'.format(len(result.errors) - options['max_errors']))
+        self.stdout.write(self.style.SUCCESS(
+            f'{result.created} products created, {result.updated} updated, {len(result.errors)} rows skipped'
+        ))
+        if options['reprice'] and result.imported:
+            reprice = reprice_selections()
+            self.stdout.write(f'{reprice.items} items repriced, {reprice.selections} selections changed')
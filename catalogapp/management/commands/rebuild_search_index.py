@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from catalogapp.search import rebuild_index, search_available
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds full-text search index of products'
+
+    def handle(self, *args, **options):
+        if not search_available():
+            raise CommandError('Search index is available only with SQLite database')
+        count = rebuild_index()
+        self.stdout.write(self.style.SUCCESS(f'{count} products indexed'))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from catalogapp.models import Product
+from catalogapp.pricing import reprice_selections
+
+
+class Command(BaseCommand):
+    help = 'Updates prices of items and totals of open selections to current prices of products'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--product', action='append', help='Reprice only items of product slug (repeatable)')
+
+    def handle(self, *args, **options):
+        products = None
+        if options['product']:
+            products = Product.objects.filter(slug__in=options['product'])
+        result = reprice_selections(products)
+        self.stdout.write(self.style.SUCCESS(
+            f'{result.items} items repriced, {result.selections} selections changed'
+        ))
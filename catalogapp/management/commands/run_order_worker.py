@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from catalogapp.orders import process_jobs
+
+
+class Command(BaseCommand):
+    help = 'Processes queued orders (quote, notification) till it is stopped'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Process due jobs and exit')
+        parser.add_argument('--poll-interval', type=float, default=2, help='Seconds between queue checks')
+        parser.add_argument('--batch', type=int, default=20, help='Count of jobs taken per check')
+
+    def handle(self, *args, **options):
+        while True:
+            processed = process_jobs(limit=options['batch'])
+            if processed:
+                self.stdout.write('{} orders processed'.format(processed))
+            if options['once']:
+                break
+            if processed < options['batch']:
+                time.sleep(options['poll_interval'])
@@ -0,0 +1,183 @@
+"""
+Module contains in-process metrics of requests.
+
+MetricsMiddleware measures every request: duration, count and duration
+of SQL queries and template render time are added to histograms labelled
+by view name. Histograms have fixed buckets, so recording is a couple of
+additions under lock. They are exposed in Prometheus text format by
+MetricsView ('/metrics'); every worker process keeps its own histograms.
+
+Queries are counted by execute wrapper which is installed to every
+database connection (see signals.py), template render time is measured
+by InstrumentedDjangoTemplates backend (TEMPLATES setting)
+"""
+
+import bisect
+import heapq
+import threading
+import time
+from contextvars import ContextVar
+
+from django.template import TemplateDoesNotExist
+from django.template.backends import django as django_backend
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+
+# Methods of method label, others are counted as 'other', so that clients cannot add series
+METHODS = frozenset(('GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'))
+
+current_request = ContextVar('catalogapp_request_metrics', default=None)
+
+
+class Histogram:
+    """Class counts observed values in fixed buckets, separately for every set of label values"""
+
+    def __init__(self, name, documentation, labels, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.buckets = buckets
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        """Function adds value to histogram of given label values"""
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            series = self.series.get(label_values)
+            if series is None:
+                series = self.series[label_values] = [[0] * (len(self.buckets) + 1), 0]
+            series[0][index] += 1
+            series[1] += value
+
+    def clear(self):
+        with self.lock:
+            self.series = {}
+
+    def expose(self):
+        """Function returns lines of histogram in Prometheus text format"""
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        with self.lock:
+            series = [(label_values, list(counts), total) for label_values, (counts, total) in self.series.items()]
+        for label_values, counts, total in sorted(series):
+            labels = ','.join(
+                '{}="{}"'.format(label, escape_label(value)) for label, value in zip(self.labels, label_values)
+            )
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += count
+                lines.append('{}_bucket{{{}{}le="{}"}} {}'.format(
+                    self.name, labels, ',' if labels else '', bound, cumulative
+                ))
+            lines.append(f'{self.name}_sum{{{labels}}} {total}')
+            lines.append(f'{self.name}_count{{{labels}}} {cumulative}')
+        return lines
+
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+REQUEST_DURATION = Histogram(
+    'catalog_request_duration_seconds', 'Duration of request', ('view', 'method', 'status')
+)
+REQUEST_QUERIES = Histogram(
+    'catalog_request_queries', 'Count of SQL queries per request', ('view',), QUERY_BUCKETS
+)
+REQUEST_SQL_DURATION = Histogram(
+    'catalog_request_sql_duration_seconds', 'Total duration of SQL queries per request', ('view',)
+)
+TEMPLATE_RENDER_DURATION = Histogram(
+    'catalog_template_render_seconds', 'Duration of template rendering per request', ('view',)
+)
+
+HISTOGRAMS = (REQUEST_DURATION, REQUEST_QUERIES, REQUEST_SQL_DURATION, TEMPLATE_RENDER_DURATION)
+
+
+def expose_metrics():
+    """Function returns all metrics in Prometheus text format"""
+    lines = []
+    for histogram in HISTOGRAMS:
+        lines.extend(histogram.expose())
+    return '\n'.join(lines) + '\n'
+
+
+def method_label(method):
+    """Function returns value of method label of HTTP method"""
+    return method if method in METHODS else 'other'
+
+
+class RequestMetrics:
+    """
+    Class collects measurements of one request.
+    SQL of only keep_sql slowest queries is kept (heap of (duration, sql)),
+    none when slow requests are not logged
+    """
+
+    def __init__(self, keep_sql=0):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.sql_duration = 0
+        self.template_duration = 0
+        self.rendering = 0
+        self.keep_sql = keep_sql
+        self.statements = []
+
+    @property
+    def duration(self):
+        return time.perf_counter() - self.started
+
+
+def record_query(execute, sql, params, many, context):
+    """Execute wrapper of database connections, it counts queries of current request"""
+    metrics = current_request.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duration = time.perf_counter() - started
+        metrics.queries += 1
+        metrics.sql_duration += duration
+        if len(metrics.statements) < metrics.keep_sql:
+            heapq.heappush(metrics.statements, (duration, sql))
+        elif metrics.keep_sql and duration > metrics.statements[0][0]:
+            heapq.heapreplace(metrics.statements, (duration, sql))
+
+
+def install_query_recorder(connection):
+    """Function adds record_query to wrappers of database connection"""
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+class Template(django_backend.Template):
+    """Template measures its rendering, templates rendered inside of it are not counted twice"""
+
+    def render(self, context=None, request=None):
+        metrics = current_request.get()
+        if metrics is None:
+            return super().render(context, request)
+        metrics.rendering += 1
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            metrics.rendering -= 1
+            if not metrics.rendering:
+                metrics.template_duration += time.perf_counter() - started
+
+
+class InstrumentedDjangoTemplates(django_backend.DjangoTemplates):
+    """Django templates backend which templates report render time to metrics of request"""
+
+    def from_string(self, template_code):
+        return Template(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return Template(self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            django_backend.reraise(exc, self)
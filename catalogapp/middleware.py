@@ -0,0 +1,96 @@
+"""
+Module contains middleware of catalogapp
+"""
+
+import logging
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.utils.cache import patch_cache_control
+from django.utils.deprecation import MiddlewareMixin
+
+from .metrics import (
+    REQUEST_DURATION, REQUEST_QUERIES, REQUEST_SQL_DURATION, TEMPLATE_RENDER_DURATION,
+    RequestMetrics, current_request, method_label
+)
+
+logger = logging.getLogger('catalogapp.metrics')
+
+
+class MetricsMiddleware:
+    """
+    Middleware records duration, SQL queries and template render time
+    of every request to histograms of its view (see metrics.py).
+    Requests slower than METRICS_SLOW_REQUEST_SECONDS are logged
+    with the slowest SQL statements.
+
+    It should be the first middleware, so that whole request is measured.
+    It works both under WSGI and ASGI without switching threads
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        metrics, token = self.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            current_request.reset(token)
+        self.finish(request, response, metrics)
+        return response
+
+    async def __acall__(self, request):
+        metrics, token = self.start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_request.reset(token)
+        self.finish(request, response, metrics)
+        return response
+
+    @staticmethod
+    def start():
+        keep_sql = settings.METRICS_SLOW_REQUEST_STATEMENTS if settings.METRICS_SLOW_REQUEST_SECONDS is not None else 0
+        metrics = RequestMetrics(keep_sql=keep_sql)
+        return metrics, current_request.set(metrics)
+
+    @staticmethod
+    def finish(request, response, metrics):
+        """Function adds measurements of request to histograms and logs slow request"""
+        duration = metrics.duration
+        match = request.resolver_match
+        view = match.view_name if match else 'unresolved'
+        REQUEST_DURATION.observe(duration, view, method_label(request.method), response.status_code)
+        REQUEST_QUERIES.observe(metrics.queries, view)
+        REQUEST_SQL_DURATION.observe(metrics.sql_duration, view)
+        TEMPLATE_RENDER_DURATION.observe(metrics.template_duration, view)
+        threshold = settings.METRICS_SLOW_REQUEST_SECONDS
+        if threshold is not None and duration >= threshold:
+            statements = sorted(metrics.statements, reverse=True)
+            logger.warning(
+                'Slow request %s %s (%s): %.3fs, %d queries in %.3fs, templates %.3fs%s',
+                request.method, request.path, view, duration, metrics.queries,
+                metrics.sql_duration, metrics.template_duration,
+                ''.join('\n  %.3fs %s' % statement for statement in statements)
+            )
+
+
+class PrivateCacheControlMiddleware(MiddlewareMixin):
+    """
+    Middleware marks responses without Cache-Control as private, so that
+    shared caches (proxy, Django cache middleware) store only pages
+    which are made public on purpose (see PublicPageMixin).
+    It is enabled with CATALOG_PUBLIC_CACHE_TIMEOUT setting
+    """
+
+    def process_response(self, request, response):
+        if not response.has_header('Cache-Control'):
+            patch_cache_control(response, private=True, no_cache=True)
+        return response
@@ -0,0 +1,39 @@
+# Generated by Django 4.2.30 on 2026-10-17 12:51
+
+from django.db import migrations, models
+
+
+def copy_selection_totals(apps, schema_editor):
+    """Stored totals of existing orders are taken from their selections"""
+    Order = apps.get_model('catalogapp', 'Order')
+    Selection = apps.get_model('catalogapp', 'Selection')
+    selection = Selection.objects.filter(pk=models.OuterRef('selection_id'))
+    Order.objects.filter(selection__isnull=False).update(
+        total_products=models.Subquery(selection.values('total_products')[:1]),
+        final_price=models.Subquery(selection.values('final_price')[:1])
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalogapp', '0002_product_keyset_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='final_price',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=9, verbose_name='Total cost'),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='total_products',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['user', 'created_at'], name='order_user_created_at_idx'),
+        ),
+        migrations.RunPython(copy_selection_totals, migrations.RunPython.noop),
+    ]
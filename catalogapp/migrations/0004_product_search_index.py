@@ -0,0 +1,34 @@
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    """Search index is FTS5 virtual table, so it is created only on SQLite"""
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(
+        "CREATE VIRTUAL TABLE catalogapp_product_fts USING fts5("
+        "name, description, category, tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+    )
+    schema_editor.execute(
+        'INSERT INTO catalogapp_product_fts (rowid, name, description, category) '
+        'SELECT product.id, product.name, product.description, category.name '
+        'FROM catalogapp_product product '
+        'JOIN catalogapp_category category ON category.id = product.category_id'
+    )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute('DROP TABLE IF EXISTS catalogapp_product_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalogapp', '0003_order_totals'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 4.2.30 on 2026-10-17 12:53
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalogapp', '0004_product_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductSpecification',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('manufacturer', models.CharField(blank=True, max_length=255, verbose_name='Manufacturer')),
+                ('fuel_gas', models.BooleanField(default=False, verbose_name='Using natural gas')),
+                ('fuel_diesel', models.BooleanField(default=False, verbose_name='Using diesel')),
+                ('fuel_oil', models.BooleanField(default=False, verbose_name='Using oil')),
+                ('heat_output', models.DecimalField(blank=True, decimal_places=2, max_digits=9, null=True, verbose_name='Heat power (output), kW')),
+                ('heat_input', models.DecimalField(blank=True, decimal_places=2, max_digits=9, null=True, verbose_name='Heat power (input), kW')),
+                ('max_pressure', models.DecimalField(blank=True, decimal_places=2, max_digits=6, null=True, verbose_name='Max permissible operating pressure, bar')),
+                ('gas_pressure', models.DecimalField(blank=True, decimal_places=3, max_digits=6, null=True, verbose_name='Operation gas pressure, bar')),
+                ('is_modulated', models.BooleanField(default=False, verbose_name='Modulation available')),
+                ('gas_passes_count', models.PositiveIntegerField(blank=True, null=True, verbose_name='Count of gas passes')),
+                ('water_press_loss', models.DecimalField(blank=True, decimal_places=3, max_digits=9, null=True, verbose_name='Hidraulic resistance, mbar')),
+                ('flue_gas_press_loss', models.DecimalField(blank=True, decimal_places=3, max_digits=9, null=True, verbose_name='Aerodynamic resistance, mbar')),
+                ('weight', models.DecimalField(blank=True, decimal_places=2, max_digits=9, null=True, verbose_name='Weight, kgs')),
+                ('electro_power', models.DecimalField(blank=True, decimal_places=2, max_digits=9, null=True, verbose_name='Power, kW')),
+                ('inlet_diameter', models.CharField(blank=True, max_length=50, verbose_name='Inlet diameter, mms')),
+                ('outlet_diameter', models.CharField(blank=True, max_length=50, verbose_name='Outlet diameter, mms')),
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='specification', to='catalogapp.product', verbose_name='Product')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['heat_output'], name='specification_heat_output_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 4.2.30 on 2026-10-17 12:57
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalogapp', '0005_product_specification'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SelectionMutation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=64, verbose_name='Idempotency key')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Date of mutation')),
+                ('selection', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='catalogapp.selection', verbose_name='Selection')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='selectionmutation',
+            constraint=models.UniqueConstraint(fields=('selection', 'key'), name='unique_selection_mutation_key'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.30 on 2026-10-17 12:58
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalogapp', '0006_selection_mutation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('pending', 'Waiting for worker'), ('running', 'Processed by worker'), ('done', 'Done'), ('failed', 'Failed')], default='pending', max_length=100, verbose_name='Job status')),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='Count of attempts')),
+                ('run_after', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Not run before')),
+                ('last_error', models.TextField(blank=True, verbose_name='Last error')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Date of job creation')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Date of job update')),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='jobs', to='catalogapp.order', verbose_name='Order')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'run_after'], name='orderjob_status_run_after_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,56 @@
+from django.db import migrations, models
+
+
+def merge_duplicate_userclasses(apps, schema_editor):
+    """Users with several UserClass rows keep the first one, selections and orders are moved to it"""
+    UserClass = apps.get_model('catalogapp', 'UserClass')
+    Selection = apps.get_model('catalogapp', 'Selection')
+    SelectedProduct = apps.get_model('catalogapp', 'SelectedProduct')
+    Order = apps.get_model('catalogapp', 'Order')
+    duplicated_users = UserClass.objects.values('user').annotate(count=models.Count('id')).filter(count__gt=1)
+    for row in duplicated_users:
+        owners = list(UserClass.objects.filter(user=row['user']).order_by('id'))
+        kept, duplicates = owners[0], [owner.pk for owner in owners[1:]]
+        Selection.objects.filter(owner__in=duplicates).update(owner=kept)
+        SelectedProduct.objects.filter(user__in=duplicates).update(user=kept)
+        Order.objects.filter(user__in=duplicates).update(user=kept)
+        kept.orders.add(*Order.objects.filter(userclass__in=duplicates))
+        UserClass.objects.filter(pk__in=duplicates).delete()
+
+
+def merge_duplicate_selected_products(apps, schema_editor):
+    """Repeated products of selection are merged to one line with summed quantity"""
+    Selection = apps.get_model('catalogapp', 'Selection')
+    SelectedProduct = apps.get_model('catalogapp', 'SelectedProduct')
+    duplicated_lines = SelectedProduct.objects.values('selected_item', 'product').annotate(
+        count=models.Count('id')
+    ).filter(count__gt=1)
+    selections = set()
+    for row in duplicated_lines:
+        lines = list(SelectedProduct.objects.filter(
+            selected_item=row['selected_item'],
+            product=row['product']
+        ).order_by('id'))
+        kept = lines[0]
+        kept.qty = sum(line.qty for line in lines)
+        kept.final_price = sum(line.final_price for line in lines)
+        kept.save(update_fields=['qty', 'final_price'])
+        SelectedProduct.objects.filter(pk__in=[line.pk for line in lines[1:]]).delete()
+        selections.add(row['selected_item'])
+    for selection in Selection.objects.filter(pk__in=selections):
+        totals = selection.products.aggregate(count=models.Count('id'), price=models.Sum('final_price'))
+        selection.total_products = totals['count']
+        selection.final_price = totals['price'] or 0
+        selection.save(update_fields=['total_products', 'final_price'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalogapp', '0007_order_job'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_userclasses, migrations.RunPython.noop),
+        migrations.RunPython(merge_duplicate_selected_products, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.30 on 2026-10-17 13:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalogapp', '0008_merge_duplicates'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='selection',
+            index=models.Index(fields=['owner', 'in_order'], name='selection_owner_in_order_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='selection',
+            index=models.Index(condition=models.Q(('is_anonymous', True)), fields=['is_anonymous'], name='selection_anonymous_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='selectedproduct',
+            constraint=models.UniqueConstraint(fields=('selected_item', 'product'), name='unique_selected_product'),
+        ),
+        migrations.AddConstraint(
+            model_name='userclass',
+            constraint=models.UniqueConstraint(fields=('user',), name='unique_userclass_user'),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 4.2.30 on 2026-10-17 15:02
+
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.db import migrations, models
+
+CENT = Decimal('0.01')
+
+
+def copy_unit_prices(apps, schema_editor):
+    """
+    Unit price of existing items is the price they were added with: total cost divided by quantity.
+    It is computed in Python, SQLite divides whole numbers as integers
+    """
+    SelectedProduct = apps.get_model('catalogapp', 'SelectedProduct')
+    Product = apps.get_model('catalogapp', 'Product')
+    items = []
+    for item in SelectedProduct.objects.filter(qty__gt=0).only('id', 'qty', 'final_price').iterator(2000):
+        item.unit_price = (Decimal(item.final_price) / item.qty).quantize(CENT, ROUND_HALF_UP)
+        items.append(item)
+        if len(items) == 2000:
+            SelectedProduct.objects.bulk_update(items, ['unit_price'])
+            items = []
+    SelectedProduct.objects.bulk_update(items, ['unit_price'])
+    product_price = Product.objects.filter(pk=models.OuterRef('product_id')).values('price')[:1]
+    SelectedProduct.objects.filter(qty=0).update(unit_price=models.Subquery(product_price))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalogapp', '0009_access_pattern_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='selectedproduct',
+            name='unit_price',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=9, verbose_name='Unit price'),
+            preserve_default=False,
+        ),
+        migrations.RunPython(copy_unit_prices, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-17 13:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalogapp', '0010_selected_product_unit_price'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='thumbnail_source',
+            field=models.CharField(blank=True, default='', editable=False, max_length=100, verbose_name='Image of renditions'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-17 13:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalogapp', '0011_product_thumbnail_source'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='orderjob',
+            name='completed_steps',
+            field=models.JSONField(blank=True, default=list, verbose_name='Completed steps of pipeline'),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 4.2.30 on 2026-10-17 13:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalogapp', '0012_order_job_completed_steps'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.BigIntegerField(default=0, verbose_name='Version of catalog')),
+            ],
+        ),
+    ]
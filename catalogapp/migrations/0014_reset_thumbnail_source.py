@@ -0,0 +1,21 @@
+from django.db import migrations
+
+
+def reset_thumbnail_source(apps, schema_editor):
+    """
+    Renditions are now named with extension of original image, existing ones are not found by new names.
+    Products show original image until 'manage.py generate_thumbnails' makes renditions again
+    """
+    Product = apps.get_model('catalogapp', 'Product')
+    Product.objects.exclude(thumbnail_source='').update(thumbnail_source='')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalogapp', '0013_catalog_version'),
+    ]
+
+    operations = [
+        migrations.RunPython(reset_thumbnail_source, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,17 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db.models import Prefetch
+from django.http import JsonResponse
+from django.utils.cache import patch_cache_control
 from django.views.generic import View
 
-from .models import Category, Selection, UserClass
+from .anonymous import ANONYMOUS_SELECTION_COOKIE, AnonymousSelection
+from .models import Category, Order, SelectedProduct, Selection, UserClass
+from .pagination import KeysetPaginator
+
+
+SELECTION_SESSION_KEY = 'catalogapp_selection'
 
 
 class SelectionMixin(View):
@@ -14,18 +25,194 @@ class SelectionMixin(View):
         Function gets model checks is user authenticated and if not create new user.
         So it does with not authenticated user. Then returns a result of typical dispatch()
         """
+        if self.view_is_async:
+            return self.adispatch(request, *args, **kwargs)
+        self.selection = self.get_selection(request)
+        response = super().dispatch(request, *args, **kwargs)
+        return self.save_selection(request, response)
+
+    async def adispatch(self, request, *args, **kwargs):
+        """Function does the same as dispatch() for views with async handlers"""
+        self.selection = await self.aget_selection(request)
+        response = await super().dispatch(request, *args, **kwargs)
+        return self.save_selection(request, response)
+
+    def save_selection(self, request, response):
+        """Function writes changed selection of not authenticated visitor to cookie of response"""
         if request.user.is_authenticated:
-            user = UserClass.objects.filter(user=request.user).first()
-            if not user:
-                user = UserClass.objects.create(
-                    user=request.user
-                )
-            selection = Selection.objects.filter(owner=user, in_order=False).first()
-            if not selection:
-                selection = Selection.objects.create(owner=user)
+            if ANONYMOUS_SELECTION_COOKIE in request.COOKIES:
+                response.delete_cookie(ANONYMOUS_SELECTION_COOKIE)
+        elif self.selection.modified:
+            self.selection.save(response)
+        return response
+
+    def get_selection(self, request):
+        """
+        Function resolves current selection of request.
+
+        Ids of resolved UserClass and Selection are kept in session,
+        so warm requests of authenticated user cost one query.
+        Selection of not authenticated visitor is read from signed cookie
+        """
+        if not request.user.is_authenticated:
+            return AnonymousSelection.from_request(request)
+        queryset = self.cached_selection(request.user, request.session.get(SELECTION_SESSION_KEY))
+        selection = queryset.first() if queryset is not None else None
+        if not selection:
+            selection = self.resolve_selection(request.user)
+            self.remember_selection(request, selection)
+        return selection
+
+    async def aget_selection(self, request):
+        """
+        Function does the same as get_selection() with async ORM.
+        User and session are loaded by their sync backends in thread
+        """
+        if not await sync_to_async(lambda: request.user.is_authenticated)():
+            return AnonymousSelection.from_request(request)
+        cached = await sync_to_async(request.session.get)(SELECTION_SESSION_KEY)
+        queryset = self.cached_selection(request.user, cached)
+        selection = await queryset.afirst() if queryset is not None else None
+        if not selection:
+            selection = await sync_to_async(self.resolve_selection)(request.user)
+            self.remember_selection(request, selection)
+        return selection
+
+    @staticmethod
+    def cached_selection(user, cached):
+        """Function returns queryset of selection which ids are kept in session, if they belong to user"""
+        if not cached or cached.get('user') != user.pk:
+            return None
+        return Selection.objects.select_related('owner').filter(
+            pk=cached['selection'],
+            owner_id=cached['owner'],
+            in_order=False
+        )
+
+    @staticmethod
+    def remember_selection(request, selection):
+        """Function keeps ids of resolved selection in session"""
+        request.session[SELECTION_SESSION_KEY] = {
+            'user': request.user.pk,
+            'owner': selection.owner_id,
+            'selection': selection.pk
+        }
+
+    @staticmethod
+    def resolve_selection(user):
+        """
+        Function finds open selection of user in a single query
+        and creates UserClass and Selection only when they are missing
+        """
+        selection = Selection.objects.select_related('owner').filter(
+            owner__user=user,
+            in_order=False
+        ).first()
+        if not selection:
+            # UserClass is unique per user, get_or_create repeats lookup when first requests race
+            owner, created = UserClass.objects.get_or_create(user=user)
+            selection = Selection.objects.create(owner=owner)
+        return selection
+
+    def get_idempotency_key(self):
+        """Function returns idempotency key of cart mutation from header or parameter, if any"""
+        return (
+            self.request.headers.get('Idempotency-Key')
+            or self.request.POST.get('idempotency_key')
+            or self.request.GET.get('idempotency_key')
+        )
+
+    def forget_selection(self, request):
+        """Function drops cached selection ids, e.g. when selection went to order"""
+        request.session.pop(SELECTION_SESSION_KEY, None)
+
+
+class PublicPageMixin(SelectionMixin):
+    """
+    Class is used for catalog pages which are the same for every visitor.
+
+    With CATALOG_PUBLIC_CACHE_TIMEOUT set, GET request is served without
+    selection, session and messages: template leaves out per-user parts
+    (they are loaded by SelectionBadgeView) and response is sent with public
+    Cache-Control, so that caching proxy or Django cache middleware can serve
+    page to every visitor. Without the setting page is rendered as usual
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        if settings.CATALOG_PUBLIC_CACHE_TIMEOUT is None or request.method not in ('GET', 'HEAD'):
+            return super().dispatch(request, *args, **kwargs)
+        request.public_page = True
+        self.selection = None
+        # SelectionMixin.dispatch() is skipped: page does not depend on selection
+        response = super(SelectionMixin, self).dispatch(request, *args, **kwargs)
+        if self.view_is_async:
+            return self.apublic_response(response)
+        return self.public_response(response)
+
+    async def apublic_response(self, response):
+        return self.public_response(await response)
+
+    @staticmethod
+    def public_response(response):
+        """Function marks response as public, unless it is not successful or sets cookies"""
+        if response.status_code == 200 and not response.cookies:
+            patch_cache_control(response, public=True, max_age=settings.CATALOG_PUBLIC_CACHE_TIMEOUT)
         else:
-            selection = Selection.objects.filter(is_anonymous=True).first()
-            if not selection:
-                selection = Selection.objects.create(is_anonymous=True)
-        self.selection = selection
-        return super().dispatch(request, *args, **kwargs)
+            patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+
+class ProductPageMixin:
+    """
+    Class is used to paginate product listings
+    with keyset pagination on (category, price, id)
+    """
+    page_ordering = ('category', 'price', 'id')
+
+    def get_products_page(self, queryset):
+        """Function returns page of products following 'cursor' GET parameter"""
+        paginator = KeysetPaginator(queryset, self.page_ordering, settings.CATALOG_PAGE_SIZE)
+        return paginator.get_page(self.request.GET.get('cursor'))
+
+    async def aget_products_page(self, queryset):
+        """Function returns page of products with rows fetched by async ORM"""
+        return await self.get_products_page(queryset).aload()
+
+    def wants_json(self):
+        """Function checks whether JSON variant of listing is requested (infinite scroll)"""
+        return self.request.GET.get('format') == 'json'
+
+    @staticmethod
+    def products_json_response(page):
+        """Function returns page of products in JSON"""
+        return JsonResponse({
+            'products': [
+                {
+                    'id': product.id,
+                    'name': product.name,
+                    'slug': product.slug,
+                    'price': str(product.price),
+                    'url': product.get_abs_url(),
+                    'image': product.thumbnail_url()
+                }
+                for product in page
+            ],
+            'next_cursor': page.next_cursor
+        })
+
+
+class OrderHistoryMixin:
+    """
+    Class is used to show orders of user page by page.
+
+    Orders with their selections, selected items and products
+    are loaded by fixed number of queries for any page
+    """
+
+    def get_orders_page(self, owner):
+        """Function returns page of orders following 'page' GET parameter"""
+        orders = Order.objects.filter(user=owner).select_related('selection').prefetch_related(
+            Prefetch('selection__products', queryset=SelectedProduct.objects.select_related('product'))
+        ).order_by('-created_at', '-id')
+        paginator = Paginator(orders, settings.ORDER_HISTORY_PAGE_SIZE)
+        return paginator.get_page(self.request.GET.get('page'))
@@ -3,6 +3,8 @@ from django.contrib.auth import get_user_model
 from django.urls import reverse
 from django.utils import timezone
 
+from .thumbnails import available_formats, thumbnail_name
+
 User = get_user_model()
 
 
@@ -29,6 +31,14 @@ class Product(models.Model):
     image = models.ImageField(verbose_name='Image')
     description = models.TextField(verbose_name='Description', null=True)
     price = models.DecimalField(max_digits=9, decimal_places=2, verbose_name='Price')
+    thumbnail_source = models.CharField(
+        max_length=100, blank=True, default='', editable=False, verbose_name='Image of renditions'
+    )
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['category', 'price', 'id'], name='product_category_price_idx'),
+        ]
 
     def __str__(self):
         """Function represents product in admin"""
@@ -42,6 +52,76 @@ class Product(models.Model):
         """Get absolute URL"""
         return reverse('product_detail', kwargs={'slug': self.slug})
 
+    @property
+    def has_thumbnails(self):
+        """Renditions are made of current image (see thumbnails.py)"""
+        return bool(self.image) and self.thumbnail_source == self.image.name
+
+    def thumbnail_url(self, size='card', image_format='jpeg'):
+        """Function returns URL of image rendition, or of original image while rendition is not made"""
+        if self.has_thumbnails and image_format in available_formats():
+            return self.image.storage.url(thumbnail_name(self.image.name, size, image_format))
+        return self.image.url
+
+
+class ProductSpecification(models.Model):
+    """This class describes technical characteristics of product (boiler, burner)"""
+
+    product = models.OneToOneField(
+        Product,
+        verbose_name='Product',
+        on_delete=models.CASCADE,
+        related_name='specification'
+    )
+    manufacturer = models.CharField(max_length=255, verbose_name='Manufacturer', blank=True)
+    fuel_gas = models.BooleanField(default=False, verbose_name='Using natural gas')
+    fuel_diesel = models.BooleanField(default=False, verbose_name='Using diesel')
+    fuel_oil = models.BooleanField(default=False, verbose_name='Using oil')
+    heat_output = models.DecimalField(
+        max_digits=9, decimal_places=2, verbose_name='Heat power (output), kW', null=True, blank=True
+    )
+    heat_input = models.DecimalField(
+        max_digits=9, decimal_places=2, verbose_name='Heat power (input), kW', null=True, blank=True
+    )
+    max_pressure = models.DecimalField(
+        max_digits=6, decimal_places=2, verbose_name='Max permissible operating pressure, bar', null=True, blank=True
+    )
+    gas_pressure = models.DecimalField(
+        max_digits=6, decimal_places=3, verbose_name='Operation gas pressure, bar', null=True, blank=True
+    )
+    is_modulated = models.BooleanField(default=False, verbose_name='Modulation available')
+    gas_passes_count = models.PositiveIntegerField(verbose_name='Count of gas passes', null=True, blank=True)
+    water_press_loss = models.DecimalField(
+        max_digits=9, decimal_places=3, verbose_name='Hidraulic resistance, mbar', null=True, blank=True
+    )
+    flue_gas_press_loss = models.DecimalField(
+        max_digits=9, decimal_places=3, verbose_name='Aerodynamic resistance, mbar', null=True, blank=True
+    )
+    weight = models.DecimalField(max_digits=9, decimal_places=2, verbose_name='Weight, kgs', null=True, blank=True)
+    electro_power = models.DecimalField(
+        max_digits=9, decimal_places=2, verbose_name='Power, kW', null=True, blank=True
+    )
+    inlet_diameter = models.CharField(max_length=50, verbose_name='Inlet diameter, mms', blank=True)
+    outlet_diameter = models.CharField(max_length=50, verbose_name='Outlet diameter, mms', blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['heat_output'], name='specification_heat_output_idx'),
+        ]
+
+    def __str__(self):
+        """Function represents specification in admin"""
+        return 'Specification of {}'.format(self.product.name)
+
+
+class CatalogVersion(models.Model):
+    """Class keeps version of catalog in single row, so that it is shared by all processes (see utils.py)"""
+    version = models.BigIntegerField(default=0, verbose_name='Version of catalog')
+
+    def __str__(self):
+        """Function represents version in admin"""
+        return str(self.version)
+
 
 class SelectedProduct(models.Model):
     """This class describes selecting products to Selection"""
@@ -49,8 +129,14 @@ class SelectedProduct(models.Model):
     selected_item = models.ForeignKey('Selection', verbose_name='Selected items', on_delete=models.CASCADE)
     product = models.ForeignKey(Product, verbose_name='Product', on_delete=models.CASCADE)
     qty = models.PositiveIntegerField(default=1)
+    unit_price = models.DecimalField(max_digits=9, decimal_places=2, verbose_name='Unit price')
     final_price = models.DecimalField(max_digits=9, decimal_places=2, verbose_name='Total cost')
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['selected_item', 'product'], name='unique_selected_product'),
+        ]
+
     def __str__(self):
         """Function represents boiler in admin.
 
@@ -59,8 +145,14 @@ class SelectedProduct(models.Model):
         return 'Product is {} (for Selection)'.format(self.product.name)
 
     def save(self, *args, **kwargs):
+        """Function stores price of product as unit price of new item and recalculates total cost.
 
-        self.final_price = self.qty * self.product.price
+        Unit price is a snapshot: later changes of product price reach
+        open selections by reprice_selections (see pricing.py)
+        """
+        if self.unit_price is None:
+            self.unit_price = self.product.price
+        self.final_price = self.qty * self.unit_price
         super().save(*args, **kwargs)
 
 
@@ -77,11 +169,37 @@ class Selection(models.Model):
     in_order = models.BooleanField(default=False)
     is_anonymous = models.BooleanField(default=False)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['owner', 'in_order'], name='selection_owner_in_order_idx'),
+            models.Index(
+                fields=['is_anonymous'],
+                name='selection_anonymous_idx',
+                condition=models.Q(is_anonymous=True)
+            ),
+        ]
+
     def __str__(self):
         """Function returns id of selection in string formation"""
         return str(self.id)
 
 
+class SelectionMutation(models.Model):
+    """Class stores idempotency keys of mutations applied to Selection"""
+    selection = models.ForeignKey(Selection, verbose_name='Selection', on_delete=models.CASCADE)
+    key = models.CharField(max_length=64, verbose_name='Idempotency key')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Date of mutation')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['selection', 'key'], name='unique_selection_mutation_key'),
+        ]
+
+    def __str__(self):
+        """Function represents mutation in admin"""
+        return '{} ({})'.format(self.key, self.selection_id)
+
+
 class UserClass(models.Model):
     """UserClass describes main characteristics of user.
 
@@ -93,6 +211,11 @@ class UserClass(models.Model):
     position = models.CharField(max_length=255, verbose_name='Position', null=True, blank=True)
     orders = models.ManyToManyField('Order', verbose_name='User\'selection order')
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user'], name='unique_userclass_user'),
+        ]
+
     def __str__(self):
         """Function represent class in admin using first_name, last_name, position"""
         return 'User: {} {}, {}'.format(self.first_name, self.last_name, self.position)
@@ -148,7 +271,56 @@ class Order(models.Model):
     comment = models.TextField(verbose_name='Order comment', null=True, blank=True)
     created_at = models.DateTimeField(auto_now=True, verbose_name='Date of order creation')
     order_date = models.DateField(verbose_name='Date of receipt of the order ', default=timezone.now)
+    total_products = models.PositiveIntegerField(default=0)
+    final_price = models.DecimalField(max_digits=9, default=0, decimal_places=2, verbose_name='Total cost')
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'created_at'], name='order_user_created_at_idx'),
+        ]
 
     def __str__(self):
         """Function returns id of order in string formation"""
         return str(self.id)
+
+
+class OrderJob(models.Model):
+    """OrderJob class
+
+    Class represents task of order processing in database queue.
+    Jobs are taken by worker process (manage.py run_order_worker)
+    """
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+
+    STATUS_CHOISES = (
+        (STATUS_PENDING, 'Waiting for worker'),
+        (STATUS_RUNNING, 'Processed by worker'),
+        (STATUS_DONE, 'Done'),
+        (STATUS_FAILED, 'Failed')
+    )
+
+    order = models.ForeignKey(Order, verbose_name='Order', on_delete=models.CASCADE, related_name='jobs')
+    status = models.CharField(
+        max_length=100,
+        verbose_name='Job status',
+        choices=STATUS_CHOISES,
+        default=STATUS_PENDING
+    )
+    attempts = models.PositiveIntegerField(default=0, verbose_name='Count of attempts')
+    run_after = models.DateTimeField(default=timezone.now, verbose_name='Not run before')
+    last_error = models.TextField(verbose_name='Last error', blank=True)
+    completed_steps = models.JSONField(default=list, blank=True, verbose_name='Completed steps of pipeline')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Date of job creation')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Date of job update')
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'run_after'], name='orderjob_status_run_after_idx'),
+        ]
+
+    def __str__(self):
+        """Function returns id of order and status of job"""
+        return 'Order {}: {}'.format(self.order_id, self.status)
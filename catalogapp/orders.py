@@ -0,0 +1,171 @@
+"""
+Module contains pipeline of order processing.
+
+Checkout only saves order and enqueues OrderJob in the same transaction.
+Worker process ('manage.py run_order_worker') takes pending jobs from
+database and runs steps of ORDER_PIPELINE setting: order status is changed
+from 'new' to 'in_progress' and to 'ready' when all steps are done,
+to 'completed' when email about order is sent.
+
+Steps do not run in one transaction: steps changing only database
+(@database_step) run in their own short transaction, sending of email and
+writing to storage run outside of transaction, so that database is not
+locked while they wait. Every completed step is recorded in job, retry of
+failed job skips completed steps and does not send email again.
+Failed job is repeated with exponential delay till ORDER_JOB_MAX_ATTEMPTS
+"""
+
+import logging
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.mail import send_mail
+from django.db import models, transaction
+from django.template.loader import render_to_string
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Order, OrderJob, SelectedProduct
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue_order(order):
+    """Function adds job of order processing to queue"""
+    return OrderJob.objects.create(order=order)
+
+
+def database_step(step):
+    """Decorator marks step which only changes database, it runs in transaction with record of its completion"""
+    step.in_transaction = True
+    return step
+
+
+def set_order_status(order, status):
+    """Function changes status of order, order which email is sent stays completed"""
+    Order.objects.filter(pk=order.pk).exclude(status=Order.STATUS_COMPLETED).update(status=status)
+
+
+@database_step
+def link_order(order):
+    """Step adds order to orders of user"""
+    order.user.orders.add(order)
+
+
+def quote_name(order):
+    """Function returns name of quote of order in storage"""
+    return f'quotes/order-{order.pk}.html'
+
+
+def render_quote(order):
+    """Step renders quote of order and saves it to storage"""
+    items = SelectedProduct.objects.filter(selected_item_id=order.selection_id).select_related('product').order_by('id')
+    content = render_to_string('quote.html', {'order': order, 'items': items})
+    name = quote_name(order)
+    default_storage.delete(name)
+    default_storage.save(name, ContentFile(content.encode()))
+
+
+def notify_user(order):
+    """Step sends email about order to user"""
+    email = order.user.user.email
+    if not email:
+        return
+    send_mail(
+        'Order {} is accepted'.format(order.pk),
+        'Order {} of {} products for {} is accepted.'.format(order.pk, order.total_products, order.final_price),
+        None,
+        [email]
+    )
+    set_order_status(order, Order.STATUS_COMPLETED)
+
+
+def get_pipeline():
+    """Function returns (path, step) of ORDER_PIPELINE setting"""
+    return [(path, import_string(path)) for path in settings.ORDER_PIPELINE]
+
+
+def complete_step(job, path):
+    """Function records completed step of job"""
+    job.completed_steps.append(path)
+    OrderJob.objects.filter(pk=job.pk).update(completed_steps=job.completed_steps, updated_at=timezone.now())
+
+
+def run_step(job, order, path, step):
+    """Function runs step and records it, step changing only database runs in transaction with record"""
+    if getattr(step, 'in_transaction', False):
+        with transaction.atomic():
+            step(order)
+            complete_step(job, path)
+    else:
+        step(order)
+        complete_step(job, path)
+
+
+def claim_job(job):
+    """
+    Function marks pending job as running by conditional UPDATE.
+    Returns False when job was already taken by other worker
+    """
+    claimed = OrderJob.objects.filter(pk=job.pk, status=OrderJob.STATUS_PENDING).update(
+        status=OrderJob.STATUS_RUNNING,
+        attempts=models.F('attempts') + 1,
+        updated_at=timezone.now()
+    )
+    if claimed:
+        job.refresh_from_db()
+    return bool(claimed)
+
+
+def run_job(job):
+    """Function runs steps of pipeline for order of job and stores result of job"""
+    order = Order.objects.select_related('user__user').get(pk=job.order_id)
+    set_order_status(order, Order.STATUS_INPROGRESS)
+    try:
+        for path, step in get_pipeline():
+            if path not in job.completed_steps:
+                run_step(job, order, path, step)
+    except Exception:
+        logger.exception('Order %s was not processed', order.pk)
+        job.last_error = traceback.format_exc()
+        if job.attempts >= settings.ORDER_JOB_MAX_ATTEMPTS:
+            job.status = OrderJob.STATUS_FAILED
+        else:
+            job.status = OrderJob.STATUS_PENDING
+            job.run_after = timezone.now() + timedelta(
+                seconds=settings.ORDER_JOB_RETRY_DELAY * 2 ** (job.attempts - 1)
+            )
+        set_order_status(order, Order.STATUS_NEW)
+    else:
+        job.status = OrderJob.STATUS_DONE
+        job.last_error = ''
+        set_order_status(order, Order.STATUS_READY)
+    job.save(update_fields=['status', 'run_after', 'last_error', 'updated_at'])
+    return job.status == OrderJob.STATUS_DONE
+
+
+def requeue_stale_jobs():
+    """Function returns to queue jobs of workers which stopped in the middle of job"""
+    stale_before = timezone.now() - timedelta(seconds=settings.ORDER_JOB_TIMEOUT)
+    return OrderJob.objects.filter(status=OrderJob.STATUS_RUNNING, updated_at__lt=stale_before).update(
+        status=OrderJob.STATUS_PENDING,
+        updated_at=timezone.now()
+    )
+
+
+def process_jobs(limit=None):
+    """Function runs pending jobs which are due. Returns count of processed jobs"""
+    requeue_stale_jobs()
+    jobs = OrderJob.objects.filter(
+        status=OrderJob.STATUS_PENDING,
+        run_after__lte=timezone.now()
+    ).order_by('run_after', 'id')[:limit]
+    processed = 0
+    for job in list(jobs):
+        if claim_job(job):
+            run_job(job)
+            processed += 1
+    return processed
@@ -0,0 +1,93 @@
+"""
+Module contains keyset (seek) pagination of querysets.
+
+Instead of OFFSET next page is requested with cursor - values of ordering
+fields of the last shown row, so cost of page does not depend on its position
+"""
+
+import base64
+import json
+
+from django.core.exceptions import SuspiciousOperation, ValidationError
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+
+class KeysetPaginator:
+    """Class paginates queryset by ordering fields (all ascending, the last one is unique)"""
+
+    def __init__(self, queryset, ordering, per_page):
+        self.queryset = queryset.order_by(*ordering)
+        self.ordering = ordering
+        self.per_page = per_page
+        self.fields = [queryset.model._meta.get_field(name) for name in ordering]
+
+    def encode_cursor(self, obj):
+        """Function makes cursor from values of ordering fields of object or of values() row"""
+        if isinstance(obj, dict):
+            values = [str(obj[field.attname]) for field in self.fields]
+        else:
+            values = [str(getattr(obj, field.attname)) for field in self.fields]
+        return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+    def decode_cursor(self, cursor):
+        """Function returns values of ordering fields from cursor"""
+        try:
+            values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            if len(values) != len(self.fields):
+                raise ValueError('Cursor does not match ordering')
+            return [field.to_python(value) for field, value in zip(self.fields, values)]
+        except (ValueError, TypeError, ValidationError):
+            raise SuspiciousOperation('Invalid page cursor')
+
+    def get_page(self, cursor=None):
+        """Function returns page following the cursor, or the first page"""
+        queryset = self.queryset
+        if cursor:
+            values = self.decode_cursor(cursor)
+            condition = Q()
+            for position, name in enumerate(self.ordering):
+                lookups = dict(zip(self.ordering[:position], values[:position]))
+                lookups[f'{name}__gt'] = values[position]
+                condition |= Q(**lookups)
+            queryset = queryset.filter(condition)
+        return KeysetPage(self, queryset)
+
+
+class KeysetPage:
+    """Class represents page of KeysetPaginator, rows are fetched on first use"""
+
+    def __init__(self, paginator, queryset):
+        self.paginator = paginator
+        self.queryset = queryset
+
+    @cached_property
+    def rows(self):
+        """One extra row is fetched to know whether next page exists"""
+        return list(self.queryset[:self.paginator.per_page + 1])
+
+    async def aload(self):
+        """Function fetches rows by async ORM, so that page is used in async views without queries"""
+        if 'rows' not in self.__dict__:
+            self.rows = [obj async for obj in self.queryset[:self.paginator.per_page + 1]]
+        return self
+
+    @property
+    def object_list(self):
+        return self.rows[:self.paginator.per_page]
+
+    @property
+    def has_next(self):
+        return len(self.rows) > self.paginator.per_page
+
+    @property
+    def next_cursor(self):
+        if self.has_next:
+            return self.paginator.encode_cursor(self.object_list[-1])
+        return None
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
@@ -0,0 +1,63 @@
+"""
+Module contains repricing of open selections.
+
+Every selected product keeps unit price which product had when it was
+selected (SelectedProduct.unit_price), so changes of catalog prices do not
+change selections by themselves. reprice_selections() brings unit prices
+of items of open (not ordered) selections up to current prices of products
+and recalculates totals of selections. It is done by two set-based UPDATE
+statements, items and selections are not loaded to Python:
+
+- items which unit price differs from price of product get new unit price
+  and total cost
+- open selections which total cost differs from sum of their items get new
+  total cost, count of these rows is count of changed selections
+
+Ordered selections keep prices they were ordered with
+"""
+
+from django.db import models, transaction
+from django.db.models.functions import Coalesce, Round
+
+from .models import Product, SelectedProduct, Selection
+
+
+class RepriceResult:
+    """Class contains counts of changed items and selections"""
+
+    def __init__(self, items=0, selections=0):
+        self.items = items
+        self.selections = selections
+
+
+def reprice_selections(products=None):
+    """
+    Function updates unit prices and totals of open selections to current prices of products.
+    With products (queryset or list of ids) only their items are repriced. Returns RepriceResult
+    """
+    price = Product.objects.filter(pk=models.OuterRef('product_id')).values('price')[:1]
+    items = SelectedProduct.objects.filter(selected_item__in_order=False)
+    selections = Selection.objects.filter(in_order=False)
+    if products is not None:
+        items = items.filter(product__in=products)
+        selections = selections.filter(
+            pk__in=SelectedProduct.objects.filter(product__in=products).values('selected_item')
+        )
+    total = SelectedProduct.objects.filter(selected_item=models.OuterRef('pk')).values(
+        'selected_item'
+    ).annotate(total=models.Sum('final_price')).values('total')
+    total = Round(
+        Coalesce(models.Subquery(total), models.Value(0), output_field=models.DecimalField()), 2
+    )
+
+    with transaction.atomic():
+        changed_items = items.exclude(unit_price=models.F('product__price')).update(
+            unit_price=models.Subquery(price),
+            final_price=Round(models.F('qty') * models.Subquery(price), 2)
+        )
+        if not changed_items:
+            return RepriceResult()
+        changed_selections = selections.alias(total=total).exclude(
+            final_price=models.F('total')
+        ).update(final_price=total)
+    return RepriceResult(changed_items, changed_selections)
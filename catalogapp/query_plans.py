@@ -0,0 +1,63 @@
+"""
+Module contains check of query plans of views (SQLite only).
+
+Requests of benchmark endpoints (benchmark.py) are sent by test client,
+their statements are recorded and explained with EXPLAIN QUERY PLAN.
+Plan step which reads whole table ('SCAN <table>' without index)
+is reported as full scan, unless table is listed in SCAN_ALLOWED_TABLES
+"""
+
+import re
+
+from django.db import connection
+
+# Tables which are read whole on purpose: list of categories is shown on every page
+SCAN_ALLOWED_TABLES = {'catalogapp_category'}
+
+EXPLAINED_STATEMENTS = ('SELECT', 'UPDATE', 'DELETE')
+
+FULL_SCAN = re.compile(r'^SCAN (\w+)$')
+
+
+class StatementRecorder:
+    """Execute wrapper which keeps statements and their parameters"""
+
+    def __init__(self):
+        self.statements = []
+
+    def __call__(self, execute, sql, params, many, context):
+        if not many:
+            self.statements.append((sql, params))
+        return execute(sql, params, many, context)
+
+
+def explain(sql, params):
+    """Function returns steps of query plan of statement"""
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+        return [row[-1] for row in cursor.fetchall()]
+
+
+def full_scans(plan):
+    """Function returns steps of plan which read whole not allowed table"""
+    scans = []
+    for step in plan:
+        match = FULL_SCAN.match(step)
+        if match and match.group(1) not in SCAN_ALLOWED_TABLES:
+            scans.append(step)
+    return scans
+
+
+def explain_endpoint(endpoint, client, number=0):
+    """Function sends request to endpoint and returns plans of its statements"""
+    recorder = StatementRecorder()
+    with connection.execute_wrapper(recorder):
+        endpoint.request(client, number)
+    report, explained = [], set()
+    for sql, params in recorder.statements:
+        if not sql.lstrip().upper().startswith(EXPLAINED_STATEMENTS) or sql in explained:
+            continue
+        explained.add(sql)
+        plan = explain(sql, params)
+        report.append({'sql': sql, 'plan': plan, 'full_scans': full_scans(plan)})
+    return report
@@ -0,0 +1,35 @@
+"""
+Module contains database routers of catalogapp
+"""
+
+from django.conf import settings
+
+CATALOG_MODELS = {'category', 'product', 'productspecification'}
+
+
+class CatalogReadRouter:
+    """
+    Router sends reads of catalog models (categories, products and their
+    specifications) to read-only CATALOG_READ_DATABASE connection,
+    all writes and other models go to default database.
+
+    Both databases must have the same data (e.g. the same SQLite file
+    in WAL mode, or replica of server database)
+    """
+
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label == 'catalogapp' and model._meta.model_name in CATALOG_MODELS:
+            return settings.CATALOG_READ_DATABASE
+        return None
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {'default', settings.CATALOG_READ_DATABASE}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == 'default'
@@ -0,0 +1,129 @@
+"""
+Module contains full-text search of products.
+
+Search index is SQLite FTS5 virtual table in the same database, row id
+of index is id of product. Index is kept in sync by signals (signals.py)
+and can be rebuilt with 'manage.py rebuild_search_index'
+"""
+
+import re
+
+from django.db import connection
+
+from .models import Category, Product
+
+
+FTS_TABLE = 'catalogapp_product_fts'
+
+
+def search_available():
+    """Function checks whether database supports search index (SQLite only)"""
+    return connection.vendor == 'sqlite'
+
+
+def rebuild_index():
+    """Function fills search index with all products by one statement. Returns count of products"""
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE}')
+        cursor.execute(
+            f'INSERT INTO {FTS_TABLE} (rowid, name, description, category) '
+            'SELECT product.id, product.name, product.description, category.name '
+            f'FROM {Product._meta.db_table} product '
+            f'JOIN {Category._meta.db_table} category ON category.id = product.category_id'
+        )
+        return cursor.rowcount
+
+
+def index_products(products):
+    """Function adds or replaces products in search index"""
+    rows = [(product.id, product.name, product.description, product.category.name) for product in products]
+    with connection.cursor() as cursor:
+        cursor.executemany(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [(row[0],) for row in rows])
+        cursor.executemany(
+            f'INSERT INTO {FTS_TABLE} (rowid, name, description, category) VALUES (%s, %s, %s, %s)',
+            rows
+        )
+
+
+def unindex_product(product_id):
+    """Function removes product from search index"""
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [product_id])
+
+
+def rename_category(category):
+    """Function updates category name of its products in search index"""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'UPDATE {FTS_TABLE} SET category = %s WHERE rowid IN '
+            f'(SELECT id FROM {Product._meta.db_table} WHERE category_id = %s)',
+            [category.name, category.id]
+        )
+
+
+def build_match_query(text, prefix=False, column=None):
+    """
+    Function turns user input to FTS5 query: every word is quoted,
+    so that operators of FTS5 syntax in input are not interpreted.
+    With prefix the last word matches as beginning of word
+    """
+    words = re.findall(r'\w+', text)
+    if not words:
+        return None
+    terms = ['"{}"'.format(word) for word in words]
+    if prefix:
+        terms[-1] += '*'
+    query = ' '.join(terms)
+    if column:
+        query = f'{column} : ({query})'
+    return query
+
+
+class SearchResults:
+    """
+    Class represents ranked search results for Paginator.
+
+    Only requested slice of results is fetched from index,
+    products of slice are loaded by one query
+    """
+
+    def __init__(self, text):
+        self.query = build_match_query(text)
+
+    def count(self):
+        if not self.query:
+            return 0
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT count(*) FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', [self.query])
+            return cursor.fetchone()[0]
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, item):
+        start, stop = item.start or 0, item.stop
+        if not self.query or stop <= start:
+            return []
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s ORDER BY rank LIMIT %s OFFSET %s',
+                [self.query, stop - start, start]
+            )
+            ids = [row[0] for row in cursor.fetchall()]
+        products = Product.objects.select_related('category').in_bulk(ids)
+        return [products[product_id] for product_id in ids if product_id in products]
+
+
+def autocomplete(text, limit=10):
+    """Function returns names and slugs of products which names start with given words"""
+    query = build_match_query(text, prefix=True, column='name')
+    if not query:
+        return []
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT product.name, product.slug FROM {FTS_TABLE} '
+            f'JOIN {Product._meta.db_table} product ON product.id = {FTS_TABLE}.rowid '
+            f'WHERE {FTS_TABLE} MATCH %s ORDER BY rank LIMIT %s',
+            [query, limit]
+        )
+        return [{'name': name, 'slug': slug} for name, slug in cursor.fetchall()]
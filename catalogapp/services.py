@@ -0,0 +1,148 @@
+"""
+Module contains transactional service of cart (Selection) mutations.
+
+Every mutation runs in transaction which first locks the Selection row,
+so parallel requests of the same selection (double clicks, several tabs)
+are applied one after another and totals stay consistent
+"""
+
+import functools
+import time
+
+from django.db import OperationalError, connection, models, transaction
+
+from .models import SelectedProduct, Selection, SelectionMutation
+from .utils import add_products_to_selection, check_total, clean_qty, update_selection_totals
+
+LOCK_RETRIES = 20
+LOCK_RETRY_DELAY = 0.01
+
+
+def retry_locked(method):
+    """
+    Decorator repeats mutation when SQLite reports that database is locked
+    by other writer. Mutation is repeated only when it is the outermost
+    transaction, so nothing was written before the error
+    """
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        if connection.in_atomic_block:
+            return method(*args, **kwargs)
+        for attempt in range(LOCK_RETRIES):
+            try:
+                return method(*args, **kwargs)
+            except OperationalError as error:
+                if 'locked' not in str(error) or attempt == LOCK_RETRIES - 1:
+                    raise
+                time.sleep(LOCK_RETRY_DELAY * (attempt + 1))
+    return wrapper
+
+
+def lock_selection(selection):
+    """
+    Function locks Selection row till the end of transaction
+    and refreshes totals of selection from the locked row.
+
+    SQLite has no SELECT ... FOR UPDATE, there the first statement of transaction
+    is no-op UPDATE, which takes write lock of database as BEGIN IMMEDIATE does
+    """
+    queryset = Selection.objects.filter(pk=selection.pk)
+    if connection.features.has_select_for_update:
+        queryset = queryset.select_for_update()
+    else:
+        queryset.update(total_products=models.F('total_products'))
+    selection.total_products, selection.final_price = queryset.values_list(
+        'total_products', 'final_price'
+    ).get()
+
+
+class SelectionService:
+    """
+    Class is used to change products of Selection.
+
+    Mutations accept optional idempotency key: mutation with key
+    which was already applied to selection is skipped and returns False
+    """
+
+    def __init__(self, selection):
+        self.selection = selection
+
+    def _begin(self, idempotency_key):
+        """Function locks selection and registers idempotency key. Returns False for repeated key"""
+        lock_selection(self.selection)
+        if idempotency_key:
+            mutation, created = SelectionMutation.objects.get_or_create(
+                selection=self.selection,
+                key=idempotency_key
+            )
+            return created
+        return True
+
+    @retry_locked
+    def add_product(self, product, idempotency_key=None):
+        """Function adds product to selection if it is not selected yet"""
+        with transaction.atomic():
+            if not self._begin(idempotency_key):
+                return False
+            if SelectedProduct.objects.filter(selected_item=self.selection, product=product).exists():
+                return False
+            selected_product = SelectedProduct.objects.create(
+                user=self.selection.owner,
+                selected_item=self.selection,
+                product=product
+            )
+            self.selection.products.add(selected_product)
+            update_selection_totals(self.selection, 1, selected_product.final_price)
+            return True
+
+    @retry_locked
+    def add_products(self, items, idempotency_key=None):
+        """
+        Function adds products by mapping of slug to quantity (see add_products_to_selection).
+        Returns None for repeated idempotency key
+        """
+        with transaction.atomic():
+            if not self._begin(idempotency_key):
+                return None
+            return add_products_to_selection(self.selection, items)
+
+    @retry_locked
+    def remove_product(self, product, idempotency_key=None):
+        """Function removes product from selection"""
+        with transaction.atomic():
+            if not self._begin(idempotency_key):
+                return False
+            selected_product = SelectedProduct.objects.filter(
+                selected_item=self.selection,
+                product=product
+            ).first()
+            if not selected_product:
+                return False
+            self.selection.products.remove(selected_product)
+            selected_product.delete()
+            update_selection_totals(self.selection, -1, -selected_product.final_price)
+            return True
+
+    @retry_locked
+    def change_qty(self, product, qty, idempotency_key=None):
+        """
+        Function sets quantity and total of selected product (by its unit price) with one UPDATE.
+        QuantityError is raised for quantity out of range or total cost which does not fit
+        """
+        qty = clean_qty(qty)
+        with transaction.atomic():
+            if not self._begin(idempotency_key):
+                return False
+            selected_product = SelectedProduct.objects.filter(
+                selected_item=self.selection,
+                product=product
+            ).values_list('pk', 'unit_price', 'final_price').first()
+            if not selected_product:
+                return False
+            pk, unit_price, previous_price = selected_product
+            final_price = qty * unit_price
+            check_total(final_price)
+            check_total(self.selection.final_price + final_price - previous_price)
+            SelectedProduct.objects.filter(pk=pk).update(qty=qty, final_price=final_price)
+            update_selection_totals(self.selection, price_delta=final_price - previous_price)
+            return True
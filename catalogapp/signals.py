@@ -0,0 +1,78 @@
+"""
+Module connects model signals of catalogapp
+"""
+
+from django.contrib.auth.signals import user_logged_in
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import search
+from .anonymous import AnonymousSelection
+from .database import apply_sqlite_pragmas
+from .metrics import install_query_recorder
+from .mixins import SelectionMixin
+from .models import Category, Product, ProductSpecification
+from .services import SelectionService
+from .thumbnails import schedule_thumbnails
+from .utils import bump_catalog_version
+
+
+@receiver([post_save, post_delete], sender=Category)
+@receiver([post_save, post_delete], sender=Product)
+@receiver([post_save, post_delete], sender=ProductSpecification)
+def catalog_changed(sender, **kwargs):
+    """Function bumps catalog version when product, its specification or category is changed"""
+    bump_catalog_version()
+
+
+@receiver(post_save, sender=Product)
+def index_product(sender, instance, **kwargs):
+    """Function adds saved product to search index"""
+    if search.search_available():
+        search.index_products([instance])
+
+
+@receiver(post_delete, sender=Product)
+def unindex_product(sender, instance, **kwargs):
+    """Function removes deleted product from search index"""
+    if search.search_available():
+        search.unindex_product(instance.id)
+
+
+@receiver(post_save, sender=Category)
+def reindex_category(sender, instance, created, **kwargs):
+    """Function updates category name of products in search index"""
+    if not created and search.search_available():
+        search.rename_category(instance)
+
+
+@receiver(post_save, sender=Product)
+def make_thumbnails(sender, instance, **kwargs):
+    """Function generates image renditions of saved product after transaction is committed"""
+    image_name = instance.image.name
+    transaction.on_commit(lambda: schedule_thumbnails(image_name))
+
+
+@receiver(user_logged_in)
+def merge_anonymous_selection(sender, request, user, **kwargs):
+    """Function moves products selected before login to selection of user"""
+    if request is None:
+        return
+    anonymous_selection = AnonymousSelection.from_request(request)
+    if anonymous_selection.items:
+        selection = SelectionMixin.resolve_selection(user)
+        SelectionService(selection).add_products(anonymous_selection.items)
+
+
+@receiver(connection_created)
+def record_queries(sender, connection, **kwargs):
+    """Queries of every new database connection are counted in request metrics"""
+    install_query_recorder(connection)
+
+
+@receiver(connection_created)
+def configure_connection(sender, connection, **kwargs):
+    """New SQLite connection gets PRAGMA statements of production database mode"""
+    apply_sqlite_pragmas(connection)
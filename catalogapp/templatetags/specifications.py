@@ -0,0 +1,20 @@
+from django import template
+from django.core.exceptions import ObjectDoesNotExist
+from django.template.loader import render_to_string
+
+register = template.Library()
+
+SPECIFICATION_TEMPLATES = {
+    'burners': 'burner_spec.html',
+}
+
+
+@register.simple_tag
+def product_spec(product):
+    """Tag renders table of technical characteristics of product using template of its category"""
+    try:
+        specification = product.specification
+    except ObjectDoesNotExist:
+        return ''
+    template_name = SPECIFICATION_TEMPLATES.get(product.category.slug, 'boiler_spec.html')
+    return render_to_string(template_name, {'spec': specification})
@@ -0,0 +1,20 @@
+from django import template
+from django.utils.html import format_html
+
+from catalogapp.thumbnails import available_formats
+
+register = template.Library()
+
+
+@register.simple_tag
+def picture(product, size='card', css_class='', alt=''):
+    """
+    Tag renders product image of given size: WebP rendition with JPEG rendition
+    as fallback, original image while renditions are not made
+    """
+    image = format_html('<img class="{}" src="{}" alt="{}" />', css_class, product.thumbnail_url(size), alt)
+    if not product.has_thumbnails or 'webp' not in available_formats():
+        return image
+    return format_html(
+        '<picture><source srcset="{}" type="image/webp">{}</picture>', product.thumbnail_url(size, 'webp'), image
+    )
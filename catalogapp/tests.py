@@ -1,48 +1,81 @@
+import copy
+import json
+import os
+import tempfile
+import threading
+import time
+from unittest import mock
+from io import BytesIO, StringIO
 from decimal import Decimal
-from django.test import TestCase
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import IntegrityError, OperationalError, connection, models
+from django.db.migrations.executor import MigrationExecutor
+from django.db.models.query import QuerySet
+from django.test import TestCase, TransactionTestCase, RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.contrib.auth import get_user_model
+from django.contrib.sessions.backends.db import SessionStore
+from django.core import mail
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.http import Http404
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.utils import timezone
+from PIL import Image
 
-from .models import Category, Boilers, Selection, SelectedProduct, UserClass
-from .views import recalc_selection
+from .anonymous import ANONYMOUS_SELECTION_COOKIE, AnonymousSelection
+from .assets import serve_media, serve_static
+from .benchmark import (
+    benchmark_report, compare_results, run_benchmark, run_session_benchmark, seed_catalog, seed_users
+)
+from .catalog_io import export_catalog, import_catalog
+from .catalog_cache import LocalLRUCache, get_categories, get_category, get_product
+from .database import apply_sqlite_pragmas
+from .facets import get_category_facets
+from .metrics import (
+    HISTOGRAMS, REQUEST_DURATION, REQUEST_QUERIES, TEMPLATE_RENDER_DURATION, RequestMetrics, current_request,
+    record_query
+)
+from .models import (
+    CatalogVersion, Category, Order, OrderJob, Product, ProductSpecification, Selection, SelectedProduct, UserClass
+)
+from .orders import process_jobs, quote_name
+from .pricing import reprice_selections
+from .query_plans import explain, full_scans
+from .routers import CatalogReadRouter
+from .services import SelectionService
+from .mixins import SelectionMixin, SELECTION_SESSION_KEY
+from .thumbnails import _generate_in_worker, thumbnail_name
+from .utils import QuantityError, get_catalog_version, recalc_selection, update_selection_totals
 
 User = get_user_model()
 
 
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
 class CatalogTestCases(TestCase):
 
-    def SetUp(self):
+    def setUp(self):
         self.user_for_test = User.objects.create(username='test_user', password='test')
         self.category = Category.objects.create(name='Boilers', slug='boilers')
         image = SimpleUploadedFile(name='boiler_image.jpg', content=b'', content_type='image/jpg')
-        self.boiler = Boilers.objects.create(
+        self.boiler = Product.objects.create(
             category=self.category,
             name='Test Boiler',
+            slug='test-boiler',
             image=image,
-            manufacturer='Manufacturer',
-            fuel_type1=True,
-            fuel_type2=False,
-            fuel_type3=True,
-            gas_passes_count=2,
-            heat_output=70,
-            heat_input=74,
-            water_press_loss=Decimal(6.0),
-            flue_gas_press_loss=Decimal(0.001),
-            max_pressure=6,
-            weight=236,
-            outlet_diameter='65',
-            inlet_diameter='65',
+            description='Test boiler description',
             price=Decimal(50000.00)
         )
         self.user = UserClass.objects.create(user=self.user_for_test)
         self.sel = Selection.objects.create(owner=self.user)
         self.selection_product = SelectedProduct.objects.create(
             user=self.user,
-            selection=self.sel,
-            content_object=self.boiler
+            selected_item=self.sel,
+            product=self.boiler
         )
 
-
     def test_add(self):
 
         self.sel.products.add(self.selection_product)
@@ -50,3 +83,1347 @@ class CatalogTestCases(TestCase):
         self.assertIn(self.selection_product, self.sel.products.all())
         self.assertEqual(self.sel.products.count(), 1)
         self.assertEqual(self.sel.final_price, Decimal(50000.00))
+
+
+class SelectionMixinTestCases(TestCase):
+
+    def setUp(self):
+        self.user_for_test = User.objects.create(username='test_user', password='test')
+        self.request = RequestFactory().get('/')
+        self.request.user = self.user_for_test
+        self.request.session = SessionStore()
+
+    def test_selection_is_created_and_cached(self):
+        selection = SelectionMixin().get_selection(self.request)
+        self.assertEqual(selection.owner.user, self.user_for_test)
+        self.assertEqual(self.request.session[SELECTION_SESSION_KEY]['selection'], selection.pk)
+
+    def test_warm_request_costs_one_query(self):
+        selection = SelectionMixin().get_selection(self.request)
+        with self.assertNumQueries(1):
+            cached_selection = SelectionMixin().get_selection(self.request)
+            self.assertEqual(cached_selection.owner.user_id, self.user_for_test.pk)
+        self.assertEqual(cached_selection, selection)
+
+    def test_ordered_selection_is_not_reused(self):
+        selection = SelectionMixin().get_selection(self.request)
+        selection.in_order = True
+        selection.save()
+        new_selection = SelectionMixin().get_selection(self.request)
+        self.assertNotEqual(new_selection, selection)
+        self.assertEqual(new_selection.owner, selection.owner)
+
+    def test_owner_created_by_concurrent_request_is_used(self):
+        owner = UserClass.objects.create(user=self.user_for_test)
+        get = QuerySet.get
+        missed = []
+
+        def get_after_concurrent_create(queryset, *args, **kwargs):
+            # The first lookup runs before the concurrent request has created owner
+            if queryset.model is UserClass and not missed:
+                missed.append(True)
+                raise UserClass.DoesNotExist
+            return get(queryset, *args, **kwargs)
+
+        with mock.patch.object(QuerySet, 'get', get_after_concurrent_create):
+            selection = SelectionMixin.resolve_selection(self.user_for_test)
+        self.assertEqual((missed, selection.owner), ([True], owner))
+
+
+class SelectionTotalsTestCases(TestCase):
+
+    def setUp(self):
+        self.user_for_test = User.objects.create(username='test_user', password='test')
+        self.category = Category.objects.create(name='Boilers', slug='boilers')
+        self.boiler = Product.objects.create(
+            category=self.category,
+            name='Test Boiler',
+            slug='test-boiler',
+            image='boiler_image.jpg',
+            price=Decimal('100.00')
+        )
+        self.client.force_login(self.user_for_test)
+
+    def get_selection(self):
+        return Selection.objects.get(owner__user=self.user_for_test, in_order=False)
+
+    def test_totals_follow_cart_mutations(self):
+        self.client.get('/add-to-selection/test-boiler/')
+        selection = self.get_selection()
+        self.assertEqual((selection.total_products, selection.final_price), (1, Decimal('100.00')))
+        self.client.post('/change-qty/test-boiler/', {'qty': 3})
+        selection = self.get_selection()
+        self.assertEqual((selection.total_products, selection.final_price), (1, Decimal('300.00')))
+        self.client.get('/remove-from-selection/test-boiler/')
+        selection = self.get_selection()
+        self.assertEqual((selection.total_products, selection.final_price), (0, Decimal('0.00')))
+
+    def test_change_qty_rejects_invalid_quantities(self):
+        self.client.get('/add-to-selection/test-boiler/')
+        for data in ({}, {'qty': 'many'}, {'qty': -1}, {'qty': 0}, {'qty': 10 ** 12}, {'qty': '2.5'}):
+            self.assertEqual(self.client.post('/change-qty/test-boiler/', data).status_code, 400, data)
+        Product.objects.filter(pk=self.boiler.pk).update(price=Decimal('9999999.00'))
+        SelectedProduct.objects.update(unit_price=Decimal('9999999.00'), final_price=Decimal('9999999.00'))
+        self.assertEqual(self.client.post('/change-qty/test-boiler/', {'qty': 2}).status_code, 400)
+        self.assertEqual(SelectedProduct.objects.get().qty, 1)
+
+    def test_drift_triggers_full_recalc(self):
+        self.client.get('/add-to-selection/test-boiler/')
+        selection = self.get_selection()
+        selection.total_products = 0
+        selection.save()
+        update_selection_totals(selection, price_delta=Decimal('0.00'))
+        selection = self.get_selection()
+        self.assertEqual((selection.total_products, selection.final_price), (1, Decimal('100.00')))
+
+    def test_batch_add(self):
+        Product.objects.create(
+            category=self.category,
+            name='Test Burner',
+            slug='test-burner',
+            image='burner_image.jpg',
+            price=Decimal('10.00')
+        )
+        self.client.get('/add-to-selection/test-boiler/')
+        response = self.client.post(
+            '/add-to-selection/',
+            {'items': [['test-boiler', 1], ['test-burner', 2], ['missing', 1]]},
+            content_type='application/json'
+        )
+        self.assertEqual(response.json()['not_found'], ['missing'])
+        selection = self.get_selection()
+        self.assertEqual((selection.total_products, selection.final_price), (2, Decimal('220.00')))
+        self.assertEqual(selection.products.get(product__slug='test-boiler').qty, 2)
+
+    def test_batch_add_rejects_invalid_quantities(self):
+        Product.objects.create(
+            category=self.category, name='Test Burner', slug='test-burner', image='burner_image.jpg',
+            price=Decimal('9950000.00')
+        )
+        for items in (
+            [['test-boiler', 10 ** 12]], [['test-boiler', '1.5']], [['test-boiler', 1.0]], [['test-boiler', 0]],
+            [['test-burner', 2]], [['test-burner', 1], ['test-boiler', 999]],
+        ):
+            response = self.client.post('/add-to-selection/', {'items': items}, content_type='application/json')
+            self.assertEqual(response.status_code, 400, items)
+        response = self.client.post('/add-to-selection/', {'slug': ['test-boiler'], 'qty': ['2.5']})
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(SelectedProduct.objects.exists())
+
+
+class CatalogFragmentCacheTestCases(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(name='Boilers', slug='boilers')
+        Product.objects.create(
+            category=self.category,
+            name='Test Boiler',
+            slug='test-boiler',
+            image='boiler_image.jpg',
+            price=Decimal('100.00')
+        )
+
+    def test_warm_home_page_skips_catalog_queries(self):
+        self.client.get('/')
+        with self.assertNumQueries(0):
+            response = self.client.get('/')
+        self.assertContains(response, 'Test Boiler')
+
+    def test_product_change_invalidates_fragments(self):
+        self.client.get('/')
+        Product.objects.create(
+            category=self.category,
+            name='Test Burner',
+            slug='test-burner',
+            image='burner_image.jpg',
+            price=Decimal('10.00')
+        )
+        self.assertContains(self.client.get('/'), 'Test Burner')
+
+    def test_version_bumped_by_other_process_is_seen(self):
+        self.client.get('/')
+        # Another process changes product by bulk statement and bumps version in database
+        Product.objects.update(name='Renamed Boiler')
+        CatalogVersion.objects.update(version=models.F('version') + 1)
+        self.assertContains(self.client.get('/'), 'Test Boiler')
+        checked = time.monotonic() + settings.CATALOG_VERSION_CHECK_INTERVAL
+        with mock.patch('catalogapp.utils.time.monotonic', return_value=checked):
+            self.assertContains(self.client.get('/'), 'Renamed Boiler')
+
+
+@override_settings(CATALOG_PAGE_SIZE=2)
+class KeysetPaginationTestCases(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.boilers = Category.objects.create(name='Boilers', slug='boilers')
+        self.burners = Category.objects.create(name='Burners', slug='burners')
+        for number, price in enumerate(['30.00', '10.00', '10.00', '20.00', '5.00']):
+            Product.objects.create(
+                category=self.boilers if number < 3 else self.burners,
+                name=f'Product {number}',
+                slug=f'product-{number}',
+                image='product_image.jpg',
+                price=Decimal(price)
+            )
+
+    def get_all_pages(self, url):
+        slugs, cursor = [], ''
+        while cursor is not None:
+            response = self.client.get(url, {'format': 'json', 'cursor': cursor})
+            slugs += [product['slug'] for product in response.json()['products']]
+            cursor = response.json()['next_cursor']
+        return slugs
+
+    def test_pages_follow_category_price_id_order(self):
+        self.assertEqual(
+            self.get_all_pages('/'),
+            ['product-1', 'product-2', 'product-0', 'product-4', 'product-3']
+        )
+        self.assertEqual(self.get_all_pages('/category/boilers/'), ['product-1', 'product-2', 'product-0'])
+
+    def test_category_page_renders_next_page_link(self):
+        response = self.client.get('/category/boilers/')
+        self.assertContains(response, 'Product 1')
+        self.assertContains(response, 'Next page')
+
+    def test_invalid_cursor(self):
+        self.assertEqual(self.client.get('/', {'cursor': 'broken'}).status_code, 400)
+
+
+class SelectionPageQueriesTestCases(TestCase):
+
+    def setUp(self):
+        self.user_for_test = User.objects.create(username='test_user', password='test')
+        self.category = Category.objects.create(name='Boilers', slug='boilers')
+        self.client.force_login(self.user_for_test)
+
+    def add_products(self, count):
+        for number in range(count):
+            product = Product.objects.create(
+                category=self.category,
+                name=f'Product {number}',
+                slug=f'product-{self.category.product_set.count()}',
+                image='product_image.jpg',
+                price=Decimal('10.00')
+            )
+            self.client.get(f'/add-to-selection/{product.slug}/')
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(context)
+
+    def test_query_count_does_not_depend_on_items(self):
+        for url in ('/selection/', '/checkout/'):
+            self.add_products(1)
+            small_selection_queries = self.count_queries(url)
+            self.add_products(10)
+            self.assertEqual(self.count_queries(url), small_selection_queries)
+
+
+class OrderHistoryTestCases(TestCase):
+
+    def setUp(self):
+        self.user_for_test = User.objects.create(username='test_user', password='test')
+        self.category = Category.objects.create(name='Boilers', slug='boilers')
+        self.boiler = Product.objects.create(
+            category=self.category,
+            name='Test Boiler',
+            slug='test-boiler',
+            image='boiler_image.jpg',
+            price=Decimal('100.00')
+        )
+        self.client.force_login(self.user_for_test)
+
+    def make_orders(self, count):
+        for number in range(count):
+            self.client.get('/add-to-selection/test-boiler/')
+            self.client.post('/makeorder/', {
+                'user': UserClass.objects.get(user=self.user_for_test).pk,
+                'order_type': 'self',
+                'order_date': '2021-10-02',
+                'comment': f'Order {number}'
+            })
+
+    def count_queries(self, url):
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(context)
+
+    def test_order_history(self):
+        self.make_orders(2)
+        response = self.client.get('/profile/orders/')
+        orders = response.json()['orders']
+        self.assertEqual(len(orders), 2)
+        self.assertEqual(orders[0]['final_price'], '100.00')
+        self.assertEqual(orders[0]['products'], [{'slug': 'test-boiler', 'name': 'Test Boiler', 'qty': 1}])
+        self.assertContains(self.client.get('/profile/'), '$100.00')
+
+    def test_query_count_does_not_depend_on_orders(self):
+        self.make_orders(1)
+        queries = self.count_queries('/profile/orders/'), self.count_queries('/profile/')
+        self.make_orders(5)
+        self.assertEqual((self.count_queries('/profile/orders/'), self.count_queries('/profile/')), queries)
+
+
+class ProductSearchTestCases(TestCase):
+
+    def setUp(self):
+        self.category = Category.objects.create(name='Burners', slug='burners')
+        self.burner = Product.objects.create(
+            category=self.category,
+            name='Weishaupt Monarch',
+            slug='weishaupt-monarch',
+            image='burner_image.jpg',
+            description='Dual fuel burner',
+            price=Decimal('100.00')
+        )
+
+    def test_search_follows_product_changes(self):
+        self.assertContains(self.client.get('/search/', {'q': 'dual burners'}), 'Weishaupt Monarch')
+        self.burner.name = 'Weishaupt WM'
+        self.burner.save()
+        self.assertContains(self.client.get('/search/', {'q': 'weishaupt'}), 'Weishaupt WM')
+        self.burner.delete()
+        self.assertContains(self.client.get('/search/', {'q': 'weishaupt'}), 'Nothing found')
+
+    def test_autocomplete(self):
+        call_command('rebuild_search_index', stdout=StringIO())
+        response = self.client.get('/search/autocomplete/', {'q': 'weishaupt mon'})
+        self.assertEqual(response.json()['suggestions'][0]['slug'], 'weishaupt-monarch')
+        self.assertEqual(self.client.get('/search/autocomplete/', {'q': '"*'}).json()['suggestions'], [])
+
+
+class FacetedFilteringTestCases(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(name='Boilers', slug='boilers')
+        for number, (heat_output, fuel_diesel) in enumerate([(70, False), (150, True), (300, True)]):
+            product = Product.objects.create(
+                category=self.category,
+                name=f'Boiler {number}',
+                slug=f'boiler-{number}',
+                image='boiler_image.jpg',
+                price=Decimal(heat_output * 10)
+            )
+            ProductSpecification.objects.create(
+                product=product,
+                heat_output=Decimal(heat_output),
+                fuel_gas=True,
+                fuel_diesel=fuel_diesel
+            )
+
+    def get_slugs(self, params):
+        response = self.client.get('/category/boilers/', dict(params, format='json'))
+        return [product['slug'] for product in response.json()['products']]
+
+    def test_filters(self):
+        self.assertEqual(self.get_slugs({'heat_output_min': 100}), ['boiler-1', 'boiler-2'])
+        self.assertEqual(self.get_slugs({'fuel': 'diesel', 'price_max': 2000}), ['boiler-1'])
+        self.assertEqual(self.get_slugs({'price_min': 'wrong'}), ['boiler-0', 'boiler-1', 'boiler-2'])
+
+    def test_not_finite_values_are_ignored(self):
+        for value in ('NaN', 'sNaN', 'Infinity', '-Infinity'):
+            self.assertEqual(
+                self.get_slugs({'price_min': value, 'heat_output_max': value}), ['boiler-0', 'boiler-1', 'boiler-2']
+            )
+        for value in ('NaN', 'Infinity', '1e100'):
+            response = self.client.get('/api/products/', {'category': 'boilers', 'price_min': value})
+            self.assertEqual(response.status_code, 200)
+
+    def test_facets_are_cached_until_catalog_changes(self):
+        facets = get_category_facets(self.category)
+        self.assertEqual(facets['ranges']['heat_output'], {'min': Decimal(70), 'max': Decimal(300)})
+        self.assertEqual([fuel['count'] for fuel in facets['fuels']], [3, 2, 0])
+        with self.assertNumQueries(0):
+            get_category_facets(self.category)
+        ProductSpecification.objects.filter(product__slug='boiler-0').get().delete()
+        self.assertEqual([fuel['count'] for fuel in get_category_facets(self.category)['fuels']], [2, 2, 0])
+
+    def test_product_page_shows_specification(self):
+        self.assertContains(self.client.get('/products/boiler-1/'), 'Heat power (output), kW')
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(), CATALOG_THUMBNAIL_WORKERS=0)
+class ThumbnailTestCases(TestCase):
+
+    def setUp(self):
+        content = BytesIO()
+        Image.new('RGB', (1600, 1200), 'red').save(content, 'JPEG')
+        self.category = Category.objects.create(name='Boilers', slug='boilers')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.boiler = Product.objects.create(
+                category=self.category,
+                name='Test Boiler',
+                slug='test-boiler',
+                image=SimpleUploadedFile(name='boiler_image.jpg', content=content.getvalue()),
+                price=Decimal('100.00')
+            )
+
+    def test_renditions_are_generated_on_save(self):
+        self.boiler.refresh_from_db()
+        self.assertTrue(self.boiler.has_thumbnails)
+        url = self.boiler.thumbnail_url('card')
+        self.assertTrue(url.endswith('.card.jpeg'))
+        with default_storage.open(thumbnail_name(self.boiler.image.name, 'card', 'jpeg')) as thumbnail:
+            self.assertEqual(Image.open(thumbnail).size, (400, 300))
+        response = self.client.get('/')
+        self.assertContains(response, '<source srcset="{}" type="image/webp">'.format(
+            self.boiler.thumbnail_url('card', 'webp')
+        ))
+        self.assertContains(response, url)
+
+    def test_cached_pages_get_renditions_when_they_are_made(self):
+        content = BytesIO()
+        Image.new('RGB', (800, 600), 'blue').save(content, 'JPEG')
+        with self.captureOnCommitCallbacks() as callbacks:
+            burner = Product.objects.create(
+                category=self.category, name='Test Burner', slug='test-burner', price=Decimal('10.00'),
+                image=SimpleUploadedFile(name='burner_image.jpg', content=content.getvalue())
+            )
+        self.assertContains(self.client.get('/'), 'src="{}"'.format(burner.image.url))
+        with mock.patch.object(default_storage, 'exists', side_effect=AssertionError):
+            self.client.get('/')
+        for callback in callbacks:
+            callback()
+        burner.refresh_from_db()
+        self.assertContains(self.client.get('/'), 'src="{}"'.format(burner.thumbnail_url('card')))
+
+    def test_renditions_of_images_with_same_root_do_not_collide(self):
+        self.assertNotEqual(
+            thumbnail_name('products/boiler.png', 'card'), thumbnail_name('products/boiler.jpg', 'card')
+        )
+        self.assertEqual(thumbnail_name('products/boiler.jpg', 'card'), 'products/boiler.jpg.card.webp')
+
+    def test_worker_closes_its_connection(self):
+        with mock.patch('catalogapp.thumbnails.record_renditions', side_effect=OperationalError), \
+                mock.patch('catalogapp.thumbnails.connection') as worker_connection:
+            with self.assertRaises(OperationalError):
+                _generate_in_worker([self.boiler.image.name])
+        worker_connection.close.assert_called_once_with()
+
+    def test_backfill_command_skips_up_to_date_renditions(self):
+        output = StringIO()
+        call_command('generate_thumbnails', stdout=output)
+        self.assertIn('0 renditions of 1 images generated, 0 products marked', output.getvalue())
+        Product.objects.update(thumbnail_source='')
+        version = get_catalog_version()
+        call_command('generate_thumbnails', '--force', stdout=output)
+        self.assertIn('4 renditions of 1 images generated, 1 products marked', output.getvalue())
+        self.assertGreater(get_catalog_version(), version)
+
+
+class AnonymousSelectionTestCases(TestCase):
+
+    def setUp(self):
+        self.category = Category.objects.create(name='Boilers', slug='boilers')
+        for slug, price in (('test-boiler', '100.00'), ('test-burner', '10.00')):
+            Product.objects.create(
+                category=self.category,
+                name=slug,
+                slug=slug,
+                image='product_image.jpg',
+                price=Decimal(price)
+            )
+
+    def test_anonymous_selection_is_not_stored_in_database(self):
+        self.client.get('/add-to-selection/test-boiler/')
+        self.client.post('/add-to-selection/', {'slug': ['test-burner'], 'qty': [2]})
+        self.client.post('/change-qty/test-boiler/', {'qty': 3})
+        self.assertFalse(Selection.objects.exists())
+        self.assertFalse(SelectedProduct.objects.exists())
+        response = self.client.get('/selection/')
+        self.assertEqual(response.context['selection_view'].final_price, Decimal('320.00'))
+        self.client.get('/remove-from-selection/test-boiler/')
+        self.assertEqual(self.client.get('/selection/').context['selection'].items, {'test-burner': 2})
+
+    def test_tampered_cookie_is_ignored(self):
+        self.client.cookies[ANONYMOUS_SELECTION_COOKIE] = '{"test-boiler": 1}'
+        self.assertEqual(self.client.get('/selection/').context['selection'].items, {})
+
+    def test_anonymous_selection_rejects_invalid_quantities(self):
+        self.client.get('/add-to-selection/test-boiler/')
+        for qty in (0, -1, 1000):
+            self.assertEqual(self.client.post('/change-qty/test-boiler/', {'qty': qty}).status_code, 400)
+        self.assertEqual(
+            self.client.post('/add-to-selection/', {'slug': ['test-boiler'], 'qty': [999]}).status_code, 400
+        )
+        self.assertEqual(self.client.get('/selection/').context['selection'].items, {'test-boiler': 1})
+        selection = AnonymousSelection({'test-boiler': 1})
+        with self.assertRaises(QuantityError):
+            selection.change_qty('test-boiler', 0)
+        Product.objects.filter(slug='test-boiler').update(price=Decimal('9950000.00'))
+        with self.assertRaises(QuantityError):
+            selection.change_qty('test-boiler', 2)
+        self.assertEqual((selection.items, selection.modified), ({'test-boiler': 1}, False))
+
+    def test_selection_is_merged_on_login(self):
+        user = User.objects.create(username='test_user')
+        user.set_password('test')
+        user.save()
+        self.client.get('/add-to-selection/test-boiler/')
+        response = self.client.post('/login/', {'username': 'test_user', 'password': 'test'})
+        self.assertEqual(response.cookies[ANONYMOUS_SELECTION_COOKIE].value, '')
+        selection = Selection.objects.get(owner__user=user, in_order=False)
+        self.assertEqual((selection.total_products, selection.final_price), (1, Decimal('100.00')))
+
+
+@override_settings(ROOT_URLCONF='new_catalog.asgi_urls')
+class AsyncCatalogViewsTestCases(TestCase):
+
+    def setUp(self):
+        self.user_for_test = User.objects.create(username='test_user', password='test')
+        self.category = Category.objects.create(name='Boilers', slug='boilers')
+        self.boiler = Product.objects.create(
+            category=self.category,
+            name='Test Boiler',
+            slug='test-boiler',
+            image='boiler_image.jpg',
+            price=Decimal('100.00')
+        )
+        ProductSpecification.objects.create(product=self.boiler, heat_output=Decimal('24'))
+        SelectionService(SelectionMixin.resolve_selection(self.user_for_test)).add_product(self.boiler)
+
+    async def test_catalog_pages_are_served_by_async_views(self):
+        for url in ('/', '/category/boilers/', '/products/test-boiler/'):
+            response = await self.async_client.get(url)
+            self.assertTrue(response.resolver_match.func.view_class.view_is_async)
+            self.assertContains(response, 'Test Boiler')
+        response = await self.async_client.get('/category/boilers/', {'format': 'json'})
+        self.assertEqual([product['slug'] for product in response.json()['products']], ['test-boiler'])
+        response = await self.async_client.get('/products/missing/')
+        self.assertEqual(response.status_code, 404)
+
+    async def test_detail_views_use_catalog_cache(self):
+        await self.async_client.get('/products/test-boiler/')
+        await self.async_client.get('/category/boilers/')
+        # update() does not bump catalog version, cached objects are still served
+        await Product.objects.filter(pk=self.boiler.pk).aupdate(name='Renamed Boiler')
+        await Category.objects.filter(pk=self.category.pk).aupdate(slug='renamed')
+        self.assertContains(await self.async_client.get('/products/test-boiler/'), 'Test Boiler')
+        response = await self.async_client.get('/category/boilers/')
+        self.assertEqual(response.context['category'].slug, 'boilers')
+
+    async def test_anonymous_selection(self):
+        await self.async_client.get('/add-to-selection/test-boiler/')
+        response = await self.async_client.get('/selection/')
+        self.assertEqual(response.context['selection_view'].final_price, Decimal('100.00'))
+        self.assertContains(response, 'Test Boiler')
+
+    async def test_user_selection(self):
+        await sync_to_async(self.async_client.force_login)(self.user_for_test)
+        response = await self.async_client.get('/selection/')
+        self.assertEqual(response.context['selection_view'].count, 1)
+        self.assertContains(response, 'Test Boiler')
+
+
+class SelectionServiceTestCases(TransactionTestCase):
+
+    def setUp(self):
+        self.user_for_test = User.objects.create(username='test_user', password='test')
+        self.category = Category.objects.create(name='Boilers', slug='boilers')
+        self.products = [
+            Product.objects.create(
+                category=self.category,
+                name=f'Product {number}',
+                slug=f'product-{number}',
+                image='product_image.jpg',
+                price=Decimal('10.00') * (number + 1)
+            )
+            for number in range(5)
+        ]
+        self.selection = SelectionMixin.resolve_selection(self.user_for_test)
+
+    def assert_totals_are_consistent(self):
+        selection = Selection.objects.get(pk=self.selection.pk)
+        stored_totals = selection.total_products, selection.final_price
+        recalc_selection(selection)
+        self.assertEqual(stored_totals, (selection.total_products, selection.final_price))
+        self.assertEqual(selection.total_products, SelectedProduct.objects.filter(selected_item=selection).count())
+
+    def test_parallel_mutations_keep_totals_consistent(self):
+        errors = []
+
+        def mutate(number):
+            service = SelectionService(copy.copy(self.selection))
+            try:
+                for step in range(20):
+                    product = self.products[(number + step) % len(self.products)]
+                    service.add_product(product)
+                    service.change_qty(product, step % 3 + 1)
+                    if step % 4 == number % 4:
+                        service.remove_product(product)
+            except Exception as error:
+                errors.append(error)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=mutate, args=(number,)) for number in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        self.assert_totals_are_consistent()
+
+    def test_idempotency_key(self):
+        service = SelectionService(self.selection)
+        self.assertTrue(service.add_product(self.products[0], idempotency_key='add-1'))
+        self.assertTrue(service.remove_product(self.products[0], idempotency_key='remove-1'))
+        self.assertFalse(service.add_product(self.products[0], idempotency_key='add-1'))
+        self.assertIsNone(service.add_products({'product-1': 2}, idempotency_key='add-1'))
+        self.assertEqual(Selection.objects.get(pk=self.selection.pk).total_products, 0)
+        self.assert_totals_are_consistent()
+
+
+def failing_step(order):
+    raise RuntimeError('Quote service is not available')
+
+
+def flaky_step(order):
+    if order.jobs.get().attempts < 2:
+        raise RuntimeError('Quote service is not available')
+
+
+ATOMIC_DEPTHS = []
+
+
+def atomic_depth_step(order):
+    ATOMIC_DEPTHS.append(len(connection.atomic_blocks))
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(), EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend')
+class OrderPipelineTestCases(TestCase):
+
+    def setUp(self):
+        self.user_for_test = User.objects.create(username='test_user', password='test', email='test@example.com')
+        self.category = Category.objects.create(name='Boilers', slug='boilers')
+        Product.objects.create(
+            category=self.category,
+            name='Test Boiler',
+            slug='test-boiler',
+            image='boiler_image.jpg',
+            price=Decimal('100.00')
+        )
+        self.client.force_login(self.user_for_test)
+        self.client.get('/add-to-selection/test-boiler/')
+        self.client.post('/makeorder/', {
+            'user': UserClass.objects.get(user=self.user_for_test).pk,
+            'order_type': 'self',
+            'order_date': '2021-10-02',
+        })
+        self.order = Order.objects.get()
+
+    def test_checkout_enqueues_job(self):
+        job = OrderJob.objects.get()
+        self.assertEqual((job.order, job.status), (self.order, OrderJob.STATUS_PENDING))
+        self.assertEqual(self.order.status, Order.STATUS_NEW)
+        self.assertEqual(self.order.final_price, Decimal('100.00'))
+        self.assertTrue(self.order.selection.in_order)
+        self.assertFalse(self.user_for_test.userclass_set.get().orders.exists())
+
+    def test_selection_is_ordered_once(self):
+        data = {'user': self.order.user_id, 'order_type': 'self', 'order_date': '2021-10-02'}
+        response = self.client.post('/makeorder/', data)
+        self.assertEqual(response.status_code, 302)
+        # Concurrent submit loaded selection before the first one ordered it
+        with mock.patch('catalogapp.mixins.SelectionMixin.resolve_selection', return_value=self.order.selection):
+            session = self.client.session
+            session.pop(SELECTION_SESSION_KEY, None)
+            session.save()
+            self.client.post('/makeorder/', data)
+        self.assertEqual((Order.objects.count(), OrderJob.objects.count()), (1, 1))
+
+    def test_worker_processes_order(self):
+        call_command('run_order_worker', once=True, stdout=StringIO())
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.status, Order.STATUS_COMPLETED)
+        self.assertEqual(OrderJob.objects.get().status, OrderJob.STATUS_DONE)
+        self.assertEqual(list(self.order.user.orders.all()), [self.order])
+        with default_storage.open(quote_name(self.order)) as quote:
+            self.assertIn(b'Test Boiler', quote.read())
+        self.assertEqual(mail.outbox[0].to, ['test@example.com'])
+
+    def test_order_without_email_is_ready(self):
+        User.objects.update(email='')
+        process_jobs()
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.status, Order.STATUS_READY)
+        self.assertEqual(mail.outbox, [])
+
+    @override_settings(ORDER_PIPELINE=[
+        'catalogapp.orders.link_order', 'catalogapp.orders.notify_user', 'catalogapp.tests.flaky_step'
+    ])
+    def test_retry_skips_completed_steps(self):
+        process_jobs()
+        job = OrderJob.objects.get()
+        self.assertEqual(job.status, OrderJob.STATUS_PENDING)
+        self.assertEqual(job.completed_steps, ['catalogapp.orders.link_order', 'catalogapp.orders.notify_user'])
+        OrderJob.objects.update(run_after=timezone.now())
+        process_jobs()
+        job.refresh_from_db()
+        self.assertEqual((job.status, len(job.completed_steps)), (OrderJob.STATUS_DONE, 3))
+        self.assertEqual(len(mail.outbox), 1)
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.status, Order.STATUS_COMPLETED)
+
+    @override_settings(ORDER_PIPELINE=['catalogapp.tests.atomic_depth_step'])
+    def test_steps_do_not_run_in_transaction(self):
+        ATOMIC_DEPTHS.clear()
+        depth = len(connection.atomic_blocks)
+        process_jobs()
+        self.assertEqual(ATOMIC_DEPTHS, [depth])
+        ATOMIC_DEPTHS.clear()
+        OrderJob.objects.update(status=OrderJob.STATUS_PENDING, completed_steps=[])
+        with mock.patch.object(atomic_depth_step, 'in_transaction', True, create=True):
+            process_jobs()
+        self.assertEqual(ATOMIC_DEPTHS, [depth + 1])
+
+    @override_settings(ORDER_PIPELINE=['catalogapp.tests.failing_step'], ORDER_JOB_MAX_ATTEMPTS=2)
+    def test_failed_job_is_retried(self):
+        self.assertEqual(process_jobs(), 1)
+        job = OrderJob.objects.get()
+        self.assertEqual((job.status, job.attempts), (OrderJob.STATUS_PENDING, 1))
+        self.assertIn('Quote service is not available', job.last_error)
+        self.assertEqual(process_jobs(), 0)
+        OrderJob.objects.update(run_after=timezone.now())
+        process_jobs()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (OrderJob.STATUS_FAILED, 2))
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.status, Order.STATUS_NEW)
+
+
+class BenchmarkTestCases(TestCase):
+
+    def setUp(self):
+        seed_catalog(categories=2, products=10)
+        seed_users(users=2, selections=2, orders=2)
+
+    def test_all_endpoints_respond(self):
+        results = run_benchmark(requests=2, warmup=1)
+        self.assertEqual(len(results), 17)
+        self.assertEqual({name: result['errors'] for name, result in results.items() if result['errors']}, {})
+        self.assertEqual(results['home']['requests'], 2)
+
+    def test_compare_results_reports_regressions(self):
+        baseline = benchmark_report(run_benchmark(requests=2, warmup=1, only=['product']))
+        results = copy.deepcopy(baseline)
+        results['endpoints']['product']['queries'] += 1
+        rows, regressions = compare_results(baseline, results)
+        self.assertEqual(len(rows), 4)
+        self.assertEqual(regressions, ['product.queries'])
+
+
+class RequestMetricsTestCases(TestCase):
+
+    def setUp(self):
+        for histogram in HISTOGRAMS:
+            histogram.clear()
+        self.category = Category.objects.create(name='Boilers', slug='boilers')
+        Product.objects.create(
+            category=self.category,
+            name='Test Boiler',
+            slug='test-boiler',
+            image='boiler_image.jpg',
+            price=Decimal('100.00')
+        )
+
+    def get_series(self, histogram, *label_values):
+        counts, total = histogram.series[label_values]
+        return sum(counts), total
+
+    def test_request_is_measured(self):
+        with CaptureQueriesContext(connection) as context:
+            self.client.get('/products/test-boiler/')
+        self.assertEqual(self.get_series(REQUEST_QUERIES, 'product_detail'), (1, len(context)))
+        self.assertEqual(self.get_series(REQUEST_DURATION, 'product_detail', 'GET', 200)[0], 1)
+        self.assertGreater(self.get_series(TEMPLATE_RENDER_DURATION, 'product_detail')[1], 0)
+        response = self.client.get('/metrics')
+        self.assertEqual(response['Content-Type'], 'text/plain; version=0.0.4; charset=utf-8')
+        self.assertContains(response, 'catalog_request_queries_count{view="product_detail"} 1\n')
+        self.assertContains(
+            response,
+            'catalog_request_duration_seconds_bucket{view="product_detail",method="GET",status="200",le="+Inf"} 1\n'
+        )
+
+    @override_settings(ROOT_URLCONF='new_catalog.asgi_urls')
+    async def test_async_request_is_measured(self):
+        await self.async_client.get('/products/test-boiler/')
+        count, queries = self.get_series(REQUEST_QUERIES, 'product_detail')
+        self.assertEqual(count, 1)
+        self.assertGreater(queries, 0)
+
+    def test_metrics_are_not_public(self):
+        self.assertEqual(self.client.get('/metrics', REMOTE_ADDR='10.0.0.1').status_code, 403)
+
+    @override_settings(METRICS_SLOW_REQUEST_SECONDS=0)
+    def test_slow_request_is_logged_with_sql(self):
+        with self.assertLogs('catalogapp.metrics', 'WARNING') as logs:
+            self.client.get('/products/test-boiler/')
+        self.assertIn('Slow request GET /products/test-boiler/ (product_detail)', logs.output[0])
+        self.assertIn('FROM "catalogapp_product"', logs.output[0])
+
+
+    def test_unknown_methods_share_series(self):
+        for method in ('FOO1', 'FOO2'):
+            self.client.generic(method, '/products/test-boiler/')
+        self.assertEqual(self.get_series(REQUEST_DURATION, 'product_detail', 'other', 405)[0], 2)
+        self.assertEqual(len(REQUEST_DURATION.series), 1)
+
+    @override_settings(METRICS_SLOW_REQUEST_SECONDS=0, METRICS_SLOW_REQUEST_STATEMENTS=2)
+    def test_only_slowest_statements_are_kept(self):
+        metrics = RequestMetrics(keep_sql=2)
+        token = current_request.set(metrics)
+        try:
+            for duration in (0.05, 0.01, 0.02):
+                record_query(lambda *args: time.sleep(duration), f'SELECT {duration}', None, False, None)
+        finally:
+            current_request.reset(token)
+        self.assertEqual([sql for duration, sql in sorted(metrics.statements)], ['SELECT 0.02', 'SELECT 0.05'])
+
+
+class CatalogCacheTestCases(TestCase):
+
+    def setUp(self):
+        self.user_for_test = User.objects.create(username='test_user', password='test')
+        self.category = Category.objects.create(name='Boilers', slug='boilers')
+        self.boiler = Product.objects.create(
+            category=self.category,
+            name='Test Boiler',
+            slug='test-boiler',
+            image='boiler_image.jpg',
+            price=Decimal('100.00')
+        )
+
+    def test_lookups_are_cached_till_catalog_changes(self):
+        self.assertEqual(get_product('test-boiler'), self.boiler)
+        self.assertEqual(get_category('boilers'), self.category)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_product('test-boiler').category, self.category)
+            self.assertEqual(get_categories(), [self.category])
+            self.assertEqual(get_category('boilers'), self.category)
+        self.assertIsNone(get_product('missing'))
+        self.boiler.price = Decimal('120.00')
+        self.boiler.save()
+        self.assertEqual(get_product('test-boiler').price, Decimal('120.00'))
+        Category.objects.create(name='Burners', slug='burners')
+        self.assertEqual(len(get_categories()), 2)
+
+    def test_cart_mutation_does_not_query_product(self):
+        self.client.force_login(self.user_for_test)
+        self.client.get('/add-to-selection/test-boiler/')
+        with CaptureQueriesContext(connection) as context:
+            self.client.post('/change-qty/test-boiler/', {'qty': 2})
+        self.assertFalse([query for query in context if 'FROM "catalogapp_product"' in query['sql']])
+        self.assertEqual(self.client.get('/add-to-selection/missing/').status_code, 404)
+
+    def test_local_lru_cache(self):
+        backend = LocalLRUCache(max_entries=2, timeout=60)
+        backend.set('a', 1)
+        backend.set('b', 2)
+        backend.get('a')
+        backend.set('c', 3)
+        self.assertEqual((backend.get('a'), backend.get('b'), backend.get('c')), (1, None, 3))
+        with mock.patch('catalogapp.catalog_cache.time.monotonic', return_value=time.monotonic() + 61):
+            self.assertIsNone(backend.get('a'))
+
+    @override_settings(
+        CACHES={
+            'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+            'catalog': {
+                'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+                'LOCATION': tempfile.mkdtemp()
+            }
+        },
+        CATALOG_CACHE={'BACKEND': 'catalogapp.catalog_cache.DjangoCache', 'OPTIONS': {'alias': 'catalog'}}
+    )
+    def test_django_cache_backend(self):
+        self.assertEqual(get_categories(), [self.category])
+        with self.assertNumQueries(0):
+            self.assertEqual(get_categories(), [self.category])
+
+
+class DatabaseModeTestCases(TestCase):
+
+    @override_settings(CATALOG_SQLITE_PRAGMAS={'default': {'cache_size': -4096, 'query_only': 'ON'}})
+    def test_sqlite_pragmas_are_applied(self):
+        apply_sqlite_pragmas(connection)
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('PRAGMA cache_size')
+                self.assertEqual(cursor.fetchone()[0], -4096)
+                cursor.execute('PRAGMA query_only')
+                self.assertEqual(cursor.fetchone()[0], 1)
+        finally:
+            with connection.cursor() as cursor:
+                cursor.execute('PRAGMA query_only = OFF')
+
+    @override_settings(CATALOG_READ_DATABASE='replica')
+    def test_catalog_reads_are_routed_to_replica(self):
+        router = CatalogReadRouter()
+        self.assertEqual(router.db_for_read(Product), 'replica')
+        self.assertEqual(router.db_for_read(Category), 'replica')
+        self.assertIsNone(router.db_for_read(Selection))
+        self.assertEqual(router.db_for_write(Product), 'default')
+        product, selected_product = Product(), SelectedProduct()
+        product._state.db, selected_product._state.db = 'replica', 'default'
+        self.assertTrue(router.allow_relation(selected_product, product))
+        self.assertFalse(router.allow_migrate('replica', 'catalogapp'))
+
+
+class QueryPlanTestCases(TestCase):
+
+    def test_views_do_not_scan_whole_tables(self):
+        seed_catalog(categories=2, products=20)
+        seed_users(users=2, selections=2, orders=2)
+        output = StringIO()
+        call_command('explain_queries', no_seed=True, stdout=output)
+        self.assertIn('No full table scans', output.getvalue())
+
+    def test_full_scans_are_detected(self):
+        plan = explain('SELECT * FROM catalogapp_selection WHERE total_products = %s', [1])
+        self.assertEqual(full_scans(plan), ['SCAN catalogapp_selection'])
+        plan = explain('SELECT * FROM catalogapp_selection WHERE owner_id = %s AND in_order = %s', [1, False])
+        self.assertEqual(full_scans(plan), [])
+
+    def test_duplicates_are_rejected(self):
+        user = User.objects.create(username='test_user')
+        UserClass.objects.create(user=user)
+        with self.assertRaises(IntegrityError):
+            UserClass.objects.create(user=user)
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(), CATALOG_THUMBNAIL_WORKERS=0)
+class CatalogImportExportTestCases(TestCase):
+
+    def setUp(self):
+        self.category = Category.objects.create(name='Boilers', slug='boilers')
+        self.boiler = Product.objects.create(
+            category=self.category,
+            name='Test Boiler',
+            slug='test-boiler',
+            image='boiler_image.jpg',
+            price=Decimal('100.00')
+        )
+
+    def test_csv_import_upserts_by_slug(self):
+        rows = StringIO(
+            'slug,name,category,category_name,price,description,image\n'
+            'test-boiler,Boiler 2,boilers,,120.50,New description,\n'
+            'monarch,Weishaupt Monarch,burners,Burners,300,,monarch.jpg\n'
+            'broken,Broken,burners,,not a price,,\n'
+            'no-image,No image,burners,,10,,\n'
+        )
+        with self.assertNumQueries(13):
+            result = import_catalog(rows, 'csv', chunk_size=10)
+        self.assertEqual((result.created, result.updated), (1, 1))
+        self.assertEqual(result.errors, [
+            (4, "price 'not a price' is not a number"), (5, 'image is required for new product')
+        ])
+        self.boiler.refresh_from_db()
+        self.assertEqual((self.boiler.name, self.boiler.price), ('Boiler 2', Decimal('120.50')))
+        self.assertEqual(self.boiler.image.name, 'boiler_image.jpg')
+        self.assertEqual(Product.objects.get(slug='monarch').category.name, 'Burners')
+        self.assertContains(self.client.get('/search/', {'q': 'monarch'}), 'Weishaupt Monarch')
+
+    def test_invalid_prices_are_row_errors(self):
+        rows = StringIO(
+            'slug,name,category,price\n'
+            'test-boiler,Boiler,boilers,1e12\n'
+            'test-boiler,Boiler,boilers,NaN\n'
+            'test-boiler,Boiler,boilers,-Infinity\n'
+            'test-boiler,Boiler,boilers,-5\n'
+            'test-boiler,Boiler,boilers,99.5\n'
+        )
+        result = import_catalog(rows, 'csv')
+        self.assertEqual([number for number, error in result.errors], [2, 3, 4, 5])
+        self.assertEqual(result.updated, 1)
+        self.assertEqual(Product.objects.get(slug='test-boiler').price, Decimal('99.50'))
+
+    def test_imported_rows_are_indexed_from_default_database(self):
+        rows = StringIO('slug,name,category,price\ntest-boiler,Boiler 2,boilers,10\n')
+        with mock.patch('catalogapp.search.index_products') as index_products:
+            import_catalog(rows, 'csv')
+        products = index_products.call_args.args[0]
+        with override_settings(DATABASE_ROUTERS=[CatalogReadRouter()], CATALOG_READ_DATABASE='replica'):
+            self.assertEqual(products.db, 'default')
+
+    def test_jsonl_import_attaches_images(self):
+        images_dir = tempfile.mkdtemp()
+        content = BytesIO()
+        Image.new('RGB', (40, 30), 'red').save(content, 'JPEG')
+        with open(os.path.join(images_dir, 'burner.jpg'), 'wb') as image:
+            image.write(content.getvalue())
+        rows = StringIO('\n'.join(json.dumps(row) for row in [
+            {'slug': 'burner', 'name': 'Burner', 'category': 'boilers', 'price': '10', 'image': 'burner.jpg'},
+            {'slug': 'lost', 'name': 'Lost', 'category': 'boilers', 'price': '10', 'image': 'lost.jpg'},
+        ]))
+        result = import_catalog(rows, 'jsonl', images_dir=images_dir)
+        self.assertEqual(result.created, 1)
+        self.assertEqual(len(result.errors), 1)
+        burner = Product.objects.get(slug='burner')
+        self.assertTrue(default_storage.exists(burner.image.name))
+        self.assertTrue(default_storage.exists(thumbnail_name(burner.image.name, 'card')))
+
+        # Image of the same name with other bytes does not replace image of burner
+        other_dir = os.path.join(images_dir, 'other')
+        os.mkdir(other_dir)
+        content = BytesIO()
+        Image.new('RGB', (40, 30), 'blue').save(content, 'JPEG')
+        with open(os.path.join(other_dir, 'burner.jpg'), 'wb') as image:
+            image.write(content.getvalue())
+        rows = StringIO('\n'.join(json.dumps(row) for row in [
+            {'slug': 'blue-burner', 'name': 'Blue', 'category': 'boilers', 'price': '10', 'image': 'other/burner.jpg'},
+            {'slug': 'red-burner', 'name': 'Red', 'category': 'boilers', 'price': '10', 'image': 'burner.jpg'},
+        ]))
+        self.assertEqual(import_catalog(rows, 'jsonl', images_dir=images_dir).created, 2)
+        images = dict(Product.objects.values_list('slug', 'image'))
+        self.assertEqual(images['red-burner'], burner.image.name)
+        self.assertNotEqual(images['blue-burner'], burner.image.name)
+        with default_storage.open(burner.image.name) as image:
+            self.assertGreater(Image.open(image).getpixel((0, 0))[0], 200)
+        with default_storage.open(images['blue-burner']) as image:
+            self.assertEqual(image.read(), content.getvalue())
+
+    def test_export_round_trip(self):
+        for file_format in ('csv', 'jsonl'):
+            exported = StringIO()
+            self.assertEqual(export_catalog(exported, file_format, chunk_size=1), 1)
+            Product.objects.all().delete()
+            exported.seek(0)
+            result = import_catalog(exported, file_format)
+            self.assertEqual((result.created, result.errors), (1, []))
+            product = Product.objects.select_related('category').get()
+            self.assertEqual(
+                (product.slug, product.name, product.category, product.price, product.image.name),
+                ('test-boiler', 'Test Boiler', self.category, Decimal('100.00'), 'boiler_image.jpg')
+            )
+
+    def test_commands(self):
+        directory = tempfile.mkdtemp()
+        path = os.path.join(directory, 'catalog.csv')
+        output = StringIO()
+        call_command('export_catalog', path, stdout=output, stderr=StringIO())
+        self.assertIn('1 products exported', output.getvalue())
+        output = StringIO()
+        call_command('import_catalog', path, stdout=output)
+        self.assertIn('0 products created, 1 updated, 0 rows skipped', output.getvalue())
+
+
+class RepriceSelectionsTestCases(TestCase):
+
+    def setUp(self):
+        self.category = Category.objects.create(name='Boilers', slug='boilers')
+        self.boiler = Product.objects.create(
+            category=self.category, name='Test Boiler', slug='test-boiler', image='boiler_image.jpg',
+            price=Decimal('100.00')
+        )
+        self.burner = Product.objects.create(
+            category=self.category, name='Test Burner', slug='test-burner', image='burner_image.jpg',
+            price=Decimal('10.10')
+        )
+        owner = UserClass.objects.create(user=User.objects.create(username='test_user'))
+        self.selection = Selection.objects.create(owner=owner)
+        self.ordered = Selection.objects.create(owner=owner)
+        for selection in (self.selection, self.ordered):
+            SelectionService(selection).add_products({'test-boiler': 1, 'test-burner': 3})
+        self.ordered.in_order = True
+        self.ordered.save()
+
+    def totals(self, selection):
+        selection.refresh_from_db()
+        return selection.final_price, sorted(selection.products.values_list('unit_price', 'final_price'))
+
+    def test_unit_price_is_kept_until_reprice(self):
+        self.assertEqual(self.totals(self.selection)[0], Decimal('130.30'))
+        Product.objects.filter(pk=self.burner.pk).update(price=Decimal('20.20'))
+        SelectionService(self.selection).change_qty(self.burner, 2)
+        self.assertEqual(self.totals(self.selection)[0], Decimal('120.20'))
+
+        with self.assertNumQueries(4):
+            result = reprice_selections()
+        self.assertEqual((result.items, result.selections), (1, 1))
+        self.assertEqual(self.totals(self.selection), (
+            Decimal('140.40'), [(Decimal('20.20'), Decimal('40.40')), (Decimal('100.00'), Decimal('100.00'))]
+        ))
+        self.assertEqual(self.totals(self.ordered)[0], Decimal('130.30'))
+
+        result = reprice_selections()
+        self.assertEqual((result.items, result.selections), (0, 0))
+
+    def test_reprice_of_given_products(self):
+        Product.objects.update(price=Decimal('1.00'))
+        result = reprice_selections(Product.objects.filter(slug='test-boiler'))
+        self.assertEqual((result.items, result.selections), (1, 1))
+        self.assertEqual(self.totals(self.selection)[0], Decimal('31.30'))
+        output = StringIO()
+        call_command('reprice_selections', stdout=output)
+        self.assertIn('1 items repriced, 1 selections changed', output.getvalue())
+        self.assertEqual(self.totals(self.selection)[0], Decimal('4.00'))
+
+    def test_pages_show_unit_price_of_item(self):
+        Product.objects.filter(pk=self.burner.pk).update(price=Decimal('20.20'))
+        self.client.force_login(User.objects.get(username='test_user'))
+        for url in ('/selection/', '/checkout/'):
+            response = self.client.get(url)
+            self.assertContains(response, '<td>$10.10</td>')
+            self.assertNotContains(response, '$20.20')
+
+    def test_save_does_not_load_product_with_unit_price(self):
+        item = SelectedProduct.objects.get(selected_item=self.selection, product=self.boiler)
+        item = SelectedProduct.objects.get(pk=item.pk)
+        item.qty = 2
+        with self.assertNumQueries(1):
+            item.save()
+        self.assertEqual(item.final_price, Decimal('200.00'))
+
+
+class CatalogAPITestCases(TestCase):
+
+    def setUp(self):
+        self.category = Category.objects.create(name='Boilers', slug='boilers')
+        self.boiler = Product.objects.create(
+            category=self.category, name='Test Boiler', slug='test-boiler', image='boiler_image.jpg',
+            price=Decimal('100.00')
+        )
+        ProductSpecification.objects.create(product=self.boiler, manufacturer='Viessmann', fuel_gas=True)
+        Product.objects.create(
+            category=self.category, name='Test Burner', slug='test-burner', image='burner_image.jpg',
+            price=Decimal('10.00')
+        )
+
+    def test_catalog_resources(self):
+        categories = self.client.get('/api/categories/').json()['categories']
+        self.assertEqual(categories, [
+            {'slug': 'boilers', 'name': 'Boilers', 'products': '/api/products/?category=boilers'}
+        ])
+        with override_settings(CATALOG_PAGE_SIZE=1):
+            first = self.client.get(categories[0]['products']).json()
+            second = self.client.get('/api/products/', {'cursor': first['next_cursor']}).json()
+        self.assertEqual(
+            [product['slug'] for product in first['products'] + second['products']], ['test-burner', 'test-boiler']
+        )
+        self.assertIsNone(second['next_cursor'])
+        product = self.client.get(second['products'][0]['url']).json()
+        self.assertEqual((product['price'], product['category_name']), ('100.00', 'Boilers'))
+        self.assertEqual(product['specification']['manufacturer'], 'Viessmann')
+        self.assertEqual(self.client.get('/api/products/missing/').status_code, 404)
+        self.assertEqual(self.client.post('/api/categories/').status_code, 405)
+
+    def test_conditional_get(self):
+        response = self.client.get('/api/products/test-boiler/')
+        etag, last_modified = response['ETag'], response['Last-Modified']
+        self.assertFalse(etag.startswith('W/'))
+        self.assertIn('no-cache', response['Cache-Control'])
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/products/test-boiler/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        response = self.client.get('/api/categories/', HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 304)
+
+        self.boiler.price = Decimal('120.00')
+        self.boiler.save()
+        response = self.client.get('/api/products/test-boiler/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.json()['price'], '120.00')
+
+    def test_validators_follow_database_version(self):
+        etag = self.client.get('/api/products/test-boiler/')['ETag']
+        # Another process reprices product and bumps version in database
+        Product.objects.filter(pk=self.boiler.pk).update(price=Decimal('90.00'))
+        CatalogVersion.objects.update(version=models.F('version') + 1)
+        response = self.client.get('/api/products/test-boiler/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual((response.status_code, response.json()['price']), (200, '90.00'))
+        self.assertEqual(response['ETag'], '"{}"'.format(CatalogVersion.objects.get().version))
+
+    def test_errors_have_no_validators(self):
+        response = self.client.get('/api/products/missing/')
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(response.has_header('ETag'))
+        self.assertFalse(response.has_header('Last-Modified'))
+
+
+@override_settings(CATALOG_PUBLIC_CACHE_TIMEOUT=60)
+class PublicPageCacheTestCases(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user_for_test = User.objects.create(username='test_user', password='test')
+        self.category = Category.objects.create(name='Boilers', slug='boilers')
+        Product.objects.create(
+            category=self.category, name='Test Boiler', slug='test-boiler', image='boiler_image.jpg',
+            price=Decimal('100.00')
+        )
+
+    def test_catalog_pages_are_public(self):
+        self.client.force_login(self.user_for_test)
+        for url in ('/', '/products/test-boiler/', '/category/boilers/', '/search/?q=boiler'):
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response['Cache-Control'], 'public, max-age=60')
+            self.assertNotIn('Cookie', response.get('Vary', ''))
+            self.assertFalse(response.cookies)
+            self.assertNotContains(response, 'test_user')
+            self.assertContains(response, 'selection/badge/')
+        response = self.client.get('/products/missing/')
+        self.assertNotIn('public', response.get('Cache-Control', ''))
+
+    def test_badge_shows_user_selection_and_messages(self):
+        self.client.force_login(self.user_for_test)
+        self.client.get('/add-to-selection/test-boiler/')
+        response = self.client.get('/selection/badge/')
+        self.assertIn('no-cache', response['Cache-Control'])
+        self.assertEqual(response.json(), {'username': 'test_user', 'total_products': 1, 'messages': []})
+        data = self.client.get('/selection/badge/', {'messages': 1}).json()
+        self.assertEqual(data['messages'], [{'level': 'info', 'text': 'Product successfully added'}])
+        self.assertEqual(self.client.get('/selection/badge/', {'messages': 1}).json()['messages'], [])
+
+    def test_pages_are_served_by_cache_middleware(self):
+        middleware = (
+            [settings.MIDDLEWARE[0], 'django.middleware.cache.UpdateCacheMiddleware',
+             'catalogapp.middleware.PrivateCacheControlMiddleware']
+            + settings.MIDDLEWARE[1:] + ['django.middleware.cache.FetchFromCacheMiddleware']
+        )
+        with self.settings(MIDDLEWARE=middleware, CACHE_MIDDLEWARE_SECONDS=60):
+            self.client.get('/products/test-boiler/')
+            with self.assertNumQueries(0):
+                response = self.client.get('/products/test-boiler/')
+            self.assertContains(response, 'Test Boiler')
+            self.client.force_login(self.user_for_test)
+            self.client.get('/selection/')
+            response = self.client.get('/selection/')
+            self.assertIn('private', response['Cache-Control'])
+            self.client.get('/add-to-selection/test-boiler/')
+            self.assertContains(self.client.get('/selection/'), 'Test Boiler')
+
+
+class AssetPipelineTestCases(TestCase):
+
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def test_collectstatic_saves_hashed_compressed_files(self):
+        source, static_root = tempfile.mkdtemp(), tempfile.mkdtemp()
+        with open(os.path.join(source, 'catalog.css'), 'w') as stylesheet:
+            stylesheet.write('.card { margin: 0; }\n' * 100)
+        storages = {
+            'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+            'staticfiles': {'BACKEND': 'catalogapp.assets.CompressedManifestStaticFilesStorage'},
+        }
+        with self.settings(
+            STORAGES=storages, STATIC_ROOT=static_root, STATICFILES_DIRS=[source],
+            STATICFILES_FINDERS=['django.contrib.staticfiles.finders.FileSystemFinder']
+        ):
+            call_command('collectstatic', interactive=False, verbosity=0)
+            hashed = [name for name in os.listdir(static_root) if name.startswith('catalog.') and name.endswith('.css')]
+            self.assertEqual(len(hashed), 2)
+            hashed = max(hashed, key=len)
+            self.assertTrue(os.path.exists(os.path.join(static_root, hashed + '.gz')))
+
+            response = serve_static(self.factory.get('/static/' + hashed, HTTP_ACCEPT_ENCODING='gzip, br;q=0'), hashed)
+            self.assertEqual(response['Content-Encoding'], 'gzip')
+            self.assertEqual(response['Content-Type'], 'text/css')
+            self.assertIn('immutable', response['Cache-Control'])
+            self.assertIn('Accept-Encoding', response['Vary'])
+            self.assertLess(len(b''.join(response.streaming_content)), 2100)
+
+            response = serve_static(self.factory.get('/static/catalog.css'), 'catalog.css')
+            self.assertNotIn('Content-Encoding', response)
+            self.assertIn('no-cache', response['Cache-Control'])
+
+    @override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+    def test_media_ranges_and_conditional_requests(self):
+        with open(os.path.join(settings.MEDIA_ROOT, 'manual.pdf'), 'wb') as document:
+            document.write(bytes(range(256)) * 4)
+        response = serve_media(self.factory.get('/media/manual.pdf'), 'manual.pdf')
+        self.assertEqual((response.status_code, response['Content-Length']), (200, '1024'))
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        etag = response['ETag']
+
+        response = serve_media(self.factory.get('/media/manual.pdf', HTTP_IF_NONE_MATCH=etag), 'manual.pdf')
+        self.assertEqual(response.status_code, 304)
+
+        response = serve_media(self.factory.get('/media/manual.pdf', HTTP_RANGE='bytes=10-19'), 'manual.pdf')
+        self.assertEqual((response.status_code, response['Content-Range']), (206, 'bytes 10-19/1024'))
+        self.assertEqual(b''.join(response.streaming_content), bytes(range(10, 20)))
+        response = serve_media(self.factory.get('/media/manual.pdf', HTTP_RANGE='bytes=-4'), 'manual.pdf')
+        self.assertEqual(b''.join(response.streaming_content), bytes(range(252, 256)))
+        response = serve_media(
+            self.factory.get('/media/manual.pdf', HTTP_RANGE='bytes=0-1', HTTP_IF_RANGE='"changed"'), 'manual.pdf'
+        )
+        self.assertEqual(response.status_code, 200)
+        response = serve_media(self.factory.get('/media/manual.pdf', HTTP_RANGE='bytes=2000-'), 'manual.pdf')
+        self.assertEqual((response.status_code, response['Content-Range']), (416, 'bytes */1024'))
+
+        for path in ('missing.pdf', '../settings.py'):
+            with self.assertRaises(Http404):
+                serve_media(self.factory.get('/media/' + path), path)
+
+
+class SessionModeTestCases(TestCase):
+
+    def setUp(self):
+        seed_catalog(categories=1, products=3)
+        seed_users(users=1, selections=0, orders=0)
+
+    def test_cart_works_without_session_table(self):
+        engine, storage = settings.CATALOG_SESSION_MODES['cookie']
+        with self.settings(SESSION_ENGINE=engine, MESSAGE_STORAGE=storage):
+            self.client.force_login(User.objects.get())
+            with CaptureQueriesContext(connection) as queries:
+                self.client.get('/add-to-selection/product-0/')
+                data = self.client.get('/selection/badge/', {'messages': 1}).json()
+            self.assertEqual(data['total_products'], 1)
+            self.assertEqual(data['messages'], [{'level': 'info', 'text': 'Product successfully added'}])
+            self.assertFalse([query for query in queries if 'django_session' in query['sql']])
+
+    def test_session_benchmark(self):
+        results = run_session_benchmark(['db', 'cached_db', 'cookie'], operations=2)
+        self.assertEqual(results['db']['operations'], 6)
+        self.assertGreater(results['db']['session_statements'], results['cached_db']['session_statements'])
+        self.assertEqual(results['cookie']['session_statements'], 0)
+        self.assertAlmostEqual(results['cookie']['writes'], results['db']['writes'] - results['db']['session_writes'])
+
+
+class UnitPriceMigrationTestCases(TransactionTestCase):
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+    def migrate(self, target):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate([('catalogapp', target)])
+        return executor.loader.project_state([('catalogapp', target)]).apps
+
+    def test_unit_price_of_odd_quantities(self):
+        apps = self.migrate('0009_access_pattern_indexes')
+        category = apps.get_model('catalogapp', 'Category').objects.create(name='Boilers', slug='boilers')
+        product = apps.get_model('catalogapp', 'Product').objects.create(
+            category=category, name='Test Boiler', slug='test-boiler', image='boiler_image.jpg',
+            price=Decimal('50.00')
+        )
+        owner = apps.get_model('catalogapp', 'UserClass').objects.create(
+            user=apps.get_model(*settings.AUTH_USER_MODEL.split('.')).objects.create(username='test_user')
+        )
+        SelectedProduct = apps.get_model('catalogapp', 'SelectedProduct')
+        for qty, final_price in ((2, '21.00'), (3, '100.00'), (0, '0.00')):
+            SelectedProduct.objects.create(
+                user=owner, product=product, qty=qty, final_price=Decimal(final_price),
+                selected_item=apps.get_model('catalogapp', 'Selection').objects.create(owner=owner)
+            )
+
+        apps = self.migrate('0010_selected_product_unit_price')
+        self.assertEqual(
+            sorted(apps.get_model('catalogapp', 'SelectedProduct').objects.values_list('qty', 'unit_price')),
+            [(0, Decimal('50.00')), (2, Decimal('10.50')), (3, Decimal('33.33'))]
+        )
@@ -0,0 +1,144 @@
+"""
+Module contains pipeline of product image renditions (thumbnails).
+
+Renditions of every size in CATALOG_THUMBNAIL_SIZES are saved next to
+the original image as '<name>.<size>.webp' and '<name>.<size>.jpeg',
+where name keeps extension of original ('boiler.jpg.card.webp'), so
+renditions of 'boiler.png' and 'boiler.jpg' do not collide.
+They are generated in pool of background threads after product is saved
+(see signals.py) or by 'manage.py generate_thumbnails'.
+
+Product.thumbnail_source is the image name renditions were made of, so
+pages do not check storage: while it differs from image (new product or
+image), original image is shown. It is recorded after renditions are
+saved and catalog version is bumped, so cached fragments get renditions.
+Templates render WebP rendition with JPEG fallback ({% picture %} tag)
+"""
+
+import functools
+import io
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, models
+from PIL import Image, features
+
+logger = logging.getLogger(__name__)
+
+THUMBNAIL_FORMATS = ('webp', 'jpeg')
+
+# Count of image names in one UPDATE statement of record_renditions()
+RECORD_BATCH_SIZE = 500
+
+_executor = None
+
+
+def thumbnail_name(image_name, size, image_format='webp'):
+    """Function returns name of rendition of image in storage"""
+    return f'{image_name}.{size}.{image_format}'
+
+
+@functools.lru_cache(maxsize=None)
+def available_formats():
+    """WebP renditions are made only when Pillow is built with WebP support"""
+    return tuple(image_format for image_format in THUMBNAIL_FORMATS
+                 if image_format != 'webp' or features.check('webp'))
+
+
+def is_outdated(image_name, name):
+    """Function checks whether rendition is missing or older than original image"""
+    if not default_storage.exists(name):
+        return True
+    return default_storage.get_modified_time(name) < default_storage.get_modified_time(image_name)
+
+
+def generate_thumbnails(image_name, force=False):
+    """Function makes all renditions of image. Returns count of saved renditions, None without image"""
+    if not image_name or not default_storage.exists(image_name):
+        return None
+    renditions = [
+        (size, image_format, thumbnail_name(image_name, size, image_format))
+        for size in settings.CATALOG_THUMBNAIL_SIZES
+        for image_format in available_formats()
+    ]
+    renditions = [rendition for rendition in renditions if force or is_outdated(image_name, rendition[2])]
+    if not renditions:
+        return 0
+    with default_storage.open(image_name) as image_file:
+        original = Image.open(image_file)
+        original.load()
+    for size, image_format, name in renditions:
+        image = original.copy()
+        image.thumbnail(settings.CATALOG_THUMBNAIL_SIZES[size])
+        if image.mode not in ('RGB', 'RGBA') or image_format == 'jpeg':
+            image = image.convert('RGB')
+        content = io.BytesIO()
+        image.save(content, image_format, quality=settings.CATALOG_THUMBNAIL_QUALITY)
+        default_storage.delete(name)
+        default_storage.save(name, ContentFile(content.getvalue()))
+    return len(renditions)
+
+
+def record_renditions(image_names):
+    """
+    Function marks products of images as having renditions and bumps catalog
+    version when any product is marked. Returns count of marked products
+    """
+    # Models and utils import this module
+    from .models import Product
+    from .utils import bump_catalog_version
+
+    image_names = list(image_names)
+    marked = 0
+    for start in range(0, len(image_names), RECORD_BATCH_SIZE):
+        marked += Product.objects.filter(image__in=image_names[start:start + RECORD_BATCH_SIZE]).exclude(
+            thumbnail_source=models.F('image')
+        ).update(thumbnail_source=models.F('image'))
+    if marked:
+        bump_catalog_version()
+    return marked
+
+
+def get_executor():
+    """Function returns pool of background workers, pool is made on first use"""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.CATALOG_THUMBNAIL_WORKERS,
+            thread_name_prefix='thumbnails'
+        )
+    return _executor
+
+
+def _generate_logged(image_names):
+    generated = []
+    for image_name in image_names:
+        try:
+            if generate_thumbnails(image_name) is not None:
+                generated.append(image_name)
+        except Exception:
+            logger.exception('Thumbnails of %s were not generated', image_name)
+    if generated:
+        record_renditions(generated)
+
+
+def _generate_in_worker(image_names):
+    """Function runs in pool thread, its database connection is closed after every task"""
+    try:
+        _generate_logged(image_names)
+    finally:
+        connection.close()
+
+
+def schedule_thumbnails(*image_names):
+    """
+    Function generates renditions of images in background, with no workers configured - at once.
+    Products are marked and catalog version is bumped once for all images
+    """
+    if settings.CATALOG_THUMBNAIL_WORKERS:
+        get_executor().submit(_generate_in_worker, image_names)
+    else:
+        _generate_logged(image_names)
@@ -6,14 +6,20 @@ from .views import (
     ProductDetailView,
     CategoryDetailView,
     SelectionView,
+    SelectionBadgeView,
     AddToSelectionView,
+    BatchAddToSelectionView,
     RemoveFromSelectionView,
     ChangeQtyView,
     CheckoutView,
     MakeOrderView,
     LoginView,
     RegistrationView,
-    ProfileView
+    ProfileView,
+    OrderHistoryView,
+    SearchView,
+    AutocompleteView,
+    MetricsView
 )
 
 urlpatterns = [
@@ -21,6 +27,8 @@ urlpatterns = [
     path('products/<str:slug>/', ProductDetailView.as_view(), name='product_detail'),
     path('category/<str:slug>/', CategoryDetailView.as_view(), name='category_detail'),
     path('selection/', SelectionView.as_view(), name='selection'),
+    path('selection/badge/', SelectionBadgeView.as_view(), name='selection_badge'),
+    path('add-to-selection/', BatchAddToSelectionView.as_view(), name='batch_add_to_selection'),
     path('add-to-selection/<str:slug>/', AddToSelectionView.as_view(), name='add_to_selection'),
     path('remove-from-selection/<str:slug>/',
          RemoveFromSelectionView.as_view(),
@@ -32,5 +40,9 @@ urlpatterns = [
     path('login/', LoginView.as_view(), name='login'),
     path('logout/', LogoutView.as_view(next_page='/'), name='logout'),
     path('registration/', RegistrationView.as_view(), name='registration'),
-    path('profile/', ProfileView.as_view(), name='profile')
+    path('profile/', ProfileView.as_view(), name='profile'),
+    path('profile/orders/', OrderHistoryView.as_view(), name='order_history'),
+    path('search/', SearchView.as_view(), name='search'),
+    path('search/autocomplete/', AutocompleteView.as_view(), name='search_autocomplete'),
+    path('metrics', MetricsView.as_view(), name='metrics')
 ]
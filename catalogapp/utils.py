@@ -1,4 +1,84 @@
+import re
+import time
+from decimal import Decimal
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from django.db import models
+from django.db.models.functions import Greatest
+
+from .models import CatalogVersion, Product, SelectedProduct, Selection
+
+CATALOG_VERSION_ID = 1
+
+QUANTITY = re.compile(r'^\s*\d+\s*$')
+
+# Greatest total cost which fits DecimalField(max_digits=9, decimal_places=2) of items and selections
+MAX_TOTAL = Decimal('9999999.99')
+
+# (time of check, version) of last read of catalog version in this process
+_version = (None, None)
+
+
+def _remember_version(version):
+    global _version
+    _version = (time.monotonic(), version)
+    return version
+
+
+def _remembered_version():
+    """Function returns version read by this process less than CATALOG_VERSION_CHECK_INTERVAL ago"""
+    checked, version = _version
+    if checked is None or time.monotonic() - checked >= settings.CATALOG_VERSION_CHECK_INTERVAL:
+        return None
+    return version
+
+
+def read_catalog_version():
+    """Function reads current version of catalog from database"""
+    version = CatalogVersion.objects.filter(pk=CATALOG_VERSION_ID).values_list('version', flat=True).first()
+    if version is None:
+        return bump_catalog_version()
+    return _remember_version(version)
+
+
+def get_catalog_version():
+    """
+    Function returns current version of catalog (products and categories).
+    Version is kept in database, so that bumps of every process (workers,
+    management commands) are seen; it is read at most once per
+    CATALOG_VERSION_CHECK_INTERVAL seconds
+    """
+    version = _remembered_version()
+    if version is None:
+        version = read_catalog_version()
+    return version
+
+
+async def aget_catalog_version():
+    """Function does the same as get_catalog_version() with async ORM"""
+    version = _remembered_version()
+    if version is None:
+        version = await CatalogVersion.objects.filter(pk=CATALOG_VERSION_ID).values_list(
+            'version', flat=True
+        ).afirst()
+        if version is None:
+            return await sync_to_async(bump_catalog_version)()
+        _remember_version(version)
+    return version
+
+
+def bump_catalog_version():
+    """Function sets new version of catalog.
+
+    Version is a timestamp in microseconds (always greater than previous one),
+    so fragments cached for previous version are never served again
+    """
+    now = time.time_ns() // 1000
+    versions = CatalogVersion.objects.filter(pk=CATALOG_VERSION_ID)
+    if not versions.update(version=Greatest(models.F('version') + 1, models.Value(now))):
+        CatalogVersion.objects.bulk_create([CatalogVersion(pk=CATALOG_VERSION_ID, version=now)], ignore_conflicts=True)
+    return _remember_version(versions.values_list('version', flat=True).get())
 
 
 def recalc_selection(selection):
@@ -13,4 +93,106 @@ def recalc_selection(selection):
     else:
         selection.final_price = 0
     selection.total_products = selection_data['id__count']
-    selection.save()
+    selection.save(update_fields=['final_price', 'total_products'])
+
+
+def update_selection_totals(selection, products_delta=0, price_delta=0):
+    """Incremental recalculating function.
+
+    This function applies changes of items count and total sum
+    to Selection row with one UPDATE instead of aggregating all items.
+    When totals of selection come out inconsistent (drift) it falls back
+    to full recalc_selection
+    """
+    total_products = selection.total_products + products_delta
+    final_price = selection.final_price + price_delta
+    if total_products < 0 or final_price < 0 or (not total_products and final_price):
+        recalc_selection(selection)
+        return
+    Selection.objects.filter(pk=selection.pk).update(
+        total_products=models.F('total_products') + products_delta,
+        final_price=models.F('final_price') + price_delta
+    )
+    selection.total_products = total_products
+    selection.final_price = final_price
+
+
+class QuantityError(ValueError):
+    """Error of requested quantity of product"""
+
+
+def clean_qty(value):
+    """
+    Function returns quantity of product from request value (string or integer).
+    Quantity must be integer from 1 to CATALOG_MAX_QTY, otherwise QuantityError is raised
+    """
+    if isinstance(value, str) and QUANTITY.match(value):
+        value = int(value)
+    if isinstance(value, bool) or not isinstance(value, int):
+        raise QuantityError(f'Quantity {value!r} is not an integer')
+    if not 1 <= value <= settings.CATALOG_MAX_QTY:
+        raise QuantityError(f'Quantity must be from 1 to {settings.CATALOG_MAX_QTY}')
+    return value
+
+
+def check_total(final_price):
+    """Function raises QuantityError when total cost of item or selection does not fit its field"""
+    if final_price > MAX_TOTAL:
+        raise QuantityError(f'Total cost must not exceed {MAX_TOTAL}')
+
+
+def add_products_to_selection(selection, items):
+    """Batch adding function.
+
+    This function adds products to Selection by mapping of slug to quantity.
+    Products are resolved with one query, new items are created with bulk insert
+    and linked to Selection with one more insert, quantity of already selected
+    items is increased at their unit price. Returns created and updated items and slugs not found.
+    QuantityError is raised before any change when quantity or total cost becomes too large
+    """
+    products = Product.objects.in_bulk(list(items), field_name='slug')
+    selected_products = {
+        selected_product.product_id: selected_product
+        for selected_product in SelectedProduct.objects.filter(
+            selected_item=selection,
+            product__in=products.values()
+        )
+    }
+    created, updated = [], []
+    price_delta = 0
+    for slug, product in products.items():
+        qty = items[slug]
+        selected_product = selected_products.get(product.pk)
+        if selected_product:
+            previous_price = selected_product.final_price
+            selected_product.qty = clean_qty(selected_product.qty + qty)
+            selected_product.final_price = selected_product.qty * selected_product.unit_price
+            check_total(selected_product.final_price)
+            price_delta += selected_product.final_price - previous_price
+            updated.append(selected_product)
+        else:
+            selected_product = SelectedProduct(
+                user=selection.owner,
+                selected_item=selection,
+                product=product,
+                qty=qty,
+                unit_price=product.price,
+                final_price=qty * product.price
+            )
+            check_total(selected_product.final_price)
+            price_delta += selected_product.final_price
+            created.append(selected_product)
+    check_total(selection.final_price + price_delta)
+    if updated:
+        SelectedProduct.objects.bulk_update(updated, ['qty', 'final_price'])
+    if created:
+        SelectedProduct.objects.bulk_create(created)
+        through = Selection.products.through
+        through.objects.bulk_create([
+            through(selection_id=selection.pk, selectedproduct_id=selected_product.pk)
+            for selected_product in created
+        ])
+    if created or updated:
+        update_selection_totals(selection, len(created), price_delta)
+    not_found = [slug for slug in items if slug not in products]
+    return created, updated, not_found
@@ -0,0 +1,55 @@
+"""
+Module contains objects prepared for templates, so that
+rendering does not make queries per item
+"""
+
+from django.db.models import Prefetch, prefetch_related_objects
+
+from .models import SelectedProduct
+
+
+class SelectionViewModel:
+    """
+    Class represents Selection in selection and checkout pages.
+
+    All items of selection are loaded by single prefetch
+    with their products and categories (for not authenticated
+    visitor - by single query of selected products)
+    """
+
+    def __init__(self, selection, items=None):
+        if items is None:
+            items = self.load_items(selection)
+        self.selection = selection
+        self.items = items
+        self.count = len(items)
+        self.total_products = selection.total_products
+        if selection.is_anonymous:
+            self.final_price = sum(item.final_price for item in items)
+        else:
+            self.final_price = selection.final_price
+
+    @staticmethod
+    def load_items(selection):
+        """Function returns selected products of selection"""
+        if selection.is_anonymous:
+            return selection.get_items()
+        prefetch_related_objects(
+            [selection],
+            Prefetch(
+                'products',
+                queryset=SelectedProduct.objects.select_related('product__category').order_by('id')
+            )
+        )
+        return list(selection.products.all())
+
+    @classmethod
+    async def acreate(cls, selection):
+        """Function makes view model of selection, items are loaded by async ORM"""
+        if selection.is_anonymous:
+            items = await selection.aget_items()
+        else:
+            items = [
+                item async for item in selection.products.select_related('product__category').order_by('id')
+            ]
+        return cls(selection, items)
@@ -1,33 +1,58 @@
+import json
+
+from django.conf import settings
 from django.db import transaction
 from django.shortcuts import render
 from django.contrib import messages
 from django.contrib.auth import authenticate, login
 from django.contrib.contenttypes.models import ContentType
-from django.http import HttpResponseRedirect
+from django.core.paginator import Paginator
+from django.http import (
+    Http404, HttpResponse, HttpResponseBadRequest, HttpResponseForbidden, HttpResponseRedirect, JsonResponse
+)
+from django.urls import reverse
+from django.utils.decorators import method_decorator
+from django.views.decorators.cache import never_cache
 from django.views.generic import DetailView, View
 
-from .models import Category, UserClass, Product, Order, SelectedProduct
-from .mixins import SelectionMixin
+from .models import UserClass, Product, Selection
+from .mixins import SelectionMixin, OrderHistoryMixin, ProductPageMixin, PublicPageMixin
+from .catalog_cache import get_category, get_product
+from .facets import filter_products, get_category_facets
 from .forms import OrderForm, LoginForm, RegistrationForm
-from .utils import recalc_selection
+from .metrics import expose_metrics
+from .orders import enqueue_order
+from .search import SearchResults, autocomplete
+from .services import SelectionService, lock_selection
+from .utils import QuantityError, clean_qty
+from .viewmodels import SelectionViewModel
+
 
+def get_product_or_404(slug):
+    """Function returns product from catalog cache or raises Http404"""
+    product = get_product(slug)
+    if product is None:
+        raise Http404('No product found matching the query')
+    return product
 
-class BaseView(SelectionMixin, View):
+
+class BaseView(PublicPageMixin, ProductPageMixin, View):
     """
     Representation of main page
     """
     def get(self, request, *args, **kwargs):
-        categories = Category.objects.all()
-        products = Product.objects.all()
+        page = self.get_products_page(Product.objects.all())
+        if self.wants_json():
+            return self.products_json_response(page)
         context = {
-            'categories': categories,
-            'products': products,
+            'page': page,
+            'cursor': request.GET.get('cursor'),
             'selection': self.selection
         }
         return render(request, 'base.html', context)
 
 
-class ProductDetailView(SelectionMixin, DetailView):
+class ProductDetailView(PublicPageMixin, DetailView):
     """
     Representation of product details in web
     """
@@ -36,6 +61,10 @@ class ProductDetailView(SelectionMixin, DetailView):
     template_name = 'product_detail.html'
     slug_url_kwarg = 'slug'
 
+    def get_object(self, queryset=None):
+        """Function returns product from catalog cache"""
+        return get_product_or_404(self.kwargs.get(self.slug_url_kwarg))
+
     def get_context_data(self, **kwargs):
         """Function gets context - content type of models, selection on request"""
         context = super(ProductDetailView, self).get_context_data()
@@ -43,20 +72,44 @@ class ProductDetailView(SelectionMixin, DetailView):
         return context
 
 
-class CategoryDetailView(SelectionMixin, DetailView):
+class CategoryDetailView(PublicPageMixin, ProductPageMixin, DetailView):
     """
     Class is used to represent product in category page
     """
-    model = Category
-    queryset = Category.objects.all()
     context_object_name = 'category'
     template_name = 'category_detail.html'
     slug_url_kwarg = 'slug'
 
+    def get_object(self, queryset=None):
+        """Function returns category from catalog cache"""
+        category = get_category(self.kwargs.get(self.slug_url_kwarg))
+        if category is None:
+            raise Http404('No category found matching the query')
+        return category
+
+    def get(self, request, *args, **kwargs):
+        """Function returns category page or its products page in JSON"""
+        if self.wants_json():
+            self.object = self.get_object()
+            return self.products_json_response(self.get_category_products())
+        return super().get(request, *args, **kwargs)
+
+    def get_category_products(self):
+        """Function returns page of products of category matching filters"""
+        products = filter_products(Product.objects.filter(category=self.object), self.request.GET)
+        return self.get_products_page(products)
+
     def get_context_data(self, **kwargs):
-        """Function gets context - selection on request"""
+        """Function gets context - selection, facets and page of category products on request"""
         context = super().get_context_data()
+        filters = self.request.GET.copy()
+        filters.pop('cursor', None)
         context['selection'] = self.selection
+        context['page'] = self.get_category_products()
+        context['facets'] = get_category_facets(self.object)
+        context['filters'] = filters
+        context['selected_fuels'] = filters.getlist('fuel')
+        context['filter_query'] = filters.urlencode()
         return context
 
 
@@ -71,20 +124,71 @@ class AddToSelectionView(SelectionMixin, View):
         Function makes redirect to Selection if product was added.
         At the end of operation withdraw message.
         """
-        product_slug = kwargs.get('slug')
-        product = Product.objects.get(slug=product_slug)
-        selected_product, created = SelectedProduct.objects.get_or_create(
-            user=self.selection.owner,
-            selected_item=self.selection,
-            product=product
-        )
-        if created:
-            self.selection.products.add(selected_product)
-        recalc_selection(self.selection)
+        product = get_product_or_404(kwargs.get('slug'))
+        if self.selection.is_anonymous:
+            if self.selection.add_product(product.slug):
+                messages.add_message(request, messages.INFO, 'Product successfully added')
+            else:
+                messages.add_message(request, messages.INFO, 'Log in to select more products')
+            return HttpResponseRedirect('/selection/')
+        SelectionService(self.selection).add_product(product, self.get_idempotency_key())
         messages.add_message(request, messages.INFO, 'Product successfully added')
         return HttpResponseRedirect('/selection/')
 
 
+class BatchAddToSelectionView(SelectionMixin, View):
+    """
+    Class is used to add a list of products
+    to Selection with one request
+    """
+
+    @staticmethod
+    def get_items(request):
+        """
+        Function reads pairs of slug and quantity from JSON body
+        ({"items": [[slug, qty], ...]}) or from repeated 'slug' and 'qty' form fields
+        """
+        if request.content_type == 'application/json':
+            pairs = json.loads(request.body).get('items', [])
+        else:
+            pairs = zip(request.POST.getlist('slug'), request.POST.getlist('qty'))
+        items = {}
+        for slug, qty in pairs:
+            items[slug] = clean_qty(items.get(slug, 0) + clean_qty(qty))
+        return items
+
+    def post(self, request, *args, **kwargs):
+        """
+        Function adds all requested products to Selection
+        and returns result of operation in JSON
+        """
+        try:
+            items = self.get_items(request)
+        except (ValueError, TypeError, AttributeError) as error:
+            return HttpResponseBadRequest(str(error))
+        try:
+            if self.selection.is_anonymous:
+                result = self.selection.add_products(items)
+            else:
+                result = SelectionService(self.selection).add_products(items, self.get_idempotency_key())
+        except QuantityError as error:
+            return HttpResponseBadRequest(str(error))
+        if result is None:
+            return JsonResponse({
+                'repeated': True,
+                'total_products': self.selection.total_products,
+                'final_price': str(self.selection.final_price)
+            })
+        created, updated, not_found = result
+        return JsonResponse({
+            'added': len(created),
+            'updated': len(updated),
+            'not_found': not_found,
+            'total_products': self.selection.total_products,
+            'final_price': str(self.selection.final_price)
+        })
+
+
 class RemoveFromSelectionView(SelectionMixin, View):
     """
     Class is used to represent
@@ -97,15 +201,12 @@ class RemoveFromSelectionView(SelectionMixin, View):
         At the end of operation withdraw message.
         """
         product_slug = kwargs.get('slug')
-        product = Product.objects.get(slug=product_slug)
-        selected_product = SelectedProduct.objects.get(
-            user=self.selection.owner,
-            selected_item=self.selection,
-            product=product
-        )
-        self.selection.products.remove(selected_product)
-        selected_product.delete()
-        recalc_selection(self.selection)
+        if self.selection.is_anonymous:
+            self.selection.remove_product(product_slug)
+            messages.add_message(request, messages.INFO, 'Product successfully removed')
+            return HttpResponseRedirect('/selection/')
+        product = get_product_or_404(product_slug)
+        SelectionService(self.selection).remove_product(product, self.get_idempotency_key())
         messages.add_message(request, messages.INFO, 'Product successfully removed')
         return HttpResponseRedirect('/selection/')
 
@@ -122,16 +223,18 @@ class ChangeQtyView(SelectionMixin, View):
         At the end of operation withdraw message.
         """
         product_slug = kwargs.get('slug')
-        product = Product.objects.get(slug=product_slug)
-        selected_product = SelectedProduct.objects.get(
-            user=self.selection.owner,
-            selected_item=self.selection,
-            product=product
-        )
-        qty = int(request.POST.get('qty'))
-        selected_product.qty = qty
-        selected_product.save()
-        recalc_selection(self.selection)
+        try:
+            qty = clean_qty(request.POST.get('qty'))
+        except QuantityError as error:
+            return HttpResponseBadRequest(str(error))
+        try:
+            if self.selection.is_anonymous:
+                self.selection.change_qty(product_slug, qty)
+            else:
+                product = get_product_or_404(product_slug)
+                SelectionService(self.selection).change_qty(product, qty, self.get_idempotency_key())
+        except QuantityError as error:
+            return HttpResponseBadRequest(str(error))
         messages.add_message(request, messages.INFO, 'Quantity successfully changed')
         return HttpResponseRedirect('/selection/')
 
@@ -141,10 +244,9 @@ class SelectionView(SelectionMixin, View):
 
     def get(self, request, *args, **kwargs):
         """Renders Selection template on request"""
-        categories = Category.objects.all()
         context = {
             'selection': self.selection,
-            'categories': categories
+            'selection_view': SelectionViewModel(self.selection)
         }
         return render(request, 'selection.html', context)
 
@@ -154,11 +256,10 @@ class CheckoutView(SelectionMixin, View):
     Class is used to represent in Selection go process to order
     """
     def get(self, request, *args, **kwargs):
-        categories = Category.objects.all()
         form = OrderForm(request.POST or None)
         context = {
             'selection': self.selection,
-            'categorise': categories,
+            'selection_view': SelectionViewModel(self.selection),
             'form': form
         }
         return render(request, 'checkout.html', context)
@@ -167,24 +268,34 @@ class CheckoutView(SelectionMixin, View):
 class MakeOrderView(SelectionMixin, View):
     """"
     Class is used to represent order with selected items.
-    When order makes message of status withdraw
+    When order makes message of status withdraw.
+    Quote, notification and other processing of order are made
+    by worker process (see orders.py)
     """
-    @transaction.atomic
     def post(self, request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            messages.add_message(request, messages.INFO, 'Log in to make order')
+            return HttpResponseRedirect('/login/')
         form = OrderForm(request.POST or None)
-        user = UserClass.objects.get(user=request.user)
         if form.is_valid():
-            new_order = form.save(commit=False)
-            new_order.user = user
-            new_order.order_type = form.cleaned_data.get('order_type')
-            new_order.order_date = form.cleaned_data.get('order_date')
-            new_order.comment = form.cleaned_data.get('comment')
-            new_order.save()
-            self.selection.in_order = True
-            self.selection.save()
-            new_order.selection = self.selection
-            new_order.save()
-            user.orders.add(new_order)
+            with transaction.atomic():
+                lock_selection(self.selection)
+                # Selection may be ordered by concurrent or repeated submit after it was loaded
+                if Selection.objects.filter(pk=self.selection.pk, in_order=True).exists():
+                    messages.add_message(request, messages.INFO, 'Order is already made')
+                    return HttpResponseRedirect('/')
+                if not self.selection.total_products:
+                    messages.add_message(request, messages.INFO, 'Selection is empty')
+                    return HttpResponseRedirect('/selection/')
+                new_order = form.save(commit=False)
+                new_order.user = self.selection.owner
+                new_order.selection = self.selection
+                new_order.total_products = self.selection.total_products
+                new_order.final_price = self.selection.final_price
+                new_order.save()
+                Selection.objects.filter(pk=self.selection.pk).update(in_order=True)
+                enqueue_order(new_order)
+            self.forget_selection(request)
             messages.add_message(request, messages.INFO, 'Order is done')
             return HttpResponseRedirect('/')
         return HttpResponseRedirect('/checkout')
@@ -194,10 +305,8 @@ class LoginView(SelectionMixin, View):
 
     def get(self, request, *args, **kwargs):
         form = LoginForm(request.POST or None)
-        categories = Category.objects.all()
         context = {
             'form': form,
-            'categories': categories,
             'selection': self.selection
         }
         return render(request, 'login.html', context)
@@ -223,10 +332,8 @@ class RegistrationView(SelectionMixin, View):
 
     def get(self, request, *args, **kwargs):
         form = RegistrationForm(request.POST or None)
-        categories = Category.objects.all()
         context = {
             'form': form,
-            'categorise': categories,
             'selection': self.selection
         }
         return render(request, 'registration.html', context)
@@ -257,19 +364,103 @@ class RegistrationView(SelectionMixin, View):
         return render(request, 'registration.html', context)
 
 
-class ProfileView(SelectionMixin, View):
+class ProfileView(SelectionMixin, OrderHistoryMixin, View):
 
     def get(self, request, *args, **kwargs):
-        user = UserClass.objects.get(user=request.user)
-        orders = Order.objects.filter(user=user,).order_by('-created_at')
-        categories = Category.objects.all()
+        orders = self.get_orders_page(self.selection.owner)
         context = {
             'orders': orders,
-            'selection': self.selection,
-            'categories': categories
+            'selection': self.selection
         }
         return render(
             request,
             'profile.html',
             context
         )
+
+
+class OrderHistoryView(SelectionMixin, OrderHistoryMixin, View):
+    """
+    Class is used to return order history of user in JSON
+    """
+
+    def get(self, request, *args, **kwargs):
+        orders = self.get_orders_page(self.selection.owner)
+        return JsonResponse({
+            'orders': [
+                {
+                    'id': order.id,
+                    'status': order.status,
+                    'order_type': order.order_type,
+                    'to_project': order.to_project,
+                    'created_at': order.created_at,
+                    'order_date': order.order_date,
+                    'total_products': order.total_products,
+                    'final_price': str(order.final_price),
+                    'products': [
+                        {'slug': item.product.slug, 'name': item.product.name, 'qty': item.qty}
+                        for item in (order.selection.products.all() if order.selection else [])
+                    ]
+                }
+                for order in orders
+            ],
+            'page': orders.number,
+            'num_pages': orders.paginator.num_pages
+        })
+
+
+class SearchView(PublicPageMixin, View):
+    """
+    Class is used to represent ranked results of product search
+    """
+
+    def get(self, request, *args, **kwargs):
+        query = request.GET.get('q', '')
+        paginator = Paginator(SearchResults(query), settings.CATALOG_PAGE_SIZE)
+        context = {
+            'query': query,
+            'results': paginator.get_page(request.GET.get('page')),
+            'selection': self.selection
+        }
+        return render(request, 'search.html', context)
+
+
+class AutocompleteView(View):
+    """
+    Class is used to suggest products which names start with typed words
+    """
+
+    def get(self, request, *args, **kwargs):
+        suggestions = autocomplete(request.GET.get('q', ''))
+        for suggestion in suggestions:
+            suggestion['url'] = reverse('product_detail', kwargs={'slug': suggestion['slug']})
+        return JsonResponse({'suggestions': suggestions})
+
+
+@method_decorator(never_cache, name='dispatch')
+class SelectionBadgeView(SelectionMixin, View):
+    """
+    Class is used to load per-user parts of public pages (see PublicPageMixin):
+    user, count of selected products and, with 'messages' parameter, pending messages
+    """
+
+    def get(self, request, *args, **kwargs):
+        return JsonResponse({
+            'username': request.user.username if request.user.is_authenticated else None,
+            'total_products': self.selection.total_products,
+            'messages': [
+                {'level': message.level_tag, 'text': str(message)} for message in messages.get_messages(request)
+            ] if request.GET.get('messages') else []
+        })
+
+
+class MetricsView(View):
+    """
+    Class is used to expose request metrics in Prometheus text format
+    to addresses of METRICS_ALLOWED_IPS
+    """
+
+    def get(self, request, *args, **kwargs):
+        if request.META.get('REMOTE_ADDR') not in settings.METRICS_ALLOWED_IPS:
+            return HttpResponseForbidden()
+        return HttpResponse(expose_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,12 @@
+"""new_catalog URL Configuration for ASGI
+
+Read-only catalog pages are routed to async views (catalogapp/async_urls.py),
+all other URLs are the same as in new_catalog/urls.py
+"""
+from django.urls import path, include
+
+from .urls import urlpatterns as wsgi_urlpatterns
+
+urlpatterns = [
+    path('', include('catalogapp.async_urls'))
+] + wsgi_urlpatterns
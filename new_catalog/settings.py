@@ -42,6 +42,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'catalogapp.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -53,9 +54,13 @@ MIDDLEWARE = [
 
 ROOT_URLCONF = 'new_catalog.urls'
 
+# ASGI deployment routes read-only catalog pages to async views (see new_catalog/asgi.py)
+if os.environ.get('CATALOG_ASYNC_VIEWS') == '1':
+    ROOT_URLCONF = 'new_catalog.asgi_urls'
+
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'catalogapp.metrics.InstrumentedDjangoTemplates',
         'DIRS': [],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -64,6 +69,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'catalogapp.context_processors.catalog',
             ],
         },
     },
@@ -82,6 +88,138 @@ DATABASES = {
     }
 }
 
+# PRAGMA statements run on every new SQLite connection of alias (catalogapp/database.py)
+CATALOG_SQLITE_PRAGMAS = {}
+
+# Production database mode (CATALOG_DATABASE_MODE=production):
+# WAL journal, so that readers do not block writer, wait for locks instead of
+# failing with "database is locked", persistent connections with health checks
+# and catalog reads routed to read-only connection (catalogapp/routers.py)
+SQLITE_PRODUCTION_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -32 * 1024,
+    'temp_store': 'MEMORY',
+}
+CATALOG_READ_DATABASE = 'default'
+
+if os.environ.get('CATALOG_DATABASE_MODE') == 'production':
+    DATABASES['default'].update({
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {'timeout': 20},
+    })
+    DATABASES['replica'] = dict(DATABASES['default'], TEST={'MIRROR': 'default'})
+    DATABASE_ROUTERS = ['catalogapp.routers.CatalogReadRouter']
+    CATALOG_READ_DATABASE = 'replica'
+    CATALOG_SQLITE_PRAGMAS = {
+        'default': SQLITE_PRODUCTION_PRAGMAS,
+        'replica': dict(SQLITE_PRODUCTION_PRAGMAS, query_only='ON'),
+    }
+
+
+# Cache
+# https://docs.djangoproject.com/en/3.2/topics/cache/
+# Catalog fragments are invalidated by catalog version (kept in database, so that
+# it is shared by processes), with several worker processes shared backend
+# (file based, memcached, redis) keeps one copy of fragments instead of one per process
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'sessions': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'sessions',
+    }
+}
+
+# Storage of sessions and messages (CATALOG_SESSION_MODE):
+# - 'db' (default): sessions in database table, messages in cookie with fallback to session
+# - 'cached_db': sessions are read from 'sessions' cache and written through to database,
+#   so requests do not read session table
+# - 'cache': sessions are kept only in 'sessions' cache, nothing is written to database.
+#   With several worker processes the cache must be shared (memcached, redis),
+#   sessions are lost when the cache is cleared
+# - 'cookie': sessions and messages in signed cookies, nothing is stored on server.
+#   Cookie is signed, not encrypted, and copy of it stays valid after logout
+# Sessions have their own cache, so that clearing of 'default' cache does not log users out
+CATALOG_SESSION_MODES = {
+    'db': ('django.contrib.sessions.backends.db', 'django.contrib.messages.storage.fallback.FallbackStorage'),
+    'cached_db': (
+        'django.contrib.sessions.backends.cached_db', 'django.contrib.messages.storage.fallback.FallbackStorage'
+    ),
+    'cache': ('django.contrib.sessions.backends.cache', 'django.contrib.messages.storage.fallback.FallbackStorage'),
+    'cookie': (
+        'django.contrib.sessions.backends.signed_cookies', 'django.contrib.messages.storage.cookie.CookieStorage'
+    ),
+}
+CATALOG_SESSION_MODE = os.environ.get('CATALOG_SESSION_MODE', 'db')
+SESSION_ENGINE, MESSAGE_STORAGE = CATALOG_SESSION_MODES[CATALOG_SESSION_MODE]
+SESSION_CACHE_ALIAS = 'sessions'
+
+CATALOG_FRAGMENT_TIMEOUT = 60 * 60 * 24
+
+# Catalog version, which keys cached fragments, is kept in database and
+# read by every process at most once per this count of seconds
+CATALOG_VERSION_CHECK_INTERVAL = 1.0
+
+# Cache of categories and product lookups (catalogapp/catalog_cache.py).
+# Use 'catalogapp.catalog_cache.DjangoCache' with OPTIONS {'alias': ...}
+# to keep it in file based or Redis cache of CACHES
+CATALOG_CACHE = {
+    'BACKEND': 'catalogapp.catalog_cache.LocalLRUCache',
+    'OPTIONS': {'max_entries': 2048, 'timeout': 300},
+}
+
+CATALOG_PAGE_SIZE = 24
+
+# Greatest quantity of product in selection
+CATALOG_MAX_QTY = 999
+
+# HTTP caching mode (CATALOG_PUBLIC_CACHE_TIMEOUT=<seconds>): catalog pages are
+# rendered without per-user parts, which are loaded from /selection/badge/, and sent
+# with 'Cache-Control: public, max-age', other responses are marked private
+# (catalogapp.mixins.PublicPageMixin). Pages are cached by proxy in front of project,
+# or by Django cache middleware with CATALOG_CACHE_MIDDLEWARE=1. Changes of catalog
+# reach visitors when cached page expires
+CATALOG_PUBLIC_CACHE_TIMEOUT = None
+
+if os.environ.get('CATALOG_PUBLIC_CACHE_TIMEOUT'):
+    CATALOG_PUBLIC_CACHE_TIMEOUT = int(os.environ['CATALOG_PUBLIC_CACHE_TIMEOUT'])
+    MIDDLEWARE.insert(1, 'catalogapp.middleware.PrivateCacheControlMiddleware')
+    if os.environ.get('CATALOG_CACHE_MIDDLEWARE') == '1':
+        MIDDLEWARE.insert(1, 'django.middleware.cache.UpdateCacheMiddleware')
+        MIDDLEWARE.append('django.middleware.cache.FetchFromCacheMiddleware')
+        CACHE_MIDDLEWARE_SECONDS = CATALOG_PUBLIC_CACHE_TIMEOUT
+        CACHE_MIDDLEWARE_KEY_PREFIX = 'catalogapp'
+
+# Selection of not authenticated visitor is kept in signed cookie (catalogapp/anonymous.py)
+ANONYMOUS_SELECTION_AGE = 60 * 60 * 24 * 30
+ANONYMOUS_SELECTION_MAX_ITEMS = 50
+
+ORDER_HISTORY_PAGE_SIZE = 20
+
+# Steps of order processing run by 'manage.py run_order_worker' (catalogapp/orders.py)
+ORDER_PIPELINE = [
+    'catalogapp.orders.link_order',
+    'catalogapp.orders.render_quote',
+    'catalogapp.orders.notify_user',
+]
+ORDER_JOB_MAX_ATTEMPTS = 5
+ORDER_JOB_RETRY_DELAY = 30
+ORDER_JOB_TIMEOUT = 60 * 10
+
+EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
+
+# Request metrics (catalogapp/metrics.py) are exposed on /metrics to these addresses.
+# Requests slower than METRICS_SLOW_REQUEST_SECONDS are logged with their slowest
+# SQL statements, None turns the log off
+METRICS_ALLOWED_IPS = ['127.0.0.1']
+METRICS_SLOW_REQUEST_SECONDS = 1.0
+METRICS_SLOW_REQUEST_STATEMENTS = 5
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
@@ -124,6 +262,29 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'static')
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+
+# Production asset mode (CATALOG_ASSET_MODE=production): collectstatic saves static
+# files with hashed names and their gzip/brotli variants, static and media files
+# are served by project itself with ETag, Range support and cache headers
+# (catalogapp/assets.py), for deployments without web server in front of it
+CATALOG_ASSET_SERVER = False
+CATALOG_STATIC_MAX_AGE = 60 * 60 * 24 * 365
+CATALOG_MEDIA_MAX_AGE = 60 * 60
+
+if os.environ.get('CATALOG_ASSET_MODE') == 'production':
+    CATALOG_ASSET_SERVER = True
+    STORAGES = {
+        'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+        'staticfiles': {'BACKEND': 'catalogapp.assets.CompressedManifestStaticFilesStorage'},
+    }
+
+# Renditions of product images (max width, max height), see catalogapp/thumbnails.py
+CATALOG_THUMBNAIL_SIZES = {
+    'card': (400, 300),
+    'small': (160, 120),
+}
+CATALOG_THUMBNAIL_QUALITY = 80
+CATALOG_THUMBNAIL_WORKERS = 2
 # Default primary key field type
 # https://docs.djangoproject.com/en/3.2/ref/settings/#default-auto-field
 
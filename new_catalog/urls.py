@@ -13,17 +13,31 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
+import re
+
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, re_path, include
 from django.conf import settings
 from django.conf.urls.static import static
 
+from catalogapp.assets import serve_media, serve_static
+
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('api/', include('catalogapp.api_urls')),
     path('', include('catalogapp.urls'))
 ]
 
-if settings.DEBUG:
+if settings.CATALOG_ASSET_SERVER:
+    """Condition for production asset mode
+
+    Static and media files are served by project (catalogapp/assets.py)
+    """
+    urlpatterns += [
+        re_path(r'^%s(?P<path>.*)$' % re.escape(settings.STATIC_URL.lstrip('/')), serve_static),
+        re_path(r'^%s(?P<path>.*)$' % re.escape(settings.MEDIA_URL.lstrip('/')), serve_media),
+    ]
+elif settings.DEBUG:
     """Condition for debug regime
     
     When project in debug mode, local files will be used